@@ -1,13 +1,32 @@
-from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_marshmallow import Marshmallow
+from flask import Flask
+from app.json_response import jsonify
 from flask_jwt_extended import JWTManager
 from app.config import Config
+from app.replicas import ReplicaRouter, RoutingSQLAlchemy
+from app.bloom import BlacklistBloomFilter
+from app.snapshot import BlacklistSnapshot
+from app.telemetry import telemetry
+from app.ratelimit import RateLimiter
+from app.lookup_cache import LookupCache
+from app.changes import ChangeNotifier
+from app.group_commit import GroupCommitter
+from app.prometheus import PrometheusMetrics
+from app.server_timing import ServerTiming
+from app.query_profiler import QueryProfiler
 import os
 
-db = SQLAlchemy()
-ma = Marshmallow()
+db = RoutingSQLAlchemy()
 jwt = JWTManager()
+bloom_filter = BlacklistBloomFilter()
+hash_snapshot = BlacklistSnapshot()
+rate_limiter = RateLimiter()
+replica_router = ReplicaRouter()
+lookup_cache = LookupCache()
+change_notifier = ChangeNotifier()
+group_committer = GroupCommitter()
+prometheus_metrics = PrometheusMetrics()
+server_timing = ServerTiming()
+query_profiler = QueryProfiler()
 
 def create_app():
     """Application factory pattern"""
@@ -16,19 +35,38 @@ def create_app():
 
     # Initialize extensions
     db.init_app(app)
-    ma.init_app(app)
     jwt.init_app(app)
+    bloom_filter.init_app(app)
+    hash_snapshot.init_app(app)
+    telemetry.init_app(app)
+    # Before the load shedder hook, so shed requests are timed too
+    prometheus_metrics.init_app(app)
+    server_timing.init_app(app)
+    query_profiler.init_app(app)
+    rate_limiter.init_app(app)
+    replica_router.init_app(app)
+    lookup_cache.init_app(app)
+    change_notifier.init_app(app)
+    group_committer.init_app(app)
 
     # Register blueprints
     from app.routes.blacklists import blacklists_bp
     from app.routes.blacklists_get import blacklists_get_bp
     from app.routes.health import health_bp
     from app.routes.ping import ping_bp
+    from app.routes.debug import debug_bp
+    from app.routes.metrics import metrics_bp
 
     app.register_blueprint(blacklists_bp, url_prefix='/blacklists')
     app.register_blueprint(blacklists_get_bp, url_prefix='/blacklists')
     app.register_blueprint(health_bp)
     app.register_blueprint(ping_bp)
+    app.register_blueprint(debug_bp, url_prefix='/debug')
+    app.register_blueprint(metrics_bp)
+
+    # Register CLI commands (flask blacklist ...)
+    from app.cli import blacklist_cli
+    app.cli.add_command(blacklist_cli)
 
     # Root endpoint for health checks
     @app.route('/', methods=['GET'])
@@ -36,9 +74,19 @@ def create_app():
         """Root endpoint for load balancer health checks"""
         return jsonify({"status": "ok"}), 200
 
-    # Create tables
-    with app.app_context():
-        db.create_all()
+    # Create tables (production runs `flask blacklist migrate` once as a release step instead)
+    if app.config['DB_CREATE_ALL_ON_STARTUP']:
+        with app.app_context():
+            db.create_all()
+
+    # Build the lookup negative cache before serving traffic (before fork when preloaded)
+    if app.config['BLOOM_FILTER_ENABLED']:
+        try:
+            BlacklistBloomFilter.get_state(app).rebuild()
+        except Exception as e:
+            # E.g. schema not migrated yet: lookups use the database until the next rebuild
+            from app.utils import setup_logging
+            setup_logging().warning("Bloom filter build failed at startup", error=str(e))
 
     # Wrap app with New Relic WSGI middleware if enabled
     if os.environ.get('NEW_RELIC_LICENSE_KEY'):
@@ -48,4 +96,18 @@ def create_app():
         except ImportError:
             pass  # New Relic not installed, continue without it
 
-    return app
\ No newline at end of file
+    return app
+
+
+def __getattr__(name):
+    # Flask-Marshmallow is unused by the routes; import it only if something asks for `app.ma`
+    if name == 'ma':
+        from flask import current_app, has_app_context
+        from flask_marshmallow import Marshmallow
+
+        global ma
+        ma = Marshmallow()
+        if has_app_context():
+            ma.init_app(current_app)
+        return ma
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
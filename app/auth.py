@@ -1,38 +1,52 @@
-from flask import request, jsonify
+from flask import request
+from app.json_response import jsonify
 from functools import wraps
 from app.config import Config
+from app.ratelimit import check_rate_limit
+from app.server_timing import phase
 
 def require_bearer_token(f):
     """Decorator to require Bearer token authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
+        # Token check and rate limit are the "auth" Server-Timing phase
+        with phase('auth'):
+            rejected = _authenticate()
+        if rejected is not None:
+            return rejected
+        return f(*args, **kwargs)
 
-        if not auth_header:
-            return jsonify({
-                'error': 'Unauthorized',
-                'message': 'Authorization header is required'
-            }), 401
+    return decorated_function
 
-        try:
-            auth_type, token = auth_header.split(' ', 1)
-            if auth_type.lower() != 'bearer':
-                return jsonify({
-                    'error': 'Unauthorized',
-                    'message': 'Authorization type must be Bearer'
-                }), 401
-        except ValueError:
-            return jsonify({
-                'error': 'Unauthorized',
-                'message': 'Invalid Authorization header format'
-            }), 401
 
-        if token != Config.APP_ALLOWED_BEARER:
+def _authenticate():
+    """The 401/429 response for the current request, or None if it may proceed"""
+    auth_header = request.headers.get('Authorization')
+
+    if not auth_header:
+        return jsonify({
+            'error': 'Unauthorized',
+            'message': 'Authorization header is required'
+        }), 401
+
+    try:
+        auth_type, token = auth_header.split(' ', 1)
+        if auth_type.lower() != 'bearer':
             return jsonify({
                 'error': 'Unauthorized',
-                'message': 'Invalid token'
+                'message': 'Authorization type must be Bearer'
             }), 401
+    except ValueError:
+        return jsonify({
+            'error': 'Unauthorized',
+            'message': 'Invalid Authorization header format'
+        }), 401
 
-        return f(*args, **kwargs)
+    if token != Config.APP_ALLOWED_BEARER:
+        return jsonify({
+            'error': 'Unauthorized',
+            'message': 'Invalid token'
+        }), 401
 
-    return decorated_function
+    # Per-token and per-app_uuid token buckets shared by all workers
+    return check_rate_limit(token)
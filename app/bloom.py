@@ -0,0 +1,277 @@
+"""
+In-process Bloom filter used as a negative cache for blacklist lookups
+Definite misses are answered without touching the database
+"""
+import hashlib
+import math
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app.canonical import canonicalize_email
+from app.snapshot import DELTA_ID_OVERLAP
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter backed by a bytearray"""
+
+    def __init__(self, capacity, error_rate):
+        """
+        Args:
+            capacity: Expected number of elements
+            error_rate: Target false-positive rate (0 < error_rate < 1)
+        """
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        """Derive bit positions with double hashing over one BLAKE2b digest"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """Add a key to the filter"""
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+
+class BlacklistBloomFilter:
+    """
+    Flask extension that keeps a Bloom filter of blacklisted emails per worker
+
+    The filter is built from the ``blacklists`` table when the app starts,
+    updated on every insert and rebuilt in a background thread once it is
+    older than ``BLOOM_FILTER_REBUILD_INTERVAL`` seconds. Rows inserted by
+    other workers or the import CLI are added by polling ``id > last_id``
+    every ``BLOOM_FILTER_REFRESH_INTERVAL`` seconds, like the snapshot delta.
+    """
+
+    extension_name = 'blacklist_bloom'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOOM_FILTER_ENABLED', False)
+        app.config.setdefault('BLOOM_FILTER_CAPACITY', 1000000)
+        app.config.setdefault('BLOOM_FILTER_ERROR_RATE', 0.001)
+        app.config.setdefault('BLOOM_FILTER_REBUILD_INTERVAL', 300)
+        app.config.setdefault('BLOOM_FILTER_REFRESH_INTERVAL', 5)
+        app.extensions[self.extension_name] = _BloomState(app)
+
+        from app.models import Blacklist
+        if not event.contains(Blacklist, 'after_insert', add_email_to_bloom):
+            event.listen(Blacklist, 'after_insert', add_email_to_bloom)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the filter state of the given (or current) app, or None if disabled"""
+        app = app or current_app
+        state = app.extensions.get(BlacklistBloomFilter.extension_name)
+        if state is None or not app.config['BLOOM_FILTER_ENABLED']:
+            return None
+        return state
+
+
+class _BloomState:
+    """Per-app Bloom filter, counters and rebuild bookkeeping"""
+
+    def __init__(self, app):
+        self.app = app
+        self.filter = None
+        self.built_at = None
+        self.build_time_ms = None
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+        self.last_id = 0
+        self._built_max_id = 0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending = []
+
+    def _new_filter(self):
+        config = self.app.config
+        return BloomFilter(config['BLOOM_FILTER_CAPACITY'], config['BLOOM_FILTER_ERROR_RATE'])
+
+    def rebuild(self):
+        """Build a fresh filter from the blacklists table and swap it in"""
+        from app import db
+        from app.models import Blacklist
+
+        with self._lock:
+            # Inserts seen from now on are replayed into the new filter
+            self._rebuilding = True
+
+        start_time = time.monotonic()
+        bloom = self._new_filter()
+        try:
+            with self.app.app_context():
+                # Rows committed after this are picked up by the refresh polling
+                max_id = db.session.query(db.func.max(Blacklist.id)).scalar() or 0
+                query = db.session.query(Blacklist.email_canonical, Blacklist.email).yield_per(10000)
+                for canonical, email in query:
+                    bloom.add(canonical or canonicalize_email(email))
+                db.session.remove()
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            # Inserts that happened while the table was being scanned
+            for email in self._pending:
+                bloom.add(email)
+            self._pending = []
+            self.filter = bloom
+            self.built_at = time.monotonic()
+            self.build_time_ms = (self.built_at - start_time) * 1000
+            self._built_max_id = max_id
+            self.last_id = max(self.last_id, max_id)
+            self._rebuilding = False
+        self._refreshed_at = self.built_at
+
+    def _maybe_schedule_rebuild(self):
+        interval = self.app.config['BLOOM_FILTER_REBUILD_INTERVAL']
+        if not interval or self.built_at is None:
+            return
+        if time.monotonic() - self.built_at < interval:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        thread = threading.Thread(target=self._rebuild_in_background, daemon=True)
+        thread.start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            # Keep serving from the previous filter; retry on the next interval
+            with self._lock:
+                self.built_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._refreshed_at < self.app.config['BLOOM_FILTER_REFRESH_INTERVAL']:
+            return
+        self._refreshed_at = now
+
+        from app import db
+        from app.models import Blacklist
+
+        since = max(self._built_max_id, self.last_id - DELTA_ID_OVERLAP)
+        rows = db.session.query(Blacklist.id, Blacklist.email_canonical, Blacklist.email) \
+            .filter(Blacklist.id > since).all()
+        with self._lock:
+            bloom = self.filter
+            for row_id, canonical, email in rows:
+                key = canonical or canonicalize_email(email)
+                # The overlap re-reads recent rows; only count each key once
+                if key not in bloom:
+                    bloom.add(key)
+                if self._rebuilding:
+                    self._pending.append(key)
+                self.last_id = max(self.last_id, row_id)
+
+    def might_contain(self, email):
+        """
+        Return False only if the email is definitely not blacklisted
+
+        Before the first build completes every email is treated as a possible
+        member so lookups fall through to the database.
+        """
+        self._maybe_schedule_rebuild()
+        bloom = self.filter
+        if bloom is None:
+            return True
+        self._maybe_refresh()
+        if email in bloom:
+            return True
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def add(self, email):
+        """Add a newly inserted email to the live filter"""
+        with self._lock:
+            if self.filter is not None:
+                self.filter.add(email)
+            if self._rebuilding:
+                self._pending.append(email)
+
+    def record_hit(self, count=1):
+        """The filter said maybe and the database confirmed the email"""
+        with self._lock:
+            self.hits += count
+
+    def record_false_positive(self, count=1):
+        """The filter said maybe but the database had no row"""
+        with self._lock:
+            self.false_positives += count
+
+    def stats(self):
+        """Counters and sizing information for the current filter"""
+        bloom = self.filter
+        negatives = self.misses + self.false_positives
+        stats = {
+            'enabled': True,
+            'ready': bloom is not None,
+            'build_time_ms': self.build_time_ms,
+            'age_seconds': (time.monotonic() - self.built_at) if self.built_at else None,
+            'last_id': self.last_id,
+            'checks': self.hits + negatives,
+            'hits': self.hits,
+            'misses': self.misses,
+            'false_positives': self.false_positives,
+            'observed_false_positive_rate': (self.false_positives / negatives) if negatives else 0.0,
+        }
+        if bloom is not None:
+            stats.update({
+                'capacity': bloom.capacity,
+                'error_rate': bloom.error_rate,
+                'num_bits': bloom.num_bits,
+                'num_hashes': bloom.num_hashes,
+                'size_bytes': len(bloom.bits),
+                'elements': len(bloom),
+            })
+        return stats
+
+
+def add_email_to_bloom(mapper, connection, target):
+    """SQLAlchemy ``after_insert`` listener keeping the filter in sync with ORM inserts"""
+    if not has_app_context():
+        return
+    state = BlacklistBloomFilter.get_state()
+    if state is not None:
+        state.add(target.email_canonical or canonicalize_email(target.email))
@@ -0,0 +1,123 @@
+"""
+Email canonicalization
+Turns every spelling of a mailbox into one key, stored at write time in the
+``email_canonical`` column and used by every lookup:
+case folding, IDN domains to punycode and per-provider rules such as Gmail's
+ignored dots and ``+tag`` suffixes.
+
+Provider rules come from EMAIL_CANONICAL_RULES, e.g.
+    gmail.com=dots,plus;googlemail.com=dots,plus,alias:gmail.com;outlook.com=plus
+
+The 64-bit ``email_digest`` of the canonical form is what the lookup index
+is built on; the canonical string only confirms the match.
+"""
+import hashlib
+
+from flask import current_app, has_app_context
+
+DEFAULT_CANONICAL_RULES = 'gmail.com=dots,plus;googlemail.com=dots,plus,alias:gmail.com'
+
+
+class ProviderRule:
+    """How one mail provider treats the local part"""
+
+    __slots__ = ('strip_dots', 'tag_separator', 'alias')
+
+    def __init__(self, strip_dots=False, tag_separator=None, alias=None):
+        self.strip_dots = strip_dots
+        self.tag_separator = tag_separator
+        self.alias = alias
+
+
+def parse_canonical_rules(value):
+    """
+    Parse ``domain=flag,flag;domain=flag`` into ``{domain: ProviderRule}``
+
+    Flags: ``dots`` (ignore dots), ``plus`` or ``tag:<char>`` (drop the
+    suffix after the separator) and ``alias:<domain>`` (canonical domain).
+    """
+    rules = {}
+    for item in (value or '').split(';'):
+        if '=' not in item:
+            continue
+        domain, flags = item.split('=', 1)
+        rule = ProviderRule()
+        for flag in flags.split(','):
+            flag = flag.strip().lower()
+            if flag == 'dots':
+                rule.strip_dots = True
+            elif flag == 'plus':
+                rule.tag_separator = '+'
+            elif flag.startswith('tag:') and len(flag) > 4:
+                rule.tag_separator = flag[4:]
+            elif flag.startswith('alias:'):
+                rule.alias = flag[6:].strip()
+        rules[domain.strip().lower()] = rule
+    return rules
+
+
+def _canonical_domain(domain):
+    domain = domain.strip().rstrip('.').lower()
+    if domain.isascii():
+        return domain
+    try:
+        # IDNA 2003 as shipped with Python; labels that cannot be encoded stay as is
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+class EmailCanonicalizer:
+    """Callable mapping an email address to its canonical form"""
+
+    def __init__(self, rules=None):
+        self.rules = parse_canonical_rules(DEFAULT_CANONICAL_RULES) if rules is None else rules
+
+    def __call__(self, email):
+        email = email.strip()
+        local, at, domain = email.rpartition('@')
+        if not at:
+            return email.casefold()
+
+        domain = _canonical_domain(domain)
+        local = local.casefold()
+        rule = self.rules.get(domain)
+        if rule is not None:
+            if rule.tag_separator:
+                local = local.split(rule.tag_separator, 1)[0]
+            if rule.strip_dots:
+                local = local.replace('.', '')
+            if rule.alias:
+                domain = rule.alias
+        return f'{local}@{domain}'
+
+
+_default_canonicalizer = EmailCanonicalizer()
+
+
+def get_canonicalizer():
+    """Canonicalizer for the current app's EMAIL_CANONICAL_RULES, built on first use"""
+    if not has_app_context():
+        return _default_canonicalizer
+    app = current_app._get_current_object()
+    rules = app.config.get('EMAIL_CANONICAL_RULES', DEFAULT_CANONICAL_RULES)
+    cached = app.extensions.get('email_canonicalizer')
+    if cached is None or cached[0] != rules:
+        cached = app.extensions['email_canonicalizer'] = (rules, EmailCanonicalizer(parse_canonical_rules(rules)))
+    return cached[1]
+
+
+def canonicalize_email(email):
+    """Canonical form of ``email`` under the current app's rules"""
+    return get_canonicalizer()(email)
+
+
+def email_digest(canonical):
+    """
+    Signed 64-bit BLAKE2b digest of a canonical email, stored in ``email_digest``
+
+    Signed so it fits a BIGINT column; ``& 0xFFFFFFFFFFFFFFFF`` gives the
+    unsigned hash used by the snapshot.
+    """
+    return int.from_bytes(hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).digest(),
+                          'little', signed=True)
@@ -0,0 +1,199 @@
+"""
+Change feed of the blacklist table for client-side replicas
+Clients page through ``GET /blacklists/changes?since=<cursor>`` where the
+cursor is the id of the last change they applied. Every inserting
+transaction takes the ``dataset_versions`` row lock before its ids are
+allocated (see add_to_blacklist, the bulk endpoint and the importer), so ids
+become visible in order and a cursor never skips a row that commits late.
+
+Long polls (``wait``) do not query the database per waiter: one notifier
+thread per worker polls ``max(id)`` every CHANGES_POLL_INTERVAL seconds while
+someone is waiting, and inserts made by the worker itself wake its waiters
+right after commit. Each waiter occupies a gunicorn thread, so waits are
+only enabled by default with threaded workers (GUNICORN_THREADS > 1) and are
+capped at half of the threads per worker.
+"""
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.telemetry import telemetry
+
+
+def fetch_changes(since, limit):
+    """
+    Changes after ``since`` in id order
+
+    Args:
+        since: Cursor (id of the last change already applied)
+        limit: Maximum number of changes
+
+    Returns:
+        List of change dicts; the id of the last one is the next cursor
+    """
+    from app import db
+    from app.models import Blacklist
+
+    table = Blacklist.__table__
+    query = select(table.c.id, table.c.email, table.c.email_canonical, table.c.blocked_reason,
+                   table.c.created_at) \
+        .where(table.c.id > since).order_by(table.c.id).limit(limit)
+    return [
+        {
+            'op': 'insert',
+            'id': row_id,
+            'email': email,
+            'email_canonical': email_canonical,
+            'blocked_reason': blocked_reason,
+            'created_at': created_at.isoformat() + 'Z' if created_at is not None else None,
+        }
+        for row_id, email, email_canonical, blocked_reason, created_at in db.session.execute(query)
+    ]
+
+
+class ChangeNotifier:
+    """Flask extension waking long-polling change feed requests when new rows commit"""
+
+    extension_name = 'change_notifier'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHANGES_PAGE_SIZE', 1000)
+        threads = app.config.setdefault('GUNICORN_THREADS', 1)
+        app.config.setdefault('CHANGES_MAX_WAIT', 30 if threads > 1 else 0)
+        app.config.setdefault('CHANGES_MAX_WAITERS', threads // 2)
+        app.config.setdefault('CHANGES_POLL_INTERVAL', 1.0)
+        app.extensions[self.extension_name] = _ChangeNotifierState(app)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the notifier of the given (or current) app, or None if long polling is disabled"""
+        app = app or current_app
+        state = app.extensions.get(ChangeNotifier.extension_name)
+        if state is None or app.config['CHANGES_MAX_WAIT'] <= 0:
+            return None
+        return state
+
+
+class _ChangeNotifierState:
+    """Per-worker latest id seen on the primary and the requests waiting for a newer one"""
+
+    def __init__(self, app):
+        self.app = app
+        self.latest_id = None
+        self.tick = 0
+        self.waiters = 0
+        self.polls = 0
+        self.wakeups = 0
+        self._condition = threading.Condition()
+        self._poll_now = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _read_latest_id(self):
+        from app import db
+        from app.models import Blacklist
+
+        # From the primary: the notifier decides when replicas are worth asking
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                return connection.execute(select(func.max(Blacklist.__table__.c.id))).scalar() or 0
+
+    def _ensure_thread(self):
+        # Called with the condition held; threads do not survive fork
+        pid = os.getpid()
+        if self._pid != pid or self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='change-notifier', daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Idle workers do not poll
+                while not self.waiters:
+                    self._condition.wait()
+            try:
+                latest_id = self._read_latest_id()
+            except Exception:
+                latest_id = None
+            self.polls += 1
+            self.publish(latest_id)
+            self._poll_now.wait(self.app.config['CHANGES_POLL_INTERVAL'])
+            self._poll_now.clear()
+
+    def publish(self, latest_id):
+        """Record the newest known id (None: unknown) and wake the waiters that are behind it"""
+        with self._condition:
+            if latest_id is not None and (self.latest_id is None or latest_id > self.latest_id):
+                self.latest_id = latest_id
+            self.tick += 1
+            self._condition.notify_all()
+
+    def request_poll(self):
+        """Poll now instead of at the end of the interval (rows committed, id unknown)"""
+        if self.waiters:
+            self._poll_now.set()
+
+    def wait(self, since, after_tick, timeout):
+        """
+        Block until a change after ``since`` may exist or ``timeout`` seconds pass
+
+        Args:
+            since: Cursor the caller has already read up to
+            after_tick: ``tick`` read before the caller's last query; only newer
+                notifications count (a lagging replica may have missed the last one)
+            timeout: Seconds to wait at most
+
+        Returns:
+            True if woken by a newer id, False on timeout or with too many waiters
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self.waiters >= self.app.config['CHANGES_MAX_WAITERS']:
+                telemetry.incr('Custom/Blacklist/ChangesWaitRejected')
+                return False
+            self.waiters += 1
+            try:
+                self._ensure_thread()
+                self._condition.notify_all()
+                while self.tick == after_tick or self.latest_id is None or self.latest_id <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                self.wakeups += 1
+                return True
+            finally:
+                self.waiters -= 1
+
+    def stats(self):
+        return {
+            'enabled': True,
+            'latest_id': self.latest_id,
+            'waiters': self.waiters,
+            'polls': self.polls,
+            'wakeups': self.wakeups,
+        }
+
+
+def notify_changes(latest_id=None):
+    """
+    Wake this worker's long polls after it committed new rows
+
+    Args:
+        latest_id: Highest id committed; None makes the notifier poll right away
+    """
+    state = ChangeNotifier.get_state()
+    if state is None:
+        return
+    if latest_id is not None:
+        state.publish(latest_id)
+    else:
+        state.request_poll()
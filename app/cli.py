@@ -0,0 +1,112 @@
+"""
+Flask CLI commands for blacklist maintenance
+Usage: flask blacklist <command> --help
+"""
+import sys
+import time
+
+import click
+from flask.cli import AppGroup
+
+blacklist_cli = AppGroup('blacklist', help='Blacklist maintenance commands.')
+
+
+def _guess_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+@blacklist_cli.command('import')
+@click.argument('source', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (guessed from the file extension by default).')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per COPY/executemany batch.')
+@click.option('--offset', default=0, show_default=True,
+              help='Byte offset to resume from (as printed by a previous run).')
+@click.option('--header', help='Comma-separated CSV columns, required to resume stdin past the header.')
+@click.option('--client-ip', default='127.0.0.1', show_default=True,
+              help='client_ip stored for records without one.')
+def import_command(source, fmt, batch_size, offset, header, client_ip):
+    """Stream CSV/NDJSON from SOURCE (a file or - for stdin) into the blacklist."""
+    from app.importer import import_stream, read_csv_header
+
+    fmt = fmt or ('csv' if source == '-' else _guess_format(source))
+    columns = [name.strip() for name in header.split(',')] if header else None
+
+    stream = sys.stdin.buffer if source == '-' else open(source, 'rb')
+    try:
+        if fmt == 'csv' and offset and columns is None:
+            if not stream.seekable():
+                raise click.UsageError('--header is required to resume CSV from stdin')
+            columns = read_csv_header(stream)
+
+        def report(stats):
+            click.echo(
+                f"read={stats['read']} inserted={stats['inserted']} duplicate={stats['duplicate']} "
+                f"invalid={stats['invalid']} rows/s={stats['rows_per_second']:.0f} offset={stats['offset']}",
+                err=True
+            )
+
+        stats = import_stream(stream, fmt, batch_size=batch_size, offset=offset, header=columns,
+                              default_client_ip=client_ip, progress=report)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+    click.echo(
+        f"Imported {stats['inserted']} of {stats['read']} rows "
+        f"({stats['duplicate']} duplicate, {stats['invalid']} invalid) "
+        f"in {stats['elapsed_seconds']:.1f}s, {stats['rows_per_second']:.0f} rows/s. "
+        f"Resume offset: {stats['offset']}"
+    )
+
+
+@blacklist_cli.command('export')
+@click.argument('dest', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', show_default=True)
+@click.option('--after-id', default=0, show_default=True, help='Only export rows with a greater id.')
+@click.option('--limit', type=int, help='Maximum number of rows (default: whole table).')
+@click.option('--page-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+def export_command(dest, fmt, after_id, limit, page_size):
+    """Stream the blacklist to DEST (a file or - for stdout) ordered by id."""
+    from app.exporter import export_rows
+
+    stream = sys.stdout if dest == '-' else open(dest, 'w', newline='')
+    try:
+        for chunk in export_rows(fmt, after_id=after_id, limit=limit, page_size=page_size):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+@blacklist_cli.command('build-snapshot')
+@click.option('--path', help='Snapshot file (defaults to SNAPSHOT_PATH).')
+@click.option('--bucket-bits', default=16, show_default=True, help='Leading hash bits in the offsets table.')
+def build_snapshot_command(path, bucket_bits):
+    """Write the shared hash snapshot read by every worker and swap it in atomically."""
+    from flask import current_app
+    from app.snapshot import rebuild_snapshot
+
+    path = path or current_app.config['SNAPSHOT_PATH']
+    start_time = time.monotonic()
+    result = rebuild_snapshot(path, bucket_bits=bucket_bits)
+    if result is None:
+        click.echo(f"Another process is already rebuilding {path}")
+        return
+    count, max_id = result
+    click.echo(f"Wrote {count} hashes up to id {max_id} to {path} in {time.monotonic() - start_time:.1f}s")
+
+
+@blacklist_cli.command('migrate')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows updated per transaction.')
+@click.option('--recompute', is_flag=True,
+              help='Recompute derived columns for every row (e.g. after changing EMAIL_CANONICAL_RULES).')
+def migrate_command(batch_size, recompute):
+    """Create missing tables, columns and indexes and backfill them in batches."""
+    from app.migrations import run_migrations
+
+    start_time = time.monotonic()
+    updated = run_migrations(batch_size=batch_size, recompute=recompute,
+                             progress=lambda count: click.echo(f"updated={count}", err=True))
+    summary = ', '.join(f"{column}: {count} rows" for column, count in updated.items())
+    click.echo(f"Migrated ({summary}) in {time.monotonic() - start_time:.1f}s")
@@ -1,6 +1,15 @@
 import os
 from datetime import timedelta
 
+
+def parse_message_rules(value):
+    """Parse 'message=number;message=number' into a dict of floats"""
+    rules = {}
+    for item in filter(None, (part.strip() for part in value.split(';'))):
+        message, _, number = item.rpartition('=')
+        rules[message.strip()] = float(number)
+    return rules
+
 class Config:
     """Configuration class for the application"""
 
@@ -22,9 +31,143 @@ class Config:
     # SQLAlchemy configuration
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Set to false when `flask blacklist migrate` runs as a release step (see Procfile)
+    DB_CREATE_ALL_ON_STARTUP = os.environ.get('DB_CREATE_ALL_ON_STARTUP', 'true').lower() == 'true'
+
+    # Gunicorn concurrency as launched by Procfile/start.sh (gthread workers); 1 thread means sync workers
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 3))  # workers
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 1))  # threads per worker
+
+    # Connection pool (size/overflow/timeout only apply to server databases, not SQLite)
+    # One connection per gunicorn thread; the extra slot covers background rebuilds
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', GUNICORN_THREADS + 1))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 3))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # seconds waiting for a connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds, below RDS/ELB idle timeouts
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # Provider rules for the email_canonical lookup key ("domain=flags;..."; see app/canonical.py)
+    EMAIL_CANONICAL_RULES = os.environ.get(
+        'EMAIL_CANONICAL_RULES', 'gmail.com=dots,plus;googlemail.com=dots,plus,alias:gmail.com'
+    )
+
+    # Read replicas (comma separated URLs); lookups go to the primary if none qualifies
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL', '')
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))  # seconds between lag probes
+    # Reads after a write stay on the primary this long (default: max lag + check interval)
+    REPLICA_STICKY_SECONDS = float(os.environ['REPLICA_STICKY_SECONDS']) if os.environ.get('REPLICA_STICKY_SECONDS') else None
+    REPLICA_WRITES_PATH = os.environ.get('REPLICA_WRITES_PATH', '/dev/shm/blacklist-writes.db' if os.path.isdir('/dev/shm') else '/tmp/blacklist-writes.db')
+
+    # Per-client token buckets (requests/s and burst) shared by all workers via SQLite
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', '/dev/shm/blacklist-ratelimit.db' if os.path.isdir('/dev/shm') else '/tmp/blacklist-ratelimit.db')
+    RATE_LIMIT_TOKEN_RATE = float(os.environ.get('RATE_LIMIT_TOKEN_RATE', 100))
+    RATE_LIMIT_TOKEN_BURST = int(os.environ.get('RATE_LIMIT_TOKEN_BURST', 200))
+    RATE_LIMIT_APP_RATE = float(os.environ.get('RATE_LIMIT_APP_RATE', 50))
+    RATE_LIMIT_APP_BURST = int(os.environ.get('RATE_LIMIT_APP_BURST', 100))
+    RATE_LIMIT_PRUNE_INTERVAL = int(os.environ.get('RATE_LIMIT_PRUNE_INTERVAL', 60))  # seconds between deletes of refilled buckets
+
+    # Load shedding: 503 when in-flight requests or queue time exceed these limits
+    LOAD_SHED_ENABLED = os.environ.get('LOAD_SHED_ENABLED', 'false').lower() == 'true'
+    LOAD_SHED_PATH = os.environ.get('LOAD_SHED_PATH', '/dev/shm/blacklist-inflight.bin' if os.path.isdir('/dev/shm') else '/tmp/blacklist-inflight.bin')
+    # Requests only count once a gunicorn thread runs them: by default shed when every thread but one per
+    # worker is busy. 0 (the default with sync workers) leaves only the X-Request-Start check
+    LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', WEB_CONCURRENCY * (GUNICORN_THREADS - 1)))
+    LOAD_SHED_MAX_QUEUE_MS = int(os.environ.get('LOAD_SHED_MAX_QUEUE_MS', 0))  # 0 disables the X-Request-Start check
+
+    # Bloom filter negative cache in front of blacklist lookups
+    BLOOM_FILTER_ENABLED = os.environ.get('BLOOM_FILTER_ENABLED', 'false').lower() == 'true'
+    BLOOM_FILTER_CAPACITY = int(os.environ.get('BLOOM_FILTER_CAPACITY', 1000000))
+    BLOOM_FILTER_ERROR_RATE = float(os.environ.get('BLOOM_FILTER_ERROR_RATE', 0.001))
+    BLOOM_FILTER_REBUILD_INTERVAL = int(os.environ.get('BLOOM_FILTER_REBUILD_INTERVAL', 300))  # seconds
+    BLOOM_FILTER_REFRESH_INTERVAL = int(os.environ.get('BLOOM_FILTER_REFRESH_INTERVAL', 5))  # seconds, polls rows from other workers
+
+    # Shared mmapped hash snapshot (preferred over the Bloom filter when enabled)
+    SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', 'false').lower() == 'true'
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', '/tmp/blacklist.snapshot')
+    SNAPSHOT_CHECK_INTERVAL = int(os.environ.get('SNAPSHOT_CHECK_INTERVAL', 10))  # seconds
+    SNAPSHOT_DELTA_REFRESH_INTERVAL = int(os.environ.get('SNAPSHOT_DELTA_REFRESH_INTERVAL', 5))  # seconds
+    SNAPSHOT_REBUILD_DELTA_SIZE = int(os.environ.get('SNAPSHOT_REBUILD_DELTA_SIZE', 10000))  # rows, 0 disables rebuilds
+    SNAPSHOT_REBUILD_MIN_INTERVAL = int(os.environ.get('SNAPSHOT_REBUILD_MIN_INTERVAL', 60))  # seconds between attempts
+
+    # HTTP caching of GET /blacklists/<email>: ETag from the dataset version, max-age per result
+    LOOKUP_CACHE_ENABLED = os.environ.get('LOOKUP_CACHE_ENABLED', 'true').lower() == 'true'
+    LOOKUP_CACHE_MAX_AGE_POSITIVE = int(os.environ.get('LOOKUP_CACHE_MAX_AGE_POSITIVE', 300))  # seconds
+    LOOKUP_CACHE_MAX_AGE_NEGATIVE = int(os.environ.get('LOOKUP_CACHE_MAX_AGE_NEGATIVE', 0))  # 0: always revalidate
+    LOOKUP_CACHE_PUBLIC = os.environ.get('LOOKUP_CACHE_PUBLIC', 'false').lower() == 'true'  # Let shared caches (CDN) store
+    DATASET_VERSION_CHECK_INTERVAL = float(os.environ.get('DATASET_VERSION_CHECK_INTERVAL', 1))  # seconds
+    # No ETags while a new version may be invisible to replicas/filters (default: from their settings)
+    DATASET_VERSION_SETTLE_SECONDS = float(os.environ['DATASET_VERSION_SETTLE_SECONDS']) if os.environ.get('DATASET_VERSION_SETTLE_SECONDS') else None
+
+    # Batch lookup limits for POST /blacklists/check
+    BATCH_CHECK_MAX_EMAILS = int(os.environ.get('BATCH_CHECK_MAX_EMAILS', 1000))
+    BATCH_CHECK_CHUNK_SIZE = int(os.environ.get('BATCH_CHECK_CHUNK_SIZE', 500))  # Emails per IN query
+
+    # Bulk insert limits for POST /blacklists/bulk
+    BULK_INSERT_MAX_ITEMS = int(os.environ.get('BULK_INSERT_MAX_ITEMS', 5000))
+    BULK_INSERT_CHUNK_SIZE = int(os.environ.get('BULK_INSERT_CHUNK_SIZE', 500))  # Rows per INSERT statement
+
+    # Group commit for POST /blacklists: concurrent inserts of a worker share one transaction
+    INSERT_GROUP_COMMIT_ENABLED = os.environ.get('INSERT_GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    INSERT_GROUP_COMMIT_WAIT_MS = float(os.environ.get('INSERT_GROUP_COMMIT_WAIT_MS', 2))  # Wait for more rows after the first
+    INSERT_GROUP_COMMIT_MAX_ROWS = int(os.environ.get('INSERT_GROUP_COMMIT_MAX_ROWS', 100))
+    INSERT_GROUP_COMMIT_QUEUE_SIZE = int(os.environ.get('INSERT_GROUP_COMMIT_QUEUE_SIZE', 10000))  # Beyond this: 503
+    INSERT_GROUP_COMMIT_TIMEOUT = float(os.environ.get('INSERT_GROUP_COMMIT_TIMEOUT', 10))  # seconds a request waits
+    # 202 Accepted for callers sending "Prefer: respond-async" (queued rows are lost if the worker dies)
+    INSERT_ASYNC_ENABLED = os.environ.get('INSERT_ASYNC_ENABLED', 'false').lower() == 'true'
+
+    # Rows fetched per round trip by GET /blacklists and flask blacklist export
+    EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 1000))
+    # Rows per GET /blacklists response (default and cap); full dumps go through flask blacklist export
+    EXPORT_MAX_ROWS = int(os.environ.get('EXPORT_MAX_ROWS', 10000))
+
+    # Change feed GET /blacklists/changes: page cap, long-poll cap, waiters per worker and notifier poll
+    CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', 1000))
+    # A waiter holds a whole sync worker, so long polling is off by default without threads
+    CHANGES_MAX_WAIT = float(os.environ.get('CHANGES_MAX_WAIT', 30 if GUNICORN_THREADS > 1 else 0))  # seconds, 0 disables long polling
+    # Beyond this, requests return at once; half the threads stay free for lookups
+    CHANGES_MAX_WAITERS = int(os.environ.get('CHANGES_MAX_WAITERS', GUNICORN_THREADS // 2))
+    CHANGES_POLL_INTERVAL = float(os.environ.get('CHANGES_POLL_INTERVAL', 1))  # seconds, one query per worker
+
+    # Precompiled BlacklistSchema load/dump on the request path (false: marshmallow)
+    SCHEMA_FAST_PATH = os.environ.get('SCHEMA_FAST_PATH', 'true').lower() == 'true'
+    # JSON response encoder: stdlib, orjson (if installed) or flask
+    JSON_RESPONSE_ENCODER = os.environ.get('JSON_RESPONSE_ENCODER', 'stdlib')
 
     # Logging configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'  # Write logs from a background thread
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # Records beyond this are dropped
+    # Per-message sampling (fraction kept) and rate caps (records/s), e.g.
+    # LOG_SAMPLE_RATES="Email found in blacklist=0.01;Email not found in blacklist=0.01"
+    LOG_SAMPLE_RATES = parse_message_rules(os.environ.get('LOG_SAMPLE_RATES', ''))
+    LOG_RATE_LIMITS = parse_message_rules(os.environ.get('LOG_RATE_LIMITS', ''))
+    LOG_SUPPRESSED_REPORT_INTERVAL = int(os.environ.get('LOG_SUPPRESSED_REPORT_INTERVAL', 60))  # seconds
+
+    # Prometheus GET /metrics: each process writes a memory-mapped file in METRICS_DIR, scrapes merge them all
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp', 'blacklist-metrics')
+    METRICS_WORKER_STATS_INTERVAL = float(os.environ.get('METRICS_WORKER_STATS_INTERVAL', 5))  # seconds
+
+    # Server-Timing phase breakdown (auth, parse, validation, db, render); the header is only sent when
+    # X-Debug-Token matches SERVER_TIMING_TOKEN, so none without a token (the phases still feed /metrics)
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_TOKEN = os.environ.get('SERVER_TIMING_TOKEN', '')
+
+    # SQL profiler: per-fingerprint statement stats in GET /debug/queries, optional slow statement log
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', 'true').lower() == 'true'
+    QUERY_PROFILER_MAX_FINGERPRINTS = int(os.environ.get('QUERY_PROFILER_MAX_FINGERPRINTS', 500))
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'false').lower() == 'true'
+    SLOW_QUERY_LOG_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_LOG_THRESHOLD_MS', 100))  # milliseconds
+
+    # Telemetry aggregator: newrelic, statsd, memory or none
+    TELEMETRY_BACKEND = os.environ.get('TELEMETRY_BACKEND', 'newrelic')
+    TELEMETRY_FLUSH_INTERVAL = float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', 10))  # seconds
+    STATSD_HOST = os.environ.get('STATSD_HOST', '127.0.0.1')
+    STATSD_PORT = int(os.environ.get('STATSD_PORT', 8125))
+    STATSD_PREFIX = os.environ.get('STATSD_PREFIX', 'blacklist')
 
     # New Relic configuration
     NEW_RELIC_LICENSE_KEY = os.environ.get('NEW_RELIC_LICENSE_KEY', '022ab198ef6059b8346e0d3aa7e6e9a3FFFFNRAL')
@@ -1,10 +1,63 @@
 """
-Database metrics helper for New Relic
-Measures and records database query response times
+Database metrics helper
+Measures database query response times (perf_counter_ns, monotonic) and
+records them through the buffered telemetry aggregator and the request's
+"db" Server-Timing phase
 """
 import time
 import functools
+import threading
 from contextlib import contextmanager
+from app.telemetry import telemetry
+from app.prometheus import observe_db_operation
+from app.server_timing import record_phase
+
+SLOW_QUERY_THRESHOLD_MS = 100
+
+# Stack of the db_operation_timer blocks running in this thread
+_operations = threading.local()
+
+
+class DbOperation:
+    """One timed block: its duration and the SQL statements it ran"""
+
+    __slots__ = ('operation_type', 'elapsed_ms', 'statements')
+
+    def __init__(self, operation_type):
+        self.operation_type = operation_type
+        self.elapsed_ms = 0.0
+        self.statements = 0
+
+
+def current_db_operation():
+    """The innermost db_operation_timer block of this thread, or None"""
+    stack = getattr(_operations, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def _elapsed_ms(start_ns):
+    return (time.perf_counter_ns() - start_ns) / 1e6
+
+
+def _record_success(operation_type, elapsed_time):
+    observe_db_operation(operation_type, elapsed_time, success=True)
+    telemetry.timing(f'Custom/Database/{operation_type.capitalize()}Time', elapsed_time)
+    telemetry.incr('Custom/Database/TotalQueries')
+    telemetry.add_attribute('db_operation', operation_type)
+    telemetry.add_attribute('db_response_time_ms', elapsed_time)
+
+    # Record slow query if > 100ms
+    if elapsed_time > SLOW_QUERY_THRESHOLD_MS:
+        telemetry.incr('Custom/Database/SlowQueries')
+
+
+def _record_error(operation_type, elapsed_time):
+    observe_db_operation(operation_type, elapsed_time, success=False)
+    telemetry.incr(f'Custom/Database/{operation_type.capitalize()}Error')
+    telemetry.incr('Custom/Database/TotalErrors')
+    telemetry.add_attribute('db_operation', operation_type)
+    telemetry.add_attribute('db_error_time_ms', elapsed_time)
+
 
 def measure_db_time(operation_type="query"):
     """
@@ -16,37 +69,8 @@ def measure_db_time(operation_type="query"):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
-            try:
-                result = func(*args, **kwargs)
-                elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-                
-                # Record metric in New Relic
-                try:
-                    import newrelic.agent
-                    metric_name = f'Custom/Database/{operation_type.capitalize()}Time'
-                    newrelic.agent.record_custom_metric(metric_name, elapsed_time)
-                    newrelic.agent.record_custom_metric('Custom/Database/TotalQueries', 1)
-                    newrelic.agent.add_custom_attribute('db_operation', operation_type)
-                    newrelic.agent.add_custom_attribute('db_response_time_ms', elapsed_time)
-                except (ImportError, AttributeError):
-                    pass  # New Relic not available
-                
-                return result
-            except Exception as e:
-                elapsed_time = (time.time() - start_time) * 1000
-                
-                # Record error metric
-                try:
-                    import newrelic.agent
-                    newrelic.agent.record_custom_metric(f'Custom/Database/{operation_type.capitalize()}Error', 1)
-                    newrelic.agent.record_custom_metric('Custom/Database/TotalErrors', 1)
-                    newrelic.agent.add_custom_attribute('db_operation', operation_type)
-                    newrelic.agent.add_custom_attribute('db_error_time_ms', elapsed_time)
-                except (ImportError, AttributeError):
-                    pass
-                
-                raise
+            with db_operation_timer(operation_type):
+                return func(*args, **kwargs)
         return wrapper
     return decorator
 
@@ -55,46 +79,37 @@ def measure_db_time(operation_type="query"):
 def db_operation_timer(operation_type="query"):
     """
     Context manager to measure database operation time
-    
+
+    The block (statements, pool checkout and commit) is one "db" Server-Timing
+    span; app.query_profiler still profiles each statement but does not add
+    them to the phase again.
+
     Usage:
-        with db_operation_timer("insert"):
+        with db_operation_timer("insert") as operation:
             db.session.add(entry)
             db.session.commit()
+        logger.info(..., db_time_ms=operation.elapsed_ms)
     """
-    start_time = time.time()
+    operation = DbOperation(operation_type)
+    stack = getattr(_operations, 'stack', None)
+    if stack is None:
+        stack = _operations.stack = []
+    stack.append(operation)
+    start_ns = time.perf_counter_ns()
     try:
-        yield
-        elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        
-        # Record metric in New Relic
-        try:
-            import newrelic.agent
-            metric_name = f'Custom/Database/{operation_type.capitalize()}Time'
-            newrelic.agent.record_custom_metric(metric_name, elapsed_time)
-            newrelic.agent.record_custom_metric('Custom/Database/TotalQueries', 1)
-            newrelic.agent.add_custom_attribute('db_operation', operation_type)
-            newrelic.agent.add_custom_attribute('db_response_time_ms', elapsed_time)
-            
-            # Record slow query if > 100ms
-            if elapsed_time > 100:
-                newrelic.agent.record_custom_metric('Custom/Database/SlowQueries', 1)
-                newrelic.agent.add_custom_attribute('slow_query_time_ms', elapsed_time)
-        except (ImportError, AttributeError):
-            pass  # New Relic not available
-    except Exception as e:
-        elapsed_time = (time.time() - start_time) * 1000
-        
-        # Record error metric
-        try:
-            import newrelic.agent
-            newrelic.agent.record_custom_metric(f'Custom/Database/{operation_type.capitalize()}Error', 1)
-            newrelic.agent.record_custom_metric('Custom/Database/TotalErrors', 1)
-            newrelic.agent.add_custom_attribute('db_operation', operation_type)
-            newrelic.agent.add_custom_attribute('db_error_time_ms', elapsed_time)
-        except (ImportError, AttributeError):
-            pass
-        
+        yield operation
+    except Exception:
+        operation.elapsed_ms = _elapsed_ms(start_ns)
+        _record_error(operation_type, operation.elapsed_ms)
         raise
+    else:
+        operation.elapsed_ms = _elapsed_ms(start_ns)
+        _record_success(operation_type, operation.elapsed_ms)
+    finally:
+        stack.pop()
+        if not stack:
+            # Nested blocks are already inside the outermost one's span
+            record_phase('db', int(operation.elapsed_ms * 1e6))
 
 
 def record_db_metric(operation_type, elapsed_time_ms, success=True):
@@ -106,22 +121,30 @@ def record_db_metric(operation_type, elapsed_time_ms, success=True):
         elapsed_time_ms: Time elapsed in milliseconds
         success: Whether the operation was successful
     """
-    try:
-        import newrelic.agent
-        if success:
-            metric_name = f'Custom/Database/{operation_type.capitalize()}Time'
-            newrelic.agent.record_custom_metric(metric_name, elapsed_time_ms)
-            newrelic.agent.record_custom_metric('Custom/Database/TotalQueries', 1)
-            
-            # Record slow query if > 100ms
-            if elapsed_time_ms > 100:
-                newrelic.agent.record_custom_metric('Custom/Database/SlowQueries', 1)
-        else:
-            newrelic.agent.record_custom_metric(f'Custom/Database/{operation_type.capitalize()}Error', 1)
-            newrelic.agent.record_custom_metric('Custom/Database/TotalErrors', 1)
-        
-        newrelic.agent.add_custom_attribute('db_operation', operation_type)
-        newrelic.agent.add_custom_attribute('db_response_time_ms', elapsed_time_ms)
-    except (ImportError, AttributeError):
-        pass  # New Relic not available
+    if current_db_operation() is None:
+        record_phase('db', int(elapsed_time_ms * 1e6))
+    if success:
+        _record_success(operation_type, elapsed_time_ms)
+    else:
+        _record_error(operation_type, elapsed_time_ms)
+
+
+def record_pool_checkout(wait_time_ms, in_use, overflow=False):
+    """
+    Record one connection pool checkout
+    
+    Args:
+        wait_time_ms: Time spent waiting for a connection in milliseconds
+        in_use: Connections checked out after this checkout
+        overflow: Whether the connection came from the overflow
+    """
+    telemetry.timing('Custom/Database/Pool/CheckoutWaitTime', wait_time_ms)
+    telemetry.timing('Custom/Database/Pool/InUse', in_use)
+    if overflow:
+        telemetry.incr('Custom/Database/Pool/Overflow')
+
 
+def record_pool_timeout():
+    """Record a checkout that gave up after pool_timeout"""
+    telemetry.incr('Custom/Database/Pool/Timeout')
+    telemetry.incr('Custom/Database/TotalErrors')
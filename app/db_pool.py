@@ -0,0 +1,121 @@
+"""
+Managed database connection pool
+Applies the DB_POOL_* settings to server databases and instruments checkouts
+(wait time, connections in use, overflow and timeouts) through db_metrics and
+statements through app.query_profiler
+"""
+import os
+import threading
+import time
+import weakref
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.db_metrics import record_pool_checkout, record_pool_timeout
+from app.query_profiler import instrument_engine
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            record_pool_timeout()
+            raise
+        wait_ms = (time.perf_counter() - start_time) * 1000
+
+        in_use = self.checkedout()
+        overflow = self.overflow() > 0
+        with self.stats_lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if overflow:
+                self.overflow_checkouts += 1
+        record_pool_checkout(wait_ms, in_use, overflow)
+        return connection
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'checkouts': self.checkouts,
+                'overflow_checkouts': self.overflow_checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': self.total_wait_ms / self.checkouts if self.checkouts else 0.0,
+                'max_wait_ms': self.max_wait_ms,
+            }
+
+
+_engines = weakref.WeakSet()
+
+
+def _dispose_inherited_pools():
+    # A preloaded master may have opened connections; children must not reuse its sockets
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_inherited_pools)
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension that sizes and instruments the pool from app config"""
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        _engines.add(engine)
+        instrument_engine(engine)
+        return engine
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        config = app.config
+
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        if sa_url.get_backend_name() != 'sqlite':
+            # SQLite gets StaticPool/NullPool from Flask-SQLAlchemy, which take no sizing
+            options.setdefault('poolclass', InstrumentedQueuePool)
+            options.setdefault('pool_size', config['DB_POOL_SIZE'])
+            options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+        return sa_url, options
+
+
+def get_pool_state(engine):
+    """Current pool state of ``engine`` in this worker"""
+    pool = engine.pool
+    state = {
+        'pid': os.getpid(),
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        state.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        state.update(pool.stats())
+    return state
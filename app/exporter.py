@@ -0,0 +1,127 @@
+"""
+Streaming export of the blacklist table
+Rows are read with keyset pagination on Blacklist.id (server-side cursors on
+PostgreSQL) and rendered straight from result tuples as NDJSON or CSV
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Blacklist
+
+EXPORT_COLUMNS = ('id', 'email', 'app_uuid', 'blocked_reason', 'client_ip', 'created_at')
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_row_pages(after_id=0, limit=None, page_size=1000):
+    """
+    Yield lists of row tuples ordered by id
+
+    Args:
+        after_id: Only rows with ``id > after_id`` are returned
+        limit: Maximum number of rows in total (None for the whole table)
+        page_size: Rows fetched per round trip
+    """
+    table = Blacklist.__table__
+    columns = [table.c[name] for name in EXPORT_COLUMNS]
+    remaining = limit
+
+    if db.engine.dialect.name == 'postgresql':
+        # One ordered query read through a named (server-side) cursor
+        query = select(*columns).where(table.c.id > after_id).order_by(table.c.id)
+        if limit is not None:
+            query = query.limit(limit)
+        with db.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=page_size) \
+                .execute(query)
+            for page in result.partitions(page_size):
+                yield page
+        return
+
+    # Keyset pagination: each page seeks on the primary key index
+    last_id = after_id
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        query = select(*columns).where(table.c.id > last_id).order_by(table.c.id).limit(size)
+        with db.engine.connect() as connection:
+            page = connection.execute(query).fetchall()
+        if not page:
+            return
+        yield page
+        last_id = page[-1][0]
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < size:
+            return
+
+
+def next_page_after_id(after_id, limit):
+    """
+    Cursor for the page following the first ``limit`` rows after ``after_id``
+
+    Reads at most two ids from the primary key index, so the HTTP export can
+    announce the next page before streaming this one.
+
+    Returns:
+        The id of the last row of this page if more rows follow it, else None
+    """
+    if limit <= 0:
+        return None
+    table = Blacklist.__table__
+    query = select(table.c.id).where(table.c.id > after_id).order_by(table.c.id).offset(limit - 1).limit(2)
+    with db.engine.connect() as connection:
+        ids = connection.execute(query).scalars().all()
+    return ids[0] if len(ids) == 2 else None
+
+
+def _format_timestamp(value):
+    return value.isoformat() + 'Z' if value is not None else None
+
+
+def render_ndjson(pages):
+    """Render pages of row tuples as NDJSON chunks (one chunk per page)"""
+    dumps = json.dumps
+    for page in pages:
+        yield ''.join(
+            dumps({
+                'id': row_id,
+                'email': email,
+                'app_uuid': app_uuid,
+                'blocked_reason': blocked_reason,
+                'client_ip': client_ip,
+                'created_at': _format_timestamp(created_at),
+            }) + '\n'
+            for row_id, email, app_uuid, blocked_reason, client_ip, created_at in page
+        )
+
+
+def render_csv(pages, header=True):
+    """Render pages of row tuples as CSV chunks, starting with the header line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for page in pages:
+        writer.writerows(
+            (row_id, email, app_uuid, blocked_reason, client_ip, _format_timestamp(created_at))
+            for row_id, email, app_uuid, blocked_reason, client_ip, created_at in page
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if header and buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_rows(fmt, after_id=0, limit=None, page_size=1000):
+    """Generator of text chunks for the requested export format"""
+    pages = iter_row_pages(after_id=after_id, limit=limit, page_size=page_size)
+    if fmt == 'csv':
+        return render_csv(pages)
+    return render_ndjson(pages)
@@ -0,0 +1,199 @@
+"""
+Group commit for single inserts (POST /blacklists)
+Requests hand their row to a per-worker committer thread and, in the default
+mode, wait for its outcome. The thread inserts whatever is queued in one
+transaction, waiting at most INSERT_GROUP_COMMIT_WAIT_MS for more rows after
+the first and taking at most INSERT_GROUP_COMMIT_MAX_ROWS, so concurrent
+inserts share one commit (one fsync) and each still gets its 201 or 409.
+
+With INSERT_ASYNC_ENABLED, callers sending ``Prefer: respond-async`` get
+``202 Accepted`` as soon as the row is queued; the outcome is only logged.
+Rows accepted that way are lost if the worker dies before the next commit.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from app.telemetry import telemetry
+
+
+class InsertQueueFull(Exception):
+    """The committer queue is at INSERT_GROUP_COMMIT_QUEUE_SIZE"""
+
+
+class GroupCommitter:
+    """Flask extension batching concurrent inserts of a worker into shared transactions"""
+
+    extension_name = 'group_commit'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSERT_GROUP_COMMIT_ENABLED', False)
+        app.config.setdefault('INSERT_ASYNC_ENABLED', False)
+        app.config.setdefault('INSERT_GROUP_COMMIT_WAIT_MS', 2)
+        app.config.setdefault('INSERT_GROUP_COMMIT_MAX_ROWS', 100)
+        app.config.setdefault('INSERT_GROUP_COMMIT_QUEUE_SIZE', 10000)
+        app.config.setdefault('INSERT_GROUP_COMMIT_TIMEOUT', 10)
+        app.extensions[self.extension_name] = _GroupCommitState(app)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the committer of the given (or current) app, or None if neither mode is enabled"""
+        app = app or current_app
+        state = app.extensions.get(GroupCommitter.extension_name)
+        if state is None or not (app.config['INSERT_GROUP_COMMIT_ENABLED'] or app.config['INSERT_ASYNC_ENABLED']):
+            return None
+        return state
+
+
+class _PendingInsert:
+    __slots__ = ('row', 'future')
+
+    def __init__(self, row, future):
+        self.row = row
+        self.future = future
+
+
+class _GroupCommitState:
+    """Per-worker insert queue, committer thread and group counters"""
+
+    def __init__(self, app):
+        self.app = app
+        self.groups = 0
+        self.rows = 0
+        self.async_rows = 0
+        self.failed_groups = 0
+        self._queue = queue.Queue(app.config['INSERT_GROUP_COMMIT_QUEUE_SIZE'])
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: each worker starts its own on first use
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue(self.app.config['INSERT_GROUP_COMMIT_QUEUE_SIZE'])
+            self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._pid = pid
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def submit(self, row):
+        """
+        Queue one row for the next group
+
+        Args:
+            row: Dict of Blacklist column values
+
+        Returns:
+            Future resolving to the new row id, or None if the email already exists
+
+        Raises:
+            InsertQueueFull: The queue is full (the caller should answer 503)
+        """
+        self._ensure_thread()
+        pending = _PendingInsert(row, Future())
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            telemetry.incr('Custom/Blacklist/GroupCommitQueueFull')
+            raise InsertQueueFull()
+        return pending.future
+
+    def submit_async(self, row):
+        """Queue one row without waiting for it (202 mode); outcomes are logged"""
+        future = self.submit(row)
+        self.async_rows += 1
+        future.add_done_callback(_log_async_outcome(row['email']))
+        return future
+
+    def _next_group(self, first):
+        group = [first]
+        max_rows = self.app.config['INSERT_GROUP_COMMIT_MAX_ROWS']
+        deadline = time.monotonic() + self.app.config['INSERT_GROUP_COMMIT_WAIT_MS'] / 1000.0
+        while len(group) < max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            self._commit(self._next_group(self._queue.get()))
+
+    def flush(self):
+        """Commit everything still queued from the calling thread (at exit)"""
+        while True:
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._commit(self._next_group(first))
+
+    def _commit(self, group):
+        from app.routes.blacklists import insert_group
+
+        # The first request for a mailbox inserts it; other spellings in the same group are duplicates
+        first_by_mailbox = {}
+        for pending in group:
+            first_by_mailbox.setdefault(pending.row['email_canonical'], pending)
+
+        try:
+            with self.app.app_context():
+                ids = insert_group([pending.row for pending in first_by_mailbox.values()])
+        except Exception as e:
+            self.failed_groups += 1
+            for pending in group:
+                pending.future.set_exception(e)
+            return
+
+        self.groups += 1
+        self.rows += len(group)
+        for pending in group:
+            email = pending.row['email']
+            created = first_by_mailbox[pending.row['email_canonical']] is pending and email in ids
+            pending.future.set_result(ids[email] if created else None)
+
+    def stats(self):
+        return {
+            'enabled': True,
+            'mode': 'group' if self.app.config['INSERT_GROUP_COMMIT_ENABLED'] else 'async',
+            'async_enabled': self.app.config['INSERT_ASYNC_ENABLED'],
+            'queued': self._queue.qsize(),
+            'groups': self.groups,
+            'rows': self.rows,
+            'rows_per_group': self.rows / self.groups if self.groups else None,
+            'async_rows': self.async_rows,
+            'failed_groups': self.failed_groups,
+        }
+
+
+def _log_async_outcome(email):
+    def log(future):
+        from app.utils import setup_logging
+
+        logger = setup_logging()
+        error = future.exception()
+        if error is not None:
+            telemetry.incr('Custom/Blacklist/AddAsyncError')
+            logger.error("Accepted email could not be added to blacklist",
+                         email=email, error=str(error), error_type=type(error).__name__)
+        elif future.result() is None:
+            telemetry.incr('Custom/Blacklist/AddDuplicate')
+            logger.info("Accepted email already in blacklist", email=email)
+    return log
@@ -0,0 +1,249 @@
+"""
+Streaming bulk import of blacklist entries
+Reads CSV/NDJSON through a generator pipeline and loads it in batches,
+using COPY + set-based merge on PostgreSQL and executemany elsewhere
+"""
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from marshmallow import ValidationError
+from sqlalchemy.dialects import sqlite
+
+from app import db
+from app.canonical import email_digest, get_canonicalizer
+from app.lookup_cache import bump_dataset_version, lock_dataset_version
+from app.models import Blacklist
+from app.schemas import get_blacklist_schemas
+
+IMPORT_COLUMNS = ('email', 'email_canonical', 'email_digest', 'app_uuid', 'blocked_reason', 'client_ip', 'created_at')
+STAGING_TABLE = 'blacklist_import_staging'
+
+
+def read_lines(stream, offset=0):
+    """
+    Yield ``(end_offset, line)`` for every line of a binary stream
+
+    Args:
+        stream: Binary file object (file or stdin buffer)
+        offset: Byte offset to resume from; must point at the start of a line
+    """
+    position = 0
+    if offset:
+        if stream.seekable():
+            stream.seek(offset)
+        else:
+            while position < offset:
+                chunk = stream.read(min(1 << 20, offset - position))
+                if not chunk:
+                    break
+                position += len(chunk)
+        position = offset
+
+    for line in stream:
+        position += len(line)
+        yield position, line.decode('utf-8')
+
+
+def parse_records(lines, fmt, header=None):
+    """
+    Turn lines into ``(end_offset, record_dict)`` tuples
+
+    Args:
+        lines: Iterator from ``read_lines``
+        fmt: ``csv`` or ``ndjson``
+        header: CSV column names, required when resuming past the header line
+    """
+    for end_offset, line in lines:
+        if not line.strip():
+            continue
+        if fmt == 'ndjson':
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield end_offset, record
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield end_offset, dict(zip(header, values))
+
+
+def read_csv_header(stream):
+    """Read the CSV header line from the start of a seekable stream"""
+    stream.seek(0)
+    header = [name.strip() for name in next(csv.reader([stream.readline().decode('utf-8')]))]
+    return header
+
+
+def validate_records(records, schema, default_client_ip, stats):
+    """
+    Validate records with the ``BlacklistSchema`` rules and yield import rows
+
+    Invalid records are counted in ``stats['invalid']`` and dropped.
+    """
+    created_at = datetime.utcnow()
+    canonicalize = get_canonicalizer()
+    for end_offset, record in records:
+        stats['read'] += 1
+        if not isinstance(record, dict):
+            stats['invalid'] += 1
+            continue
+
+        payload = {key: value for key, value in record.items()
+                   if key in ('email', 'app_uuid', 'blocked_reason') and value not in (None, '')}
+        try:
+            validated_data = schema.load(payload)
+        except ValidationError:
+            stats['invalid'] += 1
+            continue
+
+        canonical = canonicalize(validated_data['email'])
+        yield end_offset, (
+            validated_data['email'],
+            canonical,
+            email_digest(canonical),
+            validated_data['app_uuid'],
+            validated_data.get('blocked_reason'),
+            record.get('client_ip') or default_client_ip,
+            created_at,
+        )
+
+
+def batched(rows, batch_size):
+    """Group ``(end_offset, row)`` tuples into ``(end_offset, [rows])`` batches"""
+    batch = []
+    end_offset = None
+    for end_offset, row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield end_offset, batch
+            batch = []
+    if batch:
+        yield end_offset, batch
+
+
+class PostgresCopyLoader:
+    """COPY each batch into a temp staging table and merge it into blacklists"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+                f"(LIKE {Blacklist.__tablename__} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+        connection.commit()
+
+    def load(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        columns = ', '.join(IMPORT_COLUMNS)
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        # Ids are allocated under the version row lock (see app.changes)
+        lock_dataset_version(self.connection)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Blacklist.__tablename__} ({columns}) "
+                f"SELECT DISTINCT ON (email_digest, email_canonical) {columns} FROM {STAGING_TABLE} "
+                f"ON CONFLICT (email_digest, email_canonical) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        if inserted:
+            bump_dataset_version(self.connection)
+        self.connection.commit()
+        return inserted
+
+    def close(self):
+        self.connection.close()
+
+
+class ExecuteManyLoader:
+    """Batched executemany of INSERT OR IGNORE (SQLite and other databases)"""
+
+    def __init__(self, session):
+        self.session = session
+        table = Blacklist.__table__
+        if db.engine.dialect.name == 'sqlite':
+            self.statement = sqlite.insert(table).on_conflict_do_nothing(
+                index_elements=['email_digest', 'email_canonical'])
+        else:
+            self.statement = table.insert()
+
+    def load(self, rows):
+        params = [dict(zip(IMPORT_COLUMNS, row)) for row in rows]
+        lock_dataset_version()
+        result = self.session.execute(self.statement, params)
+        if result.rowcount:
+            bump_dataset_version()
+        self.session.commit()
+        return result.rowcount
+
+    def close(self):
+        self.session.remove()
+
+
+def create_loader():
+    """Pick the fastest loader for the configured database"""
+    if db.engine.dialect.name == 'postgresql':
+        return PostgresCopyLoader(db.engine.raw_connection())
+    return ExecuteManyLoader(db.session)
+
+
+def import_stream(stream, fmt, batch_size=10000, offset=0, header=None,
+                  default_client_ip='127.0.0.1', progress=None):
+    """
+    Import blacklist entries from a binary stream
+
+    Memory use is bounded by ``batch_size``. Every batch is committed on its
+    own, so an interrupted import can be resumed from the last reported offset.
+
+    Args:
+        stream: Binary file object with CSV or NDJSON content
+        fmt: ``csv`` or ``ndjson``
+        batch_size: Rows per COPY/executemany batch
+        offset: Byte offset to resume from
+        header: CSV column names when resuming past the header line
+        default_client_ip: client_ip for records that do not carry one
+        progress: Optional callback receiving the running stats after each batch
+
+    Returns:
+        dict with read/invalid/inserted/duplicate counts, offset, elapsed time and rows/s
+    """
+    stats = {'read': 0, 'invalid': 0, 'inserted': 0, 'duplicate': 0, 'offset': offset}
+    start_time = time.monotonic()
+    schema = get_blacklist_schemas()[0]
+    loader = create_loader()
+
+    lines = read_lines(stream, offset)
+    records = parse_records(lines, fmt, header)
+    rows = validate_records(records, schema, default_client_ip, stats)
+
+    try:
+        for end_offset, batch in batched(rows, batch_size):
+            inserted = loader.load(batch)
+            stats['inserted'] += inserted
+            stats['duplicate'] += len(batch) - inserted
+            stats['offset'] = end_offset
+            _update_rate(stats, start_time)
+            if progress:
+                progress(stats)
+    finally:
+        loader.close()
+
+    _update_rate(stats, start_time)
+    return stats
+
+
+def _update_rate(stats, start_time):
+    elapsed = time.monotonic() - start_time
+    stats['elapsed_seconds'] = elapsed
+    stats['rows_per_second'] = stats['read'] / elapsed if elapsed else 0.0
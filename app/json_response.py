@@ -0,0 +1,76 @@
+"""
+JSON responses
+Drop-in ``jsonify`` whose encoder is chosen by JSON_RESPONSE_ENCODER:
+    flask   Flask's jsonify (sorted keys, JSON_AS_ASCII)
+    stdlib  one prebuilt json.JSONEncoder per app, keys in insertion order
+    orjson  orjson when installed, otherwise stdlib
+All of them keep Flask's handling of dates, UUIDs and ``__html__`` objects,
+the pretty printing in debug mode and the trailing newline.
+"""
+import json
+
+from flask import current_app, jsonify as flask_jsonify
+
+from app.server_timing import phase
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+
+def _stdlib_dumps(app, pretty):
+    encoder = json.JSONEncoder(
+        ensure_ascii=app.config['JSON_AS_ASCII'],
+        indent=2 if pretty else None,
+        separators=(', ', ': ') if pretty else (',', ':'),
+        default=app.json_encoder().default,
+    )
+
+    def dumps(data):
+        return encoder.encode(data) + '\n'
+    return dumps
+
+
+def _orjson_dumps(app, pretty):
+    default = app.json_encoder().default
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+
+    def dumps(data):
+        return orjson.dumps(data, default=default, option=option)
+    return dumps
+
+
+def create_dumps(app):
+    """Serializer for the app's JSON_RESPONSE_ENCODER, or None for Flask's jsonify"""
+    name = app.config.get('JSON_RESPONSE_ENCODER', 'stdlib')
+    if name == 'flask':
+        return None
+    pretty = app.config['JSONIFY_PRETTYPRINT_REGULAR'] or app.debug
+    if name == 'orjson' and orjson is not None:
+        return _orjson_dumps(app, pretty)
+    return _stdlib_dumps(app, pretty)
+
+
+def get_dumps():
+    app = current_app._get_current_object()
+    key = (app.config.get('JSON_RESPONSE_ENCODER', 'stdlib'), app.config['JSONIFY_PRETTYPRINT_REGULAR'] or app.debug)
+    cached = app.extensions.get('json_response_dumps')
+    if cached is None or cached[0] != key:
+        cached = app.extensions['json_response_dumps'] = (key, create_dumps(app))
+    return cached[1]
+
+
+def jsonify(*args, **kwargs):
+    """``flask.jsonify`` using the configured encoder (timed as the "render" phase)"""
+    with phase('render'):
+        dumps = get_dumps()
+        if dumps is None:
+            return flask_jsonify(*args, **kwargs)
+
+        if args and kwargs:
+            raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+        data = args[0] if len(args) == 1 else (args or kwargs)
+        return current_app.response_class(dumps(data), mimetype=current_app.config['JSONIFY_MIMETYPE'])
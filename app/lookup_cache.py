@@ -0,0 +1,195 @@
+"""
+HTTP conditional caching for blacklist lookups
+Lookup responses carry a weak ETag built from the global dataset version (a
+counter in ``dataset_versions`` bumped in the same transaction as every
+insert) and the canonical email, plus Cache-Control with separate max-age
+values for hits and misses. A matching If-None-Match gets a 304 without
+running the lookup.
+
+Each worker reads the version every DATASET_VERSION_CHECK_INTERVAL seconds.
+Until a new version has been seen for DATASET_VERSION_SETTLE_SECONDS (the
+staleness of replicas and lookup filters, computed from their settings by
+default) responses carry no ETag, so a stale answer is never tagged with it.
+"""
+import hashlib
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.replicas import parse_read_urls
+from app.telemetry import telemetry
+
+
+def _update_dataset_version(connection, increment):
+    from app import db
+    from app.models import DatasetVersion
+
+    sql = f'UPDATE {DatasetVersion.__tablename__} SET version = version + {int(increment)} WHERE id = 1'
+    if connection is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    else:
+        table = DatasetVersion.__table__
+        db.session.execute(table.update().where(table.c.id == 1).values(version=table.c.version + increment))
+
+
+def bump_dataset_version(connection=None):
+    """
+    Increment the dataset version inside the caller's transaction
+
+    Args:
+        connection: DB-API connection (raw COPY path); defaults to the session
+    """
+    _update_dataset_version(connection, 1)
+
+
+def lock_dataset_version(connection=None):
+    """
+    Take the dataset version row lock without changing it, until the caller commits
+
+    Inserts take it before their ids are allocated, so ids commit in order
+    (the change feed cursor relies on it).
+    """
+    _update_dataset_version(connection, 0)
+
+
+class LookupCache:
+    """Flask extension adding ETag/Cache-Control to lookups and answering If-None-Match"""
+
+    extension_name = 'lookup_cache'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOOKUP_CACHE_ENABLED', True)
+        app.config.setdefault('LOOKUP_CACHE_MAX_AGE_POSITIVE', 300)
+        app.config.setdefault('LOOKUP_CACHE_MAX_AGE_NEGATIVE', 0)
+        app.config.setdefault('LOOKUP_CACHE_PUBLIC', False)
+        app.config.setdefault('DATASET_VERSION_CHECK_INTERVAL', 1.0)
+        app.config.setdefault('DATASET_VERSION_SETTLE_SECONDS', None)
+        app.extensions[self.extension_name] = _LookupCacheState(app)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the cache state of the given (or current) app, or None if disabled"""
+        app = app or current_app
+        state = app.extensions.get(LookupCache.extension_name)
+        if state is None or not app.config['LOOKUP_CACHE_ENABLED']:
+            return None
+        return state
+
+
+class _LookupCacheState:
+    """Per-worker view of the dataset version and conditional request counters"""
+
+    def __init__(self, app):
+        self.app = app
+        self.version = None
+        self.not_modified = 0
+        self._seen_at = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def settle_seconds(self):
+        """How long a new version may be invisible to some lookup source"""
+        config = self.app.config
+        if config['DATASET_VERSION_SETTLE_SECONDS'] is not None:
+            return config['DATASET_VERSION_SETTLE_SECONDS']
+        seconds = 0.0
+        if parse_read_urls(config.get('DATABASE_READ_URL')):
+            seconds = max(seconds, config['REPLICA_MAX_LAG_SECONDS'] + config['REPLICA_CHECK_INTERVAL'])
+        if config.get('SNAPSHOT_ENABLED'):
+            seconds = max(seconds, config['SNAPSHOT_DELTA_REFRESH_INTERVAL'] + config['SNAPSHOT_CHECK_INTERVAL'])
+        elif config.get('BLOOM_FILTER_ENABLED'):
+            seconds = max(seconds, config['BLOOM_FILTER_REFRESH_INTERVAL'])
+        return seconds
+
+    def _read_version(self):
+        from app import db
+        from app.models import DatasetVersion
+
+        # From the primary, outside the request's session (and its replica routing)
+        table = DatasetVersion.__table__
+        with db.engine.connect() as connection:
+            return connection.execute(select(table.c.version).where(table.c.id == 1)).scalar()
+
+    def current_version(self):
+        """
+        The settled dataset version, or None while a new one is settling
+
+        Reads the counter at most every DATASET_VERSION_CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= self.app.config['DATASET_VERSION_CHECK_INTERVAL']:
+            with self._lock:
+                if now - self._checked_at >= self.app.config['DATASET_VERSION_CHECK_INTERVAL']:
+                    try:
+                        version = self._read_version()
+                    except Exception:
+                        # E.g. schema not migrated yet: no ETags until the table exists
+                        version = None
+                    if version != self.version:
+                        self.version = version
+                        self._seen_at = now
+                    self._checked_at = now
+
+        if self.version is None or now - self._seen_at < self.settle_seconds():
+            return None
+        return self.version
+
+    def invalidate(self):
+        """Re-read the version on the next lookup (after this worker wrote)"""
+        self._checked_at = 0.0
+
+    def etag(self, version, canonical, found):
+        """Weak ETag value for one lookup result at ``version``"""
+        rules = self.app.config.get('EMAIL_CANONICAL_RULES', '')
+        key = hashlib.blake2b(f'{rules}\n{canonical}'.encode('utf-8'), digest_size=8).hexdigest()
+        return f"{version}.{'p' if found else 'n'}.{key}"
+
+    def not_modified_result(self, if_none_match, canonical):
+        """
+        Whether If-None-Match holds the current tag for ``canonical``
+
+        Returns:
+            ``(version, found)`` of the matching tag, or None
+        """
+        if not if_none_match or if_none_match.star_tag:
+            return None
+        version = self.current_version()
+        if version is None:
+            return None
+        for found in (True, False):
+            if if_none_match.contains_weak(self.etag(version, canonical, found)):
+                self.not_modified += 1
+                telemetry.incr('Custom/Blacklist/QueryNotModified')
+                return version, found
+        return None
+
+    def apply(self, response, version, canonical, found):
+        """Set Cache-Control, Vary and (with a settled version) the ETag on a lookup response"""
+        config = self.app.config
+        response.cache_control.max_age = (
+            config['LOOKUP_CACHE_MAX_AGE_POSITIVE'] if found else config['LOOKUP_CACHE_MAX_AGE_NEGATIVE']
+        )
+        if config['LOOKUP_CACHE_PUBLIC']:
+            response.cache_control.public = True
+        else:
+            response.cache_control.private = True
+        response.vary.add('Authorization')
+        if version is not None:
+            response.set_etag(self.etag(version, canonical, found), weak=True)
+        return response
+
+    def stats(self):
+        return {
+            'enabled': True,
+            'version': self.version,
+            'settled_version': self.current_version(),
+            'settle_seconds': self.settle_seconds(),
+            'not_modified': self.not_modified,
+        }
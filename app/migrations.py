@@ -0,0 +1,273 @@
+"""
+Online schema migrations for the blacklists table
+Each step is idempotent: columns and indexes are added only when missing and
+backfills walk the table in primary-key batches, committing after each one,
+so they can run (and be re-run) against a live database.
+"""
+from sqlalchemy import bindparam, inspect, select, text
+
+from app import db
+from app.canonical import canonicalize_email, email_digest
+from app.models import Blacklist, DatasetVersion
+
+UNIQUE_MAILBOX_INDEX = 'ux_blacklists_email_digest_canonical'
+
+
+def _existing_columns(connection, table_name):
+    return {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+
+def _existing_indexes(connection, table_name):
+    return {index['name'] for index in inspect(connection).get_indexes(table_name)}
+
+
+def index_is_valid(index_name):
+    """
+    Whether the index exists and is usable
+
+    A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind on
+    PostgreSQL; it still shows up in the inspector but enforces nothing.
+    """
+    with db.engine.connect() as connection:
+        if index_name not in _existing_indexes(connection, Blacklist.__tablename__):
+            return False
+        if connection.dialect.name != 'postgresql':
+            return True
+        return bool(connection.execute(text(
+            'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :index_name'
+        ), {'index_name': index_name}).scalar())
+
+
+def add_column(column_name, ddl_type):
+    """Add a nullable column to blacklists if it does not exist yet"""
+    table_name = Blacklist.__tablename__
+    with db.engine.begin() as connection:
+        if column_name in _existing_columns(connection, table_name):
+            return False
+        connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl_type}'))
+    return True
+
+
+def create_index(index_name, column_name, unique=False):
+    """Create an index on blacklists if it does not exist yet (concurrently on PostgreSQL)"""
+    table_name = Blacklist.__tablename__
+    with db.engine.connect() as connection:
+        if index_name in _existing_indexes(connection, table_name):
+            return False
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if db.engine.dialect.name == 'postgresql':
+        # CONCURRENTLY cannot run inside a transaction block
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(
+                f'CREATE {kind} CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ({column_name})'
+            ))
+    else:
+        with db.engine.begin() as connection:
+            connection.execute(text(f'CREATE {kind} IF NOT EXISTS {index_name} ON {table_name} ({column_name})'))
+    return True
+
+
+def drop_index(index_name):
+    """Drop an index on blacklists if it exists (concurrently on PostgreSQL)"""
+    with db.engine.connect() as connection:
+        if index_name not in _existing_indexes(connection, Blacklist.__tablename__):
+            return False
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}'))
+    else:
+        with db.engine.begin() as connection:
+            connection.execute(text(f'DROP INDEX IF EXISTS {index_name}'))
+    return True
+
+
+def backfill_column(column_name, compute, batch_size=1000, recompute=False, progress=None):
+    """
+    Fill ``column_name`` from the email of each row, one id range per transaction
+
+    Args:
+        column_name: Column of blacklists to fill
+        compute: Function from the stored email to the column value
+        batch_size: Rows read and updated per transaction
+        recompute: Also rewrite rows that already have a value (e.g. after a rule change)
+        progress: Optional callable receiving the number of rows updated so far
+
+    Returns:
+        Number of rows updated
+    """
+    table = Blacklist.__table__
+    column = table.c[column_name]
+    update = table.update() \
+        .where(table.c.id == bindparam('row_id')) \
+        .values({column_name: bindparam('value')})
+
+    updated = 0
+    last_id = 0
+    while True:
+        query = select(table.c.id, table.c.email, column) \
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        if not recompute:
+            query = query.where(column.is_(None))
+        with db.engine.begin() as connection:
+            rows = connection.execute(query).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            params = []
+            for row_id, email, current in rows:
+                value = compute(email)
+                if current != value:
+                    params.append({'row_id': row_id, 'value': value})
+            if params:
+                connection.execute(update, params)
+        updated += len(params)
+        if progress is not None:
+            progress(updated)
+    return updated
+
+
+def migrate_email_canonical(batch_size=1000, progress=None):
+    """Add and backfill blacklists.email_canonical"""
+    add_column('email_canonical', 'VARCHAR(255)')
+    return backfill_column('email_canonical', canonicalize_email, batch_size=batch_size, progress=progress)
+
+
+def migrate_email_digest(batch_size=1000, progress=None):
+    """Add, index and backfill blacklists.email_digest"""
+    add_column('email_digest', 'BIGINT')
+    with db.engine.connect() as connection:
+        unique_key_exists = UNIQUE_MAILBOX_INDEX in _existing_indexes(connection, Blacklist.__tablename__)
+    if not unique_key_exists:
+        # Serves the backfill and the dedupe until the unique index replaces it
+        create_index('ix_blacklists_email_digest', 'email_digest')
+    updated = backfill_column('email_digest', lambda email: email_digest(canonicalize_email(email)),
+                              batch_size=batch_size, progress=progress)
+    # Lookups seek on the digest now; the wide string index only slowed down writes
+    drop_index('ix_blacklists_email_canonical')
+    return updated
+
+
+def dedupe_email_canonical():
+    """
+    Delete rows whose canonical email already belongs to an older row
+
+    The oldest row of each mailbox (lowest id) is kept with its blocked_reason.
+    The correlated lookup seeks on ix_blacklists_email_digest.
+
+    Returns:
+        Number of rows deleted
+    """
+    table_name = Blacklist.__tablename__
+    bump = text(f'UPDATE {DatasetVersion.__tablename__} SET version = version + 1 WHERE id = 1')
+    with db.engine.begin() as connection:
+        deleted = connection.execute(text(
+            f'DELETE FROM {table_name} WHERE email_canonical IS NOT NULL AND id > ('
+            f'SELECT MIN(older.id) FROM {table_name} older '
+            f'WHERE older.email_digest = {table_name}.email_digest '
+            f'AND older.email_canonical = {table_name}.email_canonical)'
+        )).rowcount
+        if deleted:
+            # Cached lookups may have seen a removed duplicate
+            connection.execute(bump)
+    return deleted
+
+
+def migrate_unique_email_canonical():
+    """Remove duplicate mailboxes, then make (email_digest, email_canonical) the unique key"""
+    if index_is_valid(UNIQUE_MAILBOX_INDEX):
+        # The index already rules out duplicates; skip the full-table DELETE
+        drop_index('ix_blacklists_email_digest')
+        return 0
+    # Left invalid by an interrupted concurrent build
+    drop_index(UNIQUE_MAILBOX_INDEX)
+    deleted = dedupe_email_canonical()
+    create_index(UNIQUE_MAILBOX_INDEX, 'email_digest, email_canonical', unique=True)
+    # The unique index starts with the digest, so it serves the lookup seeks on its own
+    drop_index('ix_blacklists_email_digest')
+    return deleted
+
+
+def recompute_mailbox_keys(batch_size=1000, progress=None):
+    """
+    Rewrite (email_canonical, email_digest) of every row with the current rules
+
+    Runs with the unique mailbox index in place, so ON CONFLICT inserts keep
+    working throughout. Both columns of a row change in the same UPDATE; when
+    the new key already belongs to another row (new rules merged two
+    mailboxes), the newer of the two rows is deleted first, keeping the
+    oldest row of each mailbox as the dedupe does. Rows of one batch are
+    handled in id order within one transaction; if a concurrent insert of
+    the same mailbox makes a batch fail, rerunning skips the rows already
+    rewritten.
+
+    Returns:
+        ``(updated, deleted)`` row counts
+    """
+    table = Blacklist.__table__
+    bump = text(f'UPDATE {DatasetVersion.__tablename__} SET version = version + 1 WHERE id = 1')
+    updated = 0
+    deleted = 0
+    last_id = 0
+    while True:
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.email, table.c.email_canonical, table.c.email_digest)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            batch_deleted = 0
+            for row_id, email, current_canonical, current_digest in rows:
+                canonical = canonicalize_email(email)
+                digest = email_digest(canonical)
+                if (canonical, digest) == (current_canonical, current_digest):
+                    continue
+                other_id = connection.execute(
+                    select(table.c.id).where(table.c.email_digest == digest,
+                                             table.c.email_canonical == canonical,
+                                             table.c.id != row_id)
+                ).scalar()
+                if other_id is not None and other_id < row_id:
+                    connection.execute(table.delete().where(table.c.id == row_id))
+                    batch_deleted += 1
+                    continue
+                if other_id is not None:
+                    connection.execute(table.delete().where(table.c.id == other_id))
+                    batch_deleted += 1
+                connection.execute(table.update().where(table.c.id == row_id)
+                                   .values(email_canonical=canonical, email_digest=digest))
+                updated += 1
+            if batch_deleted:
+                # Cached lookups may have seen a removed duplicate
+                connection.execute(bump)
+            deleted += batch_deleted
+        if progress is not None:
+            progress(updated)
+    return updated, deleted
+
+
+def run_migrations(batch_size=1000, recompute=False, progress=None):
+    """
+    Create missing tables, then apply every migration step in order
+
+    Args:
+        recompute: Rewrite the mailbox key of every row (e.g. after changing
+            EMAIL_CANONICAL_RULES) once the schema is in place
+
+    Returns:
+        dict mapping each backfilled column to the number of rows updated
+    """
+    db.create_all()
+    result = {
+        'email_canonical': migrate_email_canonical(batch_size, progress),
+        'email_digest': migrate_email_digest(batch_size, progress),
+        'duplicates_removed': migrate_unique_email_canonical(),
+    }
+    if recompute:
+        updated, deleted = recompute_mailbox_keys(batch_size, progress)
+        result['email_canonical'] += updated
+        result['email_digest'] += updated
+        result['duplicates_removed'] += deleted
+    return result
@@ -1,13 +1,24 @@
 from datetime import datetime
+from sqlalchemy import DDL, event
 from app import db
+from app.canonical import canonicalize_email, email_digest
 
 class Blacklist(db.Model):
     """Model for blacklisted emails"""
 
     __tablename__ = 'blacklists'
+    # One row per mailbox: every spelling of an address shares its canonical key. Digest first,
+    # so lookups seek on it. NULLs (rows not yet backfilled by `flask blacklist migrate`) do not conflict.
+    __table_args__ = (
+        db.Index('ux_blacklists_email_digest_canonical', 'email_digest', 'email_canonical', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), nullable=False, unique=True, index=True)
+    # Lookup keys (see app.canonical); nullable until `flask blacklist migrate` backfills old rows.
+    # Lookups seek on the 8-byte digest and confirm with the canonical email (unique index below).
+    email_canonical = db.Column(db.String(255), nullable=True)
+    email_digest = db.Column(db.BigInteger, nullable=True)
     app_uuid = db.Column(db.String(36), nullable=False)  # UUID format
     blocked_reason = db.Column(db.String(255), nullable=True)
     client_ip = db.Column(db.String(45), nullable=False)  # IPv6 max length
@@ -26,3 +37,28 @@ class Blacklist(db.Model):
             'client_ip': self.client_ip,
             'created_at': self.created_at.isoformat() + 'Z'
         }
+
+
+@event.listens_for(Blacklist, 'before_insert')
+def set_email_canonical(mapper, connection, target):
+    """Fill email_canonical and email_digest for ORM inserts that did not set them"""
+    if target.email_canonical is None and target.email:
+        target.email_canonical = canonicalize_email(target.email)
+    if target.email_digest is None and target.email_canonical:
+        target.email_digest = email_digest(target.email_canonical)
+
+
+class DatasetVersion(db.Model):
+    """Single-row counter bumped in every transaction that inserts into blacklists"""
+
+    __tablename__ = 'dataset_versions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# The row that bump_dataset_version() increments (created with the table, by create_all or migrate)
+event.listen(
+    DatasetVersion.__table__, 'after_create',
+    DDL(f'INSERT INTO {DatasetVersion.__tablename__} (id, version) VALUES (1, 0)')
+)
@@ -0,0 +1,415 @@
+"""
+Prometheus metrics aggregated across gunicorn workers
+Every process writes its samples into its own memory-mapped file under
+METRICS_DIR (``metrics-<pid>.bin``, only ever written by that process) and
+the worker that serves ``GET /metrics`` reads all of them, so one scrape sees
+the whole instance.
+
+Counters and histograms are summed over every file, including those of
+workers that exited (their requests happened). Gauges only count live
+processes. Per-worker stats kept in memory (pool, lookup filters, 304s) are
+copied into the file every METRICS_WORKER_STATS_INTERVAL seconds.
+"""
+import bisect
+import glob
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+
+DEFAULT_METRICS_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else '/tmp', 'blacklist-metrics')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; the service answers most lookups in about a millisecond
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Auth, parsing and rendering take microseconds
+PHASE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025) + LATENCY_BUCKETS
+
+# name: (type, help); gauges are summed over live workers
+METRICS = {
+    'blacklist_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status'),
+    'blacklist_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'blacklist_http_request_phase_duration_seconds': ('histogram', 'Request time by endpoint and phase (Server-Timing)'),
+    'blacklist_db_operations_total': ('counter', 'Database operations recorded by app.db_metrics'),
+    'blacklist_db_operation_duration_seconds': ('histogram', 'Database operation latency by operation'),
+    'blacklist_db_pool_connections': ('gauge', 'Pooled database connections by state'),
+    'blacklist_db_pool_checkouts_total': ('counter', 'Connection pool checkouts by outcome'),
+    'blacklist_lookup_filter_total': ('counter', 'Lookup filter (snapshot/Bloom) results'),
+    'blacklist_lookup_not_modified_total': ('counter', 'Lookups answered 304 Not Modified'),
+    'blacklist_changes_waiters': ('gauge', 'Change feed requests long-polling'),
+    'blacklist_group_commit_queued': ('gauge', 'Inserts waiting for the group committer'),
+}
+
+HISTOGRAM_BUCKETS = {
+    'blacklist_http_request_phase_duration_seconds': PHASE_BUCKETS,
+}
+
+_FILE_PATTERN = re.compile(r'metrics-(\d+)\.bin$')
+
+
+class MmapedValues:
+    """
+    Append-only ``key -> float`` store in a memory-mapped file, one writer process
+
+    Layout: 8-byte header holding the used size, then entries of
+    ``<uint32 key length><key, padded to 8 bytes><float64 value>``. The used
+    size is written after each new entry, so readers never see a partial one.
+    """
+
+    initial_size = 64 * 1024
+    header = struct.Struct('<Q')
+    key_length = struct.Struct('<I')
+    value = struct.Struct('<d')
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = {}
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = os.fstat(self._fd).st_size
+        if size < self.initial_size:
+            os.ftruncate(self._fd, self.initial_size)
+            size = self.initial_size
+        self._mmap = mmap.mmap(self._fd, size)
+        self._used = self.header.unpack_from(self._mmap, 0)[0] or self.header.size
+        for key, _, offset in self._entries(self._mmap, self._used):
+            self._offsets[key] = offset
+
+    @classmethod
+    def _entries(cls, data, used):
+        position = cls.header.size
+        while position < used:
+            length = cls.key_length.unpack_from(data, position)[0]
+            key_end = position + cls.key_length.size + length
+            offset = key_end + (-key_end % 8)
+            yield bytes(data[position + cls.key_length.size:key_end]).decode('utf-8'), \
+                cls.value.unpack_from(data, offset)[0], offset
+            position = offset + cls.value.size
+
+    @classmethod
+    def read_all(cls, path):
+        """``{key: value}`` of a file written by any process"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < cls.header.size:
+            return {}
+        used = min(cls.header.unpack_from(data, 0)[0], len(data))
+        return {key: value for key, value, _ in cls._entries(data, used)}
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = key.encode('utf-8')
+        key_end = self._used + self.key_length.size + len(encoded)
+        offset = key_end + (-key_end % 8)
+        end = offset + self.value.size
+        if end > len(self._mmap):
+            size = len(self._mmap)
+            while size < end:
+                size *= 2
+            os.ftruncate(self._fd, size)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._fd, size)
+        self.key_length.pack_into(self._mmap, self._used, len(encoded))
+        self._mmap[self._used + self.key_length.size:key_end] = encoded
+        self.value.pack_into(self._mmap, offset, 0.0)
+        self._used = end
+        self.header.pack_into(self._mmap, 0, end)
+        self._offsets[key] = offset
+        return offset
+
+    def add(self, key, amount):
+        offset = self._offset(key)
+        self.value.pack_into(self._mmap, offset, self.value.unpack_from(self._mmap, offset)[0] + amount)
+
+    def set(self, key, value):
+        self.value.pack_into(self._mmap, self._offset(key), value)
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+def sample_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PrometheusMetrics:
+    """Flask extension recording request/DB metrics and serving them from GET /metrics"""
+
+    extension_name = 'prometheus'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_DIR', DEFAULT_METRICS_DIR)
+        app.config.setdefault('METRICS_WORKER_STATS_INTERVAL', 5.0)
+        state = _PrometheusState(app)
+        app.extensions[self.extension_name] = state
+        if app.config['METRICS_ENABLED']:
+            state.remove_dead_files()
+        app.before_request(_start_timer)
+        app.after_request(_record_request)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the metrics state of the given (or current) app, or None if disabled"""
+        app = app or current_app
+        state = app.extensions.get(PrometheusMetrics.extension_name)
+        if state is None or not app.config['METRICS_ENABLED']:
+            return None
+        return state
+
+
+class _PrometheusState:
+    """This process's metrics file and the reader that merges every worker's file"""
+
+    def __init__(self, app):
+        self.app = app
+        self._values = None
+        self._pid = None
+        self._stats_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self.app.config['METRICS_DIR']
+
+    def _file(self):
+        # Each process writes only its own file; a forked worker opens a new one
+        pid = os.getpid()
+        if self._pid != pid:
+            os.makedirs(self.directory, exist_ok=True)
+            self._values = MmapedValues(os.path.join(self.directory, f'metrics-{pid}.bin'))
+            self._pid = pid
+        return self._values
+
+    def remove_dead_files(self):
+        """Drop files of processes that no longer exist (at startup, e.g. a previous deploy)"""
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.bin')):
+            match = _FILE_PATTERN.search(path)
+            if match and not _pid_alive(int(match.group(1))):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def inc(self, name, labels, amount=1.0):
+        with self._lock:
+            self._file().add(sample_key(name, labels), amount)
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._file().set(sample_key(name, labels), value)
+
+    def observe(self, name, labels, value):
+        """Add one histogram observation (buckets are stored non-cumulative)"""
+        buckets = HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)
+        index = bisect.bisect_left(buckets, value)
+        le = repr(buckets[index]) if index < len(buckets) else '+Inf'
+        with self._lock:
+            values = self._file()
+            values.add(sample_key(f'{name}_bucket', dict(labels, le=le)), 1.0)
+            values.add(sample_key(f'{name}_sum', labels), value)
+            values.add(sample_key(f'{name}_count', labels), 1.0)
+
+    def maybe_record_worker_stats(self):
+        now = time.monotonic()
+        if now - self._stats_at >= self.app.config['METRICS_WORKER_STATS_INTERVAL']:
+            self._stats_at = now
+            self.record_worker_stats()
+
+    def record_worker_stats(self):
+        """Copy this worker's in-memory stats into its file"""
+        from app import db
+        from app.changes import ChangeNotifier
+        from app.db_pool import get_pool_state
+        from app.group_commit import GroupCommitter
+        from app.lookup_cache import LookupCache
+        from app.snapshot import get_lookup_filter
+
+        pool = get_pool_state(db.engine)
+        for key in ('checked_out', 'checked_in', 'overflow'):
+            if key in pool:
+                self.set('blacklist_db_pool_connections', {'state': key}, pool[key])
+        if 'checkouts' in pool:
+            self.set('blacklist_db_pool_checkouts_total', {'outcome': 'ok'}, pool['checkouts'])
+            self.set('blacklist_db_pool_checkouts_total', {'outcome': 'overflow'}, pool['overflow_checkouts'])
+            self.set('blacklist_db_pool_checkouts_total', {'outcome': 'timeout'}, pool['timeouts'])
+
+        lookup_filter = get_lookup_filter()
+        if lookup_filter is not None:
+            stats = lookup_filter.stats()
+            kind = 'snapshot' if 'delta_size' in stats else 'bloom'
+            for result in ('hits', 'misses', 'false_positives'):
+                self.set('blacklist_lookup_filter_total', {'filter': kind, 'result': result}, stats[result])
+
+        lookup_cache = LookupCache.get_state()
+        if lookup_cache is not None:
+            self.set('blacklist_lookup_not_modified_total', {}, lookup_cache.not_modified)
+        notifier = ChangeNotifier.get_state()
+        if notifier is not None:
+            self.set('blacklist_changes_waiters', {}, notifier.waiters)
+        committer = GroupCommitter.get_state()
+        if committer is not None:
+            self.set('blacklist_group_commit_queued', {}, committer.stats()['queued'])
+
+    def collect(self):
+        """
+        Merge the samples of every process file
+
+        Returns:
+            ``{metric name: {(sample name, labels tuple): value}}``
+        """
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.bin')):
+            match = _FILE_PATTERN.search(path)
+            if not match:
+                continue
+            alive = _pid_alive(int(match.group(1)))
+            try:
+                values = MmapedValues.read_all(path)
+            except (OSError, ValueError, struct.error):
+                continue
+            for key, value in values.items():
+                sample_name, labels = json.loads(key)
+                metric = _metric_name(sample_name)
+                if metric is None or (METRICS[metric][0] == 'gauge' and not alive):
+                    continue
+                samples = merged.setdefault(metric, {})
+                sample = (sample_name, tuple(tuple(label) for label in labels))
+                samples[sample] = samples.get(sample, 0.0) + value
+        return merged
+
+    def render(self):
+        """The whole instance's metrics in the Prometheus text exposition format"""
+        lines = []
+        merged = self.collect()
+        for metric, (kind, help_text) in METRICS.items():
+            samples = merged.get(metric)
+            if not samples:
+                continue
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            if kind == 'histogram':
+                lines.extend(_render_histogram(metric, samples))
+            else:
+                for (sample_name, labels), value in sorted(samples.items()):
+                    lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_name(sample_name):
+    if sample_name in METRICS:
+        return sample_name
+    for suffix in ('_bucket', '_sum', '_count'):
+        if sample_name.endswith(suffix) and sample_name[:-len(suffix)] in METRICS:
+            return sample_name[:-len(suffix)]
+    return None
+
+
+def _render_histogram(metric, samples):
+    series = {}
+    for (sample_name, labels), value in samples.items():
+        le = dict(labels).get('le')
+        base = tuple(label for label in labels if label[0] != 'le')
+        entry = series.setdefault(base, {'buckets': {}, 'sum': 0.0, 'count': 0.0})
+        if sample_name.endswith('_bucket'):
+            entry['buckets'][le] = value
+        elif sample_name.endswith('_sum'):
+            entry['sum'] = value
+        else:
+            entry['count'] = value
+
+    lines = []
+    for labels, entry in sorted(series.items()):
+        cumulative = 0.0
+        for le in [repr(bound) for bound in HISTOGRAM_BUCKETS.get(metric, LATENCY_BUCKETS)] + ['+Inf']:
+            cumulative += entry['buckets'].get(le, 0.0)
+            lines.append(f'{metric}_bucket{_format_labels(labels + (("le", le),))} {_format_value(cumulative)}')
+        lines.append(f'{metric}_sum{_format_labels(labels)} {_format_value(entry["sum"])}')
+        lines.append(f'{metric}_count{_format_labels(labels)} {_format_value(entry["count"])}')
+    return lines
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def request_endpoint():
+    """Metric label of the current request: the view name without its blueprint"""
+    return request.endpoint.rpartition('.')[2] if request.endpoint else 'unmatched'
+
+
+def _start_timer():
+    """before_request hook: start the latency clock"""
+    if PrometheusMetrics.get_state() is not None:
+        g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    """after_request hook: count the request and observe its latency under the view name"""
+    state = PrometheusMetrics.get_state()
+    if state is None:
+        return response
+    endpoint = request_endpoint()
+    try:
+        state.inc('blacklist_http_requests_total',
+                  {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            state.observe('blacklist_http_request_duration_seconds', {'endpoint': endpoint},
+                          time.perf_counter() - started)
+        state.maybe_record_worker_stats()
+    except (OSError, ValueError):
+        pass  # Metrics must never fail a request
+    return response
+
+
+def observe_db_operation(operation_type, elapsed_time_ms, success):
+    """Record one app.db_metrics measurement, if metrics are enabled for the current app"""
+    if not has_app_context():
+        return
+    state = PrometheusMetrics.get_state()
+    if state is None:
+        return
+    try:
+        state.inc('blacklist_db_operations_total',
+                  {'operation': operation_type, 'outcome': 'success' if success else 'error'})
+        if success:
+            state.observe('blacklist_db_operation_duration_seconds', {'operation': operation_type},
+                          elapsed_time_ms / 1000.0)
+    except (OSError, ValueError):
+        pass
@@ -0,0 +1,238 @@
+"""
+SQL statement profiler
+Cursor-level listeners on every engine time each statement the ORM emits
+(perf_counter_ns) and aggregate them by fingerprint: the statement with
+literals and bind parameters replaced by ``?`` and IN/VALUES lists collapsed,
+so ``WHERE email IN (?, ?, ?)`` and ``WHERE email IN (?)`` are one entry.
+Each worker keeps count, total/max time, rows and errors per fingerprint in a
+table of at most QUERY_PROFILER_MAX_FINGERPRINTS entries (the rest are
+counted under OTHER_FINGERPRINT), served by ``GET /debug/queries``.
+
+With SLOW_QUERY_LOG_ENABLED, statements over SLOW_QUERY_LOG_THRESHOLD_MS are
+logged with their parameters redacted to types. Statements outside a
+db_operation_timer block are added to the "db" Server-Timing phase.
+"""
+import functools
+import os
+import re
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app.db_metrics import SLOW_QUERY_THRESHOLD_MS, current_db_operation
+from app.server_timing import record_phase
+from app.utils import setup_logging
+
+logger = setup_logging()
+
+OTHER_FINGERPRINT = '(other statements)'
+SORT_KEYS = ('total_ms', 'count', 'max_ms', 'avg_ms', 'rows', 'errors')
+# Parameters shown per slow executemany() statement
+SLOW_LOG_MAX_PARAMETER_SETS = 3
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMETERS = re.compile(r'%\(\w+\)s|%s|(?<![:\w]):\w+|\$\d+|\?')
+_NUMBERS = re.compile(r'(?<![\w.])\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.I)
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACES = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement):
+    """Normalize a SQL statement so executions that differ only in values share one key"""
+    text = _COMMENTS.sub(' ', statement)
+    text = _STRINGS.sub('?', text)
+    text = _PARAMETERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub('(...)', text)
+    text = _ROWS.sub('(...)', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def _redact_value(value):
+    return None if value is None else f'<{type(value).__name__}>'
+
+
+def redact_parameters(parameters, executemany=False):
+    """Statement parameters with every value replaced by its type, e.g. ``{'email': '<str>'}``"""
+    if executemany:
+        sets = list(parameters[:SLOW_LOG_MAX_PARAMETER_SETS])
+        redacted = [redact_parameters(item) for item in sets]
+        if len(parameters) > len(sets):
+            redacted.append(f'... {len(parameters) - len(sets)} more')
+        return redacted
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+class QueryProfiler:
+    """Flask extension keeping per-fingerprint SQL statistics for each worker"""
+
+    extension_name = 'query_profiler'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_PROFILER_ENABLED', True)
+        app.config.setdefault('QUERY_PROFILER_MAX_FINGERPRINTS', 500)
+        app.config.setdefault('SLOW_QUERY_LOG_ENABLED', False)
+        app.config.setdefault('SLOW_QUERY_LOG_THRESHOLD_MS', SLOW_QUERY_THRESHOLD_MS)
+        app.extensions[self.extension_name] = _QueryProfilerState(app)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the profiler of the given (or current) app, or None if disabled"""
+        app = app or current_app
+        state = app.extensions.get(QueryProfiler.extension_name)
+        if state is None or not app.config['QUERY_PROFILER_ENABLED']:
+            return None
+        return state
+
+
+class _StatementStats:
+    __slots__ = ('count', 'total_ns', 'max_ns', 'rows', 'errors')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.rows = 0
+        self.errors = 0
+
+    def as_dict(self, statement):
+        total_ms = self.total_ns / 1e6
+        return {
+            'fingerprint': statement,
+            'count': self.count,
+            'total_ms': round(total_ms, 3),
+            'avg_ms': round(total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ns / 1e6, 3),
+            'rows': self.rows,
+            'errors': self.errors,
+        }
+
+
+class _QueryProfilerState:
+    """This worker's fingerprint table"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._started = time.time()
+        self._statements = {}
+
+    def _table(self):
+        # Counts made by a preloading master are not this worker's
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._clear()
+        return self._statements
+
+    def record(self, statement, elapsed_ns, rows, error=False):
+        key = fingerprint(statement)
+        with self._lock:
+            table = self._table()
+            stats = table.get(key)
+            if stats is None:
+                if len(table) >= self.app.config['QUERY_PROFILER_MAX_FINGERPRINTS']:
+                    key = OTHER_FINGERPRINT
+                    stats = table.get(key)
+                if stats is None:
+                    stats = table[key] = _StatementStats()
+            stats.count += 1
+            stats.total_ns += elapsed_ns
+            stats.max_ns = max(stats.max_ns, elapsed_ns)
+            if rows > 0:
+                stats.rows += rows
+            if error:
+                stats.errors += 1
+
+    def _clear(self):
+        self._statements = {}
+        self._started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self, top=20, sort='total_ms'):
+        """The ``top`` fingerprints ordered by ``sort`` (one of SORT_KEYS), highest first"""
+        with self._lock:
+            table = self._table()
+            queries = [stats.as_dict(statement) for statement, stats in table.items()]
+            since = self._started
+        queries.sort(key=lambda query: query[sort], reverse=True)
+        return {
+            'enabled': True,
+            'pid': os.getpid(),
+            'since': since,
+            'fingerprints': len(queries),
+            'statements': sum(query['count'] for query in queries),
+            'total_ms': round(sum(query['total_ms'] for query in queries), 3),
+            'queries': queries[:top],
+        }
+
+
+def instrument_engine(engine):
+    """Time every statement run on ``engine`` (primary and replica engines alike)"""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_started_ns = time.perf_counter_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_ns = getattr(context, '_profiler_started_ns', None)
+    if started_ns is None:
+        return
+    _finish_statement(time.perf_counter_ns() - started_ns, statement, parameters, executemany,
+                      rows=cursor.rowcount)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    started_ns = getattr(context, '_profiler_started_ns', None)
+    if started_ns is None or exception_context.statement is None:
+        return
+    _finish_statement(time.perf_counter_ns() - started_ns, exception_context.statement,
+                      exception_context.parameters, getattr(context, 'executemany', False), error=True)
+
+
+def _finish_statement(elapsed_ns, statement, parameters, executemany, rows=-1, error=False):
+    operation = current_db_operation()
+    if operation is not None:
+        operation.statements += 1
+    else:
+        record_phase('db', elapsed_ns)
+
+    if not has_app_context():
+        return
+    state = QueryProfiler.get_state()
+    if state is not None:
+        state.record(statement, elapsed_ns, rows, error)
+
+    config = current_app.config
+    if config['SLOW_QUERY_LOG_ENABLED'] and elapsed_ns >= config['SLOW_QUERY_LOG_THRESHOLD_MS'] * 1e6:
+        logger.warning("Slow SQL statement",
+                       duration_ms=round(elapsed_ns / 1e6, 3),
+                       fingerprint=fingerprint(statement),
+                       parameters=redact_parameters(parameters, executemany),
+                       rows=rows,
+                       error=error)
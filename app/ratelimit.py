@@ -0,0 +1,376 @@
+"""
+Per-client rate limiting and load shedding shared by all gunicorn workers
+Token buckets live in a SQLite file (on /dev/shm when available) and the
+in-flight request count in a small mmapped file, so no Redis is required.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+from flask import current_app, g, request
+
+from app.json_response import jsonify
+from app.server_timing import phase
+
+_DEFAULT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp'
+DEFAULT_BUCKET_PATH = os.path.join(_DEFAULT_DIR, 'blacklist-ratelimit.db')
+DEFAULT_IN_FLIGHT_PATH = os.path.join(_DEFAULT_DIR, 'blacklist-inflight.bin')
+
+# Paths exempt from load shedding so load balancer health checks (and scrapes) keep passing
+LOAD_SHED_EXEMPT_PATHS = ('/', '/health', '/ping', '/metrics')
+
+
+class SQLiteStore:
+    """Small key/value table in a SQLite file shared by all workers"""
+
+    schema = None
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            # Connections must not be shared across fork
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.executescript(self.schema)
+            self._local.connection = connection
+            self._local.pid = pid
+        return connection
+
+
+class SQLiteTokenBucketStore(SQLiteStore):
+    """Token buckets in a SQLite file, updated atomically across processes"""
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS buckets ('
+        'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL);'
+        'CREATE INDEX IF NOT EXISTS ix_buckets_updated_at ON buckets (updated_at)'
+    )
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._pruned_at = time.monotonic()
+
+    def consume(self, key, rate, capacity):
+        """
+        Take one token from ``key``'s bucket
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        retry_after = 0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+    def prune(self, max_idle):
+        """
+        Delete buckets untouched for ``max_idle`` seconds
+
+        A bucket idle for burst / rate seconds is full again, the same as a
+        missing row, so pruning never changes a decision.
+
+        Returns:
+            Number of buckets deleted
+        """
+        self._pruned_at = time.monotonic()
+        cutoff = time.time() - max_idle
+        return self._connection().execute('DELETE FROM buckets WHERE updated_at < ?', (cutoff,)).rowcount
+
+    def maybe_prune(self, max_idle, interval):
+        """Prune at most once per ``interval`` seconds in this process"""
+        if time.monotonic() - self._pruned_at >= interval:
+            return self.prune(max_idle)
+        return 0
+
+
+class SharedInFlightCounter:
+    """
+    Instance-wide in-flight request count kept in an mmapped file
+
+    Each process owns one (pid, count) slot and is the only writer of it, so
+    increments need no cross-process lock. Slots of dead workers are reclaimed
+    under an fcntl lock.
+    """
+
+    slot = struct.Struct('<ii')
+    num_slots = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._index = None
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def _attach(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                size = self.slot.size * self.num_slots
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._mmap = mmap.mmap(fd, size)
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                try:
+                    self._index = self._claim_slot(pid)
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+            self._pid = pid
+
+    def _claim_slot(self, pid):
+        free = None
+        for index in range(self.num_slots):
+            slot_pid, _ = self.slot.unpack_from(self._mmap, index * self.slot.size)
+            if slot_pid == pid:
+                return index  # Already attached through another counter instance
+            if free is None and (slot_pid == 0 or not _pid_alive(slot_pid)):
+                free = index
+        if free is None:
+            raise RuntimeError('No free in-flight counter slots')
+        self.slot.pack_into(self._mmap, free * self.slot.size, pid, 0)
+        return free
+
+    def _add(self, delta):
+        self._attach()
+        offset = self._index * self.slot.size
+        with self._lock:
+            pid, count = self.slot.unpack_from(self._mmap, offset)
+            self.slot.pack_into(self._mmap, offset, pid, count + delta)
+
+    def increment(self):
+        self._add(1)
+
+    def decrement(self):
+        self._add(-1)
+
+    def reap(self):
+        """Zero the slots of workers that died with requests in flight"""
+        self._attach()
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                for index in range(self.num_slots):
+                    pid, _ = self.slot.unpack_from(self._mmap, index * self.slot.size)
+                    if pid and pid != os.getpid() and not _pid_alive(pid):
+                        self.slot.pack_into(self._mmap, index * self.slot.size, 0, 0)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def total(self):
+        """Sum of in-flight requests over all live workers"""
+        self._attach()
+        total = 0
+        for index in range(self.num_slots):
+            pid, count = self.slot.unpack_from(self._mmap, index * self.slot.size)
+            if pid:
+                total += count
+        return total
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _hash_token(token):
+    # Never store bearer tokens in the bucket file
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Flask extension wiring the token buckets and the load shedder into the app"""
+
+    extension_name = 'rate_limiter'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', False)
+        app.config.setdefault('RATE_LIMIT_PATH', DEFAULT_BUCKET_PATH)
+        app.config.setdefault('RATE_LIMIT_TOKEN_RATE', 100.0)
+        app.config.setdefault('RATE_LIMIT_TOKEN_BURST', 200)
+        app.config.setdefault('RATE_LIMIT_APP_RATE', 50.0)
+        app.config.setdefault('RATE_LIMIT_APP_BURST', 100)
+        app.config.setdefault('RATE_LIMIT_PRUNE_INTERVAL', 60)
+        app.config.setdefault('LOAD_SHED_ENABLED', False)
+        app.config.setdefault('LOAD_SHED_PATH', DEFAULT_IN_FLIGHT_PATH)
+        workers = app.config.setdefault('WEB_CONCURRENCY', 3)
+        threads = app.config.setdefault('GUNICORN_THREADS', 1)
+        # Requests only count once a thread runs them, so the limit must sit below workers x threads;
+        # 0 disables the in-flight check
+        app.config.setdefault('LOAD_SHED_MAX_IN_FLIGHT', workers * (threads - 1))
+        app.config.setdefault('LOAD_SHED_MAX_QUEUE_MS', 0)
+
+        app.extensions[self.extension_name] = {}
+        app.before_request(_shed_load)
+        app.teardown_request(release_in_flight)
+
+
+def _get_store(name):
+    """Bucket store or in-flight counter of the current app, created on first use"""
+    state = current_app.extensions[RateLimiter.extension_name]
+    store = state.get(name)
+    if store is None:
+        if name == 'buckets':
+            store = SQLiteTokenBucketStore(current_app.config['RATE_LIMIT_PATH'])
+        else:
+            store = SharedInFlightCounter(current_app.config['LOAD_SHED_PATH'])
+        store = state.setdefault(name, store)
+    return store
+
+
+def _retry_after_response(status, error, message, retry_after):
+    response = jsonify({'error': error, 'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _normalize_app_uuid(value):
+    # Only real UUIDs, in one spelling, become bucket keys; the rest is left to schema validation
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+
+def _request_app_uuid():
+    app_uuid = request.headers.get('X-App-UUID')
+    if app_uuid:
+        return _normalize_app_uuid(app_uuid)
+    with phase('parse'):
+        data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('app_uuid'), str):
+        return _normalize_app_uuid(data['app_uuid'])
+    return None
+
+
+def check_rate_limit(token):
+    """
+    Consume one token for the bearer token and, if known, the app_uuid
+
+    Returns:
+        None if the request may proceed, otherwise a 429 response
+    """
+    config = current_app.config
+    if not config['RATE_LIMIT_ENABLED']:
+        return None
+
+    from app.telemetry import telemetry
+
+    buckets = _get_store('buckets')
+    limits = [(f'token:{_hash_token(token)}', config['RATE_LIMIT_TOKEN_RATE'], config['RATE_LIMIT_TOKEN_BURST'])]
+    app_uuid = _request_app_uuid()
+    if app_uuid:
+        limits.append((f'app:{app_uuid}', config['RATE_LIMIT_APP_RATE'], config['RATE_LIMIT_APP_BURST']))
+
+    for key, rate, burst in limits:
+        try:
+            allowed, retry_after = buckets.consume(key, rate, burst)
+        except sqlite3.Error:
+            telemetry.incr('Custom/RateLimit/StoreError')
+            return None  # Fail open: the limiter must not take the service down
+        if not allowed:
+            telemetry.incr(f'Custom/RateLimit/Rejected/{key.split(":", 1)[0].capitalize()}')
+            return _retry_after_response(429, 'Too Many Requests', 'Rate limit exceeded', retry_after)
+
+    # Keys are client-chosen (one per app_uuid): drop buckets that have refilled
+    max_idle = max(config['RATE_LIMIT_TOKEN_BURST'] / config['RATE_LIMIT_TOKEN_RATE'],
+                   config['RATE_LIMIT_APP_BURST'] / config['RATE_LIMIT_APP_RATE'])
+    try:
+        pruned = buckets.maybe_prune(max_idle, config['RATE_LIMIT_PRUNE_INTERVAL'])
+    except sqlite3.Error:
+        telemetry.incr('Custom/RateLimit/StoreError')
+    else:
+        if pruned:
+            telemetry.incr('Custom/RateLimit/Pruned', pruned)
+    return None
+
+
+def _shed_load():
+    """before_request hook: reject with 503 when the instance is saturated"""
+    config = current_app.config
+    if not config['LOAD_SHED_ENABLED'] or request.path in LOAD_SHED_EXEMPT_PATHS:
+        return None
+
+    from app.telemetry import telemetry
+
+    # Time spent queued before reaching the worker (Heroku/nginx style header)
+    max_queue_ms = config['LOAD_SHED_MAX_QUEUE_MS']
+    request_start = request.headers.get('X-Request-Start')
+    if max_queue_ms and request_start:
+        try:
+            started_ms = float(request_start.lstrip('t='))
+            if started_ms > 1e11:
+                queued_ms = time.time() * 1000 - started_ms
+            else:
+                queued_ms = (time.time() - started_ms) * 1000  # Seconds, as sent by nginx
+        except ValueError:
+            queued_ms = 0
+        if queued_ms > max_queue_ms:
+            telemetry.incr('Custom/LoadShed/QueueTime')
+            return _retry_after_response(503, 'Service Unavailable', 'Server is overloaded', 1)
+
+    max_in_flight = config['LOAD_SHED_MAX_IN_FLIGHT']
+    if not max_in_flight:
+        return None
+    in_flight = _get_store('in_flight')
+    in_flight.increment()
+    g.in_flight_counted = True
+    if in_flight.total() > max_in_flight:
+        in_flight.reap()
+    if in_flight.total() > max_in_flight:
+        telemetry.incr('Custom/LoadShed/InFlight')
+        return _retry_after_response(503, 'Service Unavailable', 'Server is overloaded', 1)
+    return None
+
+
+def release_in_flight(exc=None):
+    """Stop counting the current request as in flight (teardown hook; also called by long polls before waiting)"""
+    if g.pop('in_flight_counted', False):
+        _get_store('in_flight').decrement()
@@ -0,0 +1,326 @@
+"""
+Read-replica routing
+SELECTs outside a write transaction go to the replicas in DATABASE_READ_URL
+(round-robin); everything else goes to the primary. Each worker probes its
+replicas every REPLICA_CHECK_INTERVAL seconds and skips those that are down
+or lag more than REPLICA_MAX_LAG_SECONDS. A client that just wrote reads from
+the primary for REPLICA_STICKY_SECONDS, in every worker.
+"""
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, func, orm, select
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql import Select
+
+from app.db_pool import PooledSQLAlchemy
+from app.ratelimit import SQLiteStore
+from app.telemetry import telemetry
+
+_DEFAULT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp'
+DEFAULT_WRITES_PATH = os.path.join(_DEFAULT_DIR, 'blacklist-writes.db')
+
+
+def parse_read_urls(value):
+    """Split a comma separated DATABASE_READ_URL into URLs"""
+    return [url.strip() for url in (value or '').split(',') if url.strip()]
+
+
+class SQLiteWriteMarkerStore(SQLiteStore):
+    """Time of the last write per client, shared by all workers"""
+
+    schema = 'CREATE TABLE IF NOT EXISTS writes (key TEXT PRIMARY KEY, written_at REAL NOT NULL)'
+
+    def mark(self, key, when=None):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO writes (key, written_at) VALUES (?, ?)',
+            (key, time.time() if when is None else when)
+        )
+
+    def last_write(self, key):
+        row = self._connection().execute('SELECT written_at FROM writes WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+
+class _Replica:
+    """One replica engine and its last probe result"""
+
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.healthy = False
+        self.lag_seconds = None
+        self.max_id = None
+        self.error = None
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """Flask extension holding the replica engines and the routing decision"""
+
+    extension_name = 'replica_router'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_READ_URL', '')
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5.0)
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 5.0)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', None)
+        app.config.setdefault('REPLICA_WRITES_PATH', DEFAULT_WRITES_PATH)
+        app.extensions[self.extension_name] = _ReplicaState(app)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the routing state of the given (or current) app, or None without replicas"""
+        app = app or current_app
+        state = app.extensions.get(ReplicaRouter.extension_name)
+        if state is None or not parse_read_urls(app.config['DATABASE_READ_URL']):
+            return None
+        return state
+
+
+class _ReplicaState:
+    """Per-worker replica engines, probe results and routing counters"""
+
+    def __init__(self, app):
+        self.app = app
+        self.replicas = []
+        self.primary_reads = {'lag': 0, 'unavailable': 0, 'sticky': 0}
+        self._pid = None
+        self._counter = itertools.count()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._writes = None
+
+    def _attach(self):
+        # Engines (and their pools) must not be shared across fork
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            from app import db
+
+            replicas = []
+            for url in parse_read_urls(self.app.config['DATABASE_READ_URL']):
+                sa_url, options = db.apply_driver_hacks(self.app, make_url(url), {})
+                replica = _Replica(url, db.create_engine(sa_url, options))
+                event.listen(replica.engine, 'handle_error', self._make_error_handler(replica))
+                replicas.append(replica)
+            self.replicas = replicas
+            self._writes = SQLiteWriteMarkerStore(self.app.config['REPLICA_WRITES_PATH'])
+            self._checked_at = 0.0
+            self._pid = pid
+
+    def _make_error_handler(self, replica):
+        def handle_error(context):
+            # Take the replica out of rotation until the next successful probe
+            replica.healthy = False
+            replica.error = str(context.original_exception)
+        return handle_error
+
+    @property
+    def sticky_seconds(self):
+        config = self.app.config
+        sticky = config['REPLICA_STICKY_SECONDS']
+        if sticky is None:
+            # Long enough for any replica we still route to to have caught up
+            sticky = config['REPLICA_MAX_LAG_SECONDS'] + config['REPLICA_CHECK_INTERVAL']
+        return sticky
+
+    def check(self):
+        """Probe every replica for availability and lag against the primary"""
+        self._attach()
+        from app import db
+        from app.models import Blacklist
+
+        table = Blacklist.__table__
+        primary = db.get_engine(self.app)
+        with primary.connect() as connection:
+            primary_max_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    replica_max_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+            except Exception as e:
+                replica.healthy = False
+                replica.error = str(e)
+                continue
+
+            if replica_max_id >= primary_max_id:
+                lag_seconds = 0.0
+            else:
+                # Age of the oldest row the replica has not applied yet
+                with primary.connect() as connection:
+                    oldest = connection.execute(
+                        select(func.min(table.c.created_at)).where(table.c.id > replica_max_id)
+                    ).scalar()
+                lag_seconds = max(0.0, (datetime.utcnow() - oldest).total_seconds()) if oldest else 0.0
+
+            replica.max_id = replica_max_id
+            replica.lag_seconds = lag_seconds
+            replica.healthy = True
+            replica.error = None
+
+            telemetry.timing('Custom/Database/Replica/Lag', lag_seconds * 1000)
+
+    def _maybe_check(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.app.config['REPLICA_CHECK_INTERVAL']:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return  # Another thread is probing; use the previous results
+        try:
+            self._checked_at = now
+            try:
+                self.check()
+            except Exception:
+                # Primary unreachable: keep the previous results
+                pass
+        finally:
+            self._check_lock.release()
+
+    def _count_primary_read(self, reason):
+        with self._lock:
+            self.primary_reads[reason] += 1
+        telemetry.incr(f'Custom/Database/Replica/Fallback/{reason.capitalize()}')
+
+    def read_engine(self):
+        """
+        Engine for the next read-only query
+
+        Returns:
+            A replica engine, or None if the query must go to the primary
+        """
+        self._attach()
+        if has_request_context():
+            if 'replica_primary' not in g:
+                g.replica_primary = self._client_wrote_recently()
+                if g.replica_primary:
+                    self._count_primary_read('sticky')
+            if g.replica_primary:
+                return None
+
+        self._maybe_check()
+        max_lag = self.app.config['REPLICA_MAX_LAG_SECONDS']
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            self._count_primary_read('unavailable')
+            return None
+        candidates = [replica for replica in candidates if replica.lag_seconds <= max_lag]
+        if not candidates:
+            self._count_primary_read('lag')
+            return None
+
+        replica = candidates[next(self._counter) % len(candidates)]
+        replica.reads += 1
+        return replica.engine
+
+    def _client_wrote_recently(self):
+        try:
+            written_at = self._writes.last_write(client_key())
+        except sqlite3.Error:
+            return True  # Unknown: read from the primary to be safe
+        return written_at is not None and time.time() - written_at < self.sticky_seconds
+
+    def record_write(self):
+        """Send this client's reads to the primary for the next sticky_seconds"""
+        self._attach()
+        g.replica_primary = True
+        try:
+            self._writes.mark(client_key())
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Replica probe results and routing counters for this worker"""
+        self._attach()
+        return {
+            'enabled': True,
+            'max_lag_seconds': self.app.config['REPLICA_MAX_LAG_SECONDS'],
+            'sticky_seconds': self.sticky_seconds,
+            'replicas': [
+                {
+                    'url': make_url(replica.url).render_as_string(hide_password=True),
+                    'healthy': replica.healthy,
+                    'lag_seconds': replica.lag_seconds,
+                    'max_id': replica.max_id,
+                    'reads': replica.reads,
+                    'error': replica.error,
+                }
+                for replica in self.replicas
+            ],
+            'primary_reads': dict(self.primary_reads),
+        }
+
+
+def read_from_primary():
+    """Send the remaining reads of this request to the primary (e.g. checks before a write)"""
+    if has_request_context():
+        g.replica_primary = True
+
+
+def client_key():
+    """Identify the calling client by bearer token and IP, without storing the token"""
+    from app.utils import get_client_ip
+
+    raw = f"{request.headers.get('Authorization', '')}|{get_client_ip()}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends plain SELECTs to a replica
+
+    Once the current transaction flushes or executes anything other than a
+    SELECT, every statement goes to the primary until it ends, so a request
+    always sees its own uncommitted writes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._wrote = False
+        super().__init__(*args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+            if clause is not None or self._flushing:
+                self._wrote = True
+        elif not self._wrote:
+            state = ReplicaRouter.get_state(self.app)
+            if state is not None:
+                engine = state.read_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause)
+
+    def commit(self):
+        super().commit()  # Flushes pending objects first, which sets _wrote
+        wrote, self._wrote = self._wrote, False
+        if wrote and has_request_context():
+            state = ReplicaRouter.get_state(self.app)
+            if state is not None:
+                state.record_write()
+
+    def rollback(self):
+        super().rollback()
+        self._wrote = False
+
+
+class RoutingSQLAlchemy(PooledSQLAlchemy):
+    """PooledSQLAlchemy whose sessions route reads to the configured replicas"""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -1,26 +1,36 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, current_app
+from app.json_response import jsonify
 from app import db
 from app.models import Blacklist
-from app.schemas import BlacklistSchema, BlacklistResponseSchema, ErrorSchema
+from app.schemas import ErrorSchema, get_blacklist_schemas
 from app.auth import require_bearer_token
 from app.utils import get_client_ip, setup_logging
 from app.db_metrics import db_operation_timer, record_db_metric
+from app.telemetry import telemetry, function_trace
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
-import newrelic.agent
-import time
+from sqlalchemy.dialects import postgresql, sqlite
+from marshmallow import ValidationError
+from app.snapshot import remember_inserted_emails
+from app.canonical import canonicalize_email, email_digest
+from app.replicas import ReplicaRouter, read_from_primary
+from app.lookup_cache import LookupCache, bump_dataset_version, lock_dataset_version
+from app.changes import notify_changes
+from app.group_commit import GroupCommitter, InsertQueueFull
+from app.server_timing import phase
 
 blacklists_bp = Blueprint('blacklists', __name__)
 logger = setup_logging()
 
-# Initialize schemas
-blacklist_schema = BlacklistSchema()
-blacklist_response_schema = BlacklistResponseSchema()
+# Unique key deciding duplicates: every spelling of a mailbox shares it
+MAILBOX_KEY = ['email_digest', 'email_canonical']
+
+# Initialize schemas (BlacklistSchema and BlacklistResponseSchema come from get_blacklist_schemas())
 error_schema = ErrorSchema()
 
 @blacklists_bp.route('', methods=['POST'])
 @require_bearer_token
-@newrelic.agent.function_trace()
+@function_trace()
 def add_to_blacklist():
     """
     Add an email to the global blacklist
@@ -34,32 +44,38 @@ def add_to_blacklist():
 
     Headers:
         Authorization: Bearer <token>
+        Prefer: respond-async (optional, with INSERT_ASYNC_ENABLED)
 
     Returns:
         201: Email added successfully
+        202: Email queued for the next group commit (Prefer: respond-async)
         400: Validation error
         401: Unauthorized
         409: Email already exists
         500: Server error
+        503: Group commit queue full
     """
     # Record custom metric for blacklist addition attempt
-    newrelic.agent.record_custom_metric('Custom/Blacklist/AddAttempt', 1)
+    telemetry.incr('Custom/Blacklist/AddAttempt')
     
     try:
         # Validate request data
-        data = request.get_json()
+        with phase('parse'):
+            data = request.get_json()
         if not data:
-            newrelic.agent.record_custom_metric('Custom/Blacklist/AddValidationError', 1)
+            telemetry.incr('Custom/Blacklist/AddValidationError')
             return jsonify({
                 'error': 'Bad Request',
                 'message': 'Request body must be JSON'
             }), 400
 
-        # Validate using Marshmallow schema
+        # Validate with the BlacklistSchema rules
+        blacklist_schema, blacklist_response_schema = get_blacklist_schemas()
         try:
-            validated_data = blacklist_schema.load(data)
+            with phase('validation'):
+                validated_data = blacklist_schema.load(data)
         except Exception as e:
-            newrelic.agent.record_custom_metric('Custom/Blacklist/AddValidationError', 1)
+            telemetry.incr('Custom/Blacklist/AddValidationError')
             return jsonify({
                 'error': 'Bad Request',
                 'message': 'Validation error',
@@ -70,34 +86,45 @@ def add_to_blacklist():
         client_ip = get_client_ip()
 
         # Create new blacklist entry
+        canonical = canonicalize_email(validated_data['email'])
         blacklist_entry = Blacklist(
             email=validated_data['email'],
+            email_canonical=canonical,
+            email_digest=email_digest(canonical),
             app_uuid=validated_data['app_uuid'],
             blocked_reason=validated_data.get('blocked_reason'),
             client_ip=client_ip,
             created_at=datetime.utcnow()
         )
 
+        # Group commit / 202 modes: a committer thread shares one transaction between requests
+        committer = GroupCommitter.get_state()
+        if committer is not None and (current_app.config['INSERT_GROUP_COMMIT_ENABLED'] or wants_async_response()):
+            return add_through_committer(committer, blacklist_entry, blacklist_response_schema)
+
         # Save to database with timing
         try:
-            start_time = time.time()
-            db.session.add(blacklist_entry)
-            db.session.commit()
-            elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-            
-            # Record database response time metric
-            record_db_metric("insert", elapsed_time, success=True)
+            with db_operation_timer("insert") as operation:
+                # Version row lock first: ids are allocated (and commit) in order for the change feed.
+                # A duplicate rolls the bump back with the insert.
+                bump_dataset_version()
+                db.session.add(blacklist_entry)
+                db.session.flush()
+                entry_id = blacklist_entry.id
+                db.session.commit()
+            invalidate_lookup_cache()
+            notify_changes(entry_id)
 
             logger.info("Email added to blacklist", 
                        email=validated_data['email'], 
                        client_ip=client_ip,
                        app_uuid=validated_data['app_uuid'],
-                       db_time_ms=elapsed_time)
+                       db_time_ms=operation.elapsed_ms)
 
             # Record success metric
-            newrelic.agent.record_custom_metric('Custom/Blacklist/AddSuccess', 1)
-            newrelic.agent.add_custom_attribute('email', validated_data['email'])
-            newrelic.agent.add_custom_attribute('app_uuid', validated_data['app_uuid'])
+            telemetry.incr('Custom/Blacklist/AddSuccess')
+            telemetry.add_attribute('email', validated_data['email'])
+            telemetry.add_attribute('app_uuid', validated_data['app_uuid'])
 
             return jsonify({
                 'message': 'Email agregado exitosamente a la lista negra.',
@@ -105,14 +132,13 @@ def add_to_blacklist():
             }), 201
 
         except IntegrityError as e:
+            # db_operation_timer already recorded the failed insert
             db.session.rollback()
-            # Record database error metric
-            record_db_metric("insert", 0, success=False)
-            
+
             if 'unique constraint' in str(e).lower() or 'duplicate key' in str(e).lower():
                 # Record duplicate email metric
-                newrelic.agent.record_custom_metric('Custom/Blacklist/AddDuplicate', 1)
-                newrelic.agent.record_exception()
+                telemetry.incr('Custom/Blacklist/AddDuplicate')
+                telemetry.record_exception()
                 return jsonify({
                     'error': 'Conflict',
                     'message': 'Email already exists in blacklist'
@@ -122,8 +148,8 @@ def add_to_blacklist():
                              error=str(e), 
                              error_type="IntegrityError")
                 # Record database error
-                newrelic.agent.record_custom_metric('Custom/Blacklist/AddDatabaseError', 1)
-                newrelic.agent.record_exception()
+                telemetry.incr('Custom/Blacklist/AddDatabaseError')
+                telemetry.record_exception()
                 return jsonify({
                     'error': 'Internal Server Error',
                     'message': 'Database error occurred'
@@ -134,11 +160,307 @@ def add_to_blacklist():
                     error=str(e), 
                     error_type=type(e).__name__)
         # Record error metric
-        newrelic.agent.record_custom_metric('Custom/Blacklist/AddError', 1)
-        newrelic.agent.record_exception()
+        telemetry.incr('Custom/Blacklist/AddError')
+        telemetry.record_exception()
         return jsonify({
             'error': 'Internal Server Error',
             'message': 'An unexpected error occurred'
         }), 500
 
 # TODO: GET endpoint movido a blacklists_get.py
+
+
+def invalidate_lookup_cache():
+    """Make this worker read the bumped dataset version on its next lookup"""
+    state = LookupCache.get_state()
+    if state is not None:
+        state.invalidate()
+
+
+def bulk_insert_rows(rows):
+    """
+    Insert many blacklist rows skipping mailboxes that already exist
+
+    Duplicates are decided by the unique ``(email_digest, email_canonical)``
+    key, so any spelling of a stored address is skipped. Uses multi-row
+    ``INSERT ... ON CONFLICT (email_digest, email_canonical) DO NOTHING`` on
+    PostgreSQL and SQLite. The caller owns the transaction.
+
+    Args:
+        rows: List of dicts with the Blacklist column values, unique by email_canonical
+
+    Returns:
+        set of emails (as given in ``rows``) that were actually inserted
+    """
+    # The duplicate checks below must not see a lagging replica
+    read_from_primary()
+    dialect = db.engine.dialect.name
+    chunk_size = current_app.config['BULK_INSERT_CHUNK_SIZE']
+    table = Blacklist.__table__
+    created = set()
+
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(table).values(chunk) \
+                .on_conflict_do_nothing(index_elements=MAILBOX_KEY) \
+                .returning(table.c.email)
+            created.update(email for (email,) in db.session.execute(stmt))
+            continue
+
+        # Without RETURNING, find the pre-existing mailboxes inside the same transaction
+        digests = [row['email_digest'] for row in chunk]
+        existing = set(
+            db.session.query(Blacklist.email_digest, Blacklist.email_canonical)
+            .filter(Blacklist.email_digest.in_(digests))
+        )
+        new_rows = [row for row in chunk if (row['email_digest'], row['email_canonical']) not in existing]
+        if not new_rows:
+            continue
+
+        if dialect == 'sqlite':
+            stmt = sqlite.insert(table).values(new_rows).on_conflict_do_nothing(index_elements=MAILBOX_KEY)
+        else:
+            stmt = table.insert().values(new_rows)
+        db.session.execute(stmt)
+        created.update(row['email'] for row in new_rows)
+
+    return created
+
+
+def insert_group(rows):
+    """
+    Insert rows queued by concurrent requests in one transaction (see app.group_commit)
+
+    Args:
+        rows: List of dicts with the Blacklist column values, unique by email_canonical
+
+    Returns:
+        dict mapping each inserted email to its new id (existing mailboxes are left out)
+    """
+    # One latency metric per group, not per row
+    try:
+        with db_operation_timer("group_insert"):
+            lock_dataset_version()
+            created = bulk_insert_rows(rows)
+            ids = {}
+            if created:
+                bump_dataset_version()
+                emails = list(created)
+                chunk_size = current_app.config['BULK_INSERT_CHUNK_SIZE']
+                for i in range(0, len(emails), chunk_size):
+                    ids.update(db.session.query(Blacklist.email, Blacklist.id)
+                               .filter(Blacklist.email.in_(emails[i:i + chunk_size])))
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+    telemetry.timing('Custom/Blacklist/GroupCommitSize', len(rows))
+
+    remember_inserted_emails(created)
+    if ids:
+        invalidate_lookup_cache()
+        notify_changes(max(ids.values()))
+    return ids
+
+
+def wants_async_response():
+    """Whether the caller asked for 202 Accepted (``Prefer: respond-async``) and it is allowed"""
+    return current_app.config['INSERT_ASYNC_ENABLED'] and \
+        'respond-async' in request.headers.get('Prefer', '').lower()
+
+
+def add_through_committer(committer, blacklist_entry, blacklist_response_schema):
+    """
+    Queue ``blacklist_entry`` on the group committer and answer like add_to_blacklist
+
+    Returns:
+        202 if the caller sent ``Prefer: respond-async`` and INSERT_ASYNC_ENABLED is set,
+        otherwise 201/409 once the group is committed; 503 if the queue is full
+    """
+    row = {column: getattr(blacklist_entry, column) for column in (
+        'email', 'email_canonical', 'email_digest', 'app_uuid', 'blocked_reason', 'client_ip', 'created_at'
+    )}
+    try:
+        if wants_async_response():
+            committer.submit_async(row)
+            telemetry.incr('Custom/Blacklist/AddAccepted')
+            response = jsonify({
+                'message': 'Solicitud aceptada; el email se agregará a la lista negra.',
+                'data': {'email': row['email']}
+            })
+            response.headers['Preference-Applied'] = 'respond-async'
+            return response, 202
+        future = committer.submit(row)
+    except InsertQueueFull:
+        response = jsonify({
+            'error': 'Service Unavailable',
+            'message': 'Too many inserts queued, retry later'
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    # The insert happens in the committer thread; waiting for it is this request's DB time
+    with phase('db'):
+        entry_id = future.result(timeout=current_app.config['INSERT_GROUP_COMMIT_TIMEOUT'])
+    if entry_id is None:
+        record_db_metric("insert", 0, success=False)
+        telemetry.incr('Custom/Blacklist/AddDuplicate')
+        return jsonify({
+            'error': 'Conflict',
+            'message': 'Email already exists in blacklist'
+        }), 409
+
+    # The commit ran in the committer thread: keep this client's reads on the primary
+    replicas = ReplicaRouter.get_state()
+    if replicas is not None:
+        replicas.record_write()
+
+    logger.info("Email added to blacklist",
+               email=row['email'],
+               client_ip=row['client_ip'],
+               app_uuid=row['app_uuid'],
+               group_commit=True)
+    telemetry.incr('Custom/Blacklist/AddSuccess')
+    telemetry.add_attribute('email', row['email'])
+    telemetry.add_attribute('app_uuid', row['app_uuid'])
+
+    blacklist_entry.id = entry_id
+    return jsonify({
+        'message': 'Email agregado exitosamente a la lista negra.',
+        'data': blacklist_response_schema.dump(blacklist_entry)
+    }), 201
+
+
+@blacklists_bp.route('/bulk', methods=['POST'])
+@require_bearer_token
+@function_trace()
+def add_to_blacklist_bulk():
+    """
+    Add many emails to the global blacklist in one transaction
+
+    Request Body:
+        [
+            {"email": "user1@example.com", "app_uuid": "...", "blocked_reason": "Spam"},
+            {"email": "user2@example.com", "app_uuid": "..."}
+        ]
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Per-item status (created, duplicate or invalid) in input order
+        400: Body is not a non-empty JSON array or exceeds the item limit
+        401: Unauthorized
+        500: Server error
+    """
+    telemetry.incr('Custom/Blacklist/BulkAddAttempt')
+
+    try:
+        with phase('parse'):
+            items = request.get_json(silent=True)
+        if not isinstance(items, list) or not items:
+            telemetry.incr('Custom/Blacklist/BulkAddValidationError')
+            return jsonify({
+                'error': 'Bad Request',
+                'message': 'Request body must be a non-empty JSON array'
+            }), 400
+
+        max_items = current_app.config['BULK_INSERT_MAX_ITEMS']
+        if len(items) > max_items:
+            telemetry.incr('Custom/Blacklist/BulkAddValidationError')
+            return jsonify({
+                'error': 'Bad Request',
+                'message': f'At most {max_items} items can be added per request'
+            }), 400
+
+        client_ip = get_client_ip()
+        created_at = datetime.utcnow()
+        blacklist_schema = get_blacklist_schemas()[0]
+        results = []
+        rows = []
+        seen = set()
+
+        for index, item in enumerate(items):
+            try:
+                with phase('validation'):
+                    validated_data = blacklist_schema.load(item if isinstance(item, dict) else {})
+            except ValidationError as e:
+                results.append({'index': index, 'status': 'invalid', 'details': e.messages})
+                continue
+
+            email = validated_data['email']
+            results.append({'index': index, 'email': email, 'status': None})
+            # Other spellings of a mailbox already in this request are duplicates
+            canonical = canonicalize_email(email)
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            rows.append({
+                'email': email,
+                'email_canonical': canonical,
+                'email_digest': email_digest(canonical),
+                'app_uuid': validated_data['app_uuid'],
+                'blocked_reason': validated_data.get('blocked_reason'),
+                'client_ip': client_ip,
+                'created_at': created_at
+            })
+
+        try:
+            with db_operation_timer("bulk_insert") as operation:
+                created = set()
+                if rows:
+                    # Ids are allocated under the version row lock (see app.changes)
+                    lock_dataset_version()
+                    created = bulk_insert_rows(rows)
+                if created:
+                    bump_dataset_version()
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Core inserts bypass the ORM listeners that feed the lookup filters
+        remember_inserted_emails(created)
+        if created:
+            invalidate_lookup_cache()
+            notify_changes()
+
+        # The first occurrence of a newly inserted email is the created one
+        for result in results:
+            if result['status'] is None:
+                if result['email'] in created:
+                    result['status'] = 'created'
+                    created.discard(result['email'])
+                else:
+                    result['status'] = 'duplicate'
+
+        summary = {status: 0 for status in ('created', 'duplicate', 'invalid')}
+        for result in results:
+            summary[result['status']] += 1
+
+        telemetry.incr('Custom/Blacklist/BulkAddCreated', summary['created'])
+        telemetry.incr('Custom/Blacklist/BulkAddDuplicate', summary['duplicate'])
+        telemetry.incr('Custom/Blacklist/BulkAddInvalid', summary['invalid'])
+
+        logger.info("Bulk add to blacklist",
+                   client_ip=client_ip,
+                   items=len(items),
+                   db_time_ms=operation.elapsed_ms,
+                   **summary)
+
+        return jsonify({'summary': summary, 'results': results}), 200
+
+    except Exception as e:
+        logger.error("Unexpected error in add_to_blacklist_bulk",
+                    error=str(e),
+                    error_type=type(e).__name__)
+        telemetry.incr('Custom/Blacklist/BulkAddError')
+        telemetry.record_exception()
+        return jsonify({
+            'error': 'Internal Server Error',
+            'message': 'An unexpected error occurred'
+        }), 500
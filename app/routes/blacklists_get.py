@@ -1,10 +1,18 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, current_app, Response, stream_with_context, url_for
+from app.json_response import jsonify
 from app import db
 from app.models import Blacklist
 from app.auth import require_bearer_token
 from app.utils import setup_logging
-from app.db_metrics import record_db_metric
-import newrelic.agent
+from app.db_metrics import db_operation_timer
+from app.telemetry import telemetry, function_trace
+from app.snapshot import get_lookup_filter
+from app.canonical import canonicalize_email, email_digest
+from app.exporter import export_rows, next_page_after_id, EXPORT_FORMATS
+from app.lookup_cache import LookupCache
+from app.changes import ChangeNotifier, fetch_changes
+from app.server_timing import phase
+from app.ratelimit import release_in_flight
 import time
 
 blacklists_get_bp = Blueprint('blacklists_get', __name__)
@@ -12,7 +20,7 @@ logger = setup_logging()
 
 @blacklists_get_bp.route('/<string:email>', methods=['GET'])
 @require_bearer_token
-@newrelic.agent.function_trace()
+@function_trace()
 def check_blacklist(email):
     """
     Check if an email is in the global blacklist
@@ -24,7 +32,8 @@ def check_blacklist(email):
         Authorization: Bearer <token>
     
     Returns:
-        200: Email status with blacklist information
+        304: If-None-Match holds the current ETag (the lookup is not run)
+        200: Email status with blacklist information, ETag and Cache-Control
         {
             "email": "user@example.com",
             "is_blacklisted": true,
@@ -39,24 +48,52 @@ def check_blacklist(email):
         }
     """
     # Record custom metric for blacklist query attempt
-    newrelic.agent.record_custom_metric('Custom/Blacklist/QueryAttempt', 1)
+    telemetry.incr('Custom/Blacklist/QueryAttempt')
     
     try:
         # Validate email format (basic validation)
         if not email or '@' not in email:
-            newrelic.agent.record_custom_metric('Custom/Blacklist/QueryValidationError', 1)
+            telemetry.incr('Custom/Blacklist/QueryValidationError')
             return jsonify({
                 'error': 'Bad Request',
                 'message': 'Invalid email format'
             }), 400
         
-        # Query database for email with timing
-        start_time = time.time()
-        blacklist_entry = Blacklist.query.filter_by(email=email.lower()).first()
-        elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        
-        # Record database response time metric
-        record_db_metric("query", elapsed_time, success=True)
+        # One canonical key for every spelling of the mailbox (case, IDN, provider aliases)
+        canonical = canonicalize_email(email)
+
+        # A client holding the current ETag already has the answer
+        lookup_cache = LookupCache.get_state()
+        version = None
+        if lookup_cache is not None:
+            matched = lookup_cache.not_modified_result(request.if_none_match, canonical)
+            if matched is not None:
+                version, found = matched
+                return lookup_cache.apply(current_app.response_class(status=304), version, canonical, found)
+            # Read before the lookup, so the answer is at least as new as its tag
+            version = lookup_cache.current_version()
+
+        # Definite misses from the snapshot/Bloom filter skip the database entirely
+        lookup_filter = get_lookup_filter()
+        if lookup_filter is not None and not lookup_filter.might_contain(canonical):
+            blacklist_entry = None
+            elapsed_time = 0
+            telemetry.incr('Custom/Blacklist/FilterNegative')
+        else:
+            # Query database for email with timing
+            with db_operation_timer("query") as operation:
+                # Seek on the 8-byte digest index, confirm with the canonical email
+                blacklist_entry = Blacklist.query.filter_by(
+                    email_digest=email_digest(canonical), email_canonical=canonical
+                ).first()
+            elapsed_time = operation.elapsed_ms
+
+            if lookup_filter is not None:
+                if blacklist_entry:
+                    lookup_filter.record_hit()
+                else:
+                    lookup_filter.record_false_positive()
+                    telemetry.incr('Custom/Blacklist/FilterFalsePositive')
         
         if blacklist_entry:
             logger.info("Email found in blacklist", 
@@ -64,42 +101,319 @@ def check_blacklist(email):
                        is_blacklisted=True,
                        db_time_ms=elapsed_time)
             # Record found metric
-            newrelic.agent.record_custom_metric('Custom/Blacklist/QueryFound', 1)
-            newrelic.agent.add_custom_attribute('email', email.lower())
-            newrelic.agent.add_custom_attribute('is_blacklisted', True)
-            return jsonify({
+            telemetry.incr('Custom/Blacklist/QueryFound')
+            telemetry.add_attribute('email', email.lower())
+            telemetry.add_attribute('is_blacklisted', True)
+            response = jsonify({
                 'email': blacklist_entry.email,
                 'is_blacklisted': True,
                 'blocked_reason': blacklist_entry.blocked_reason
-            }), 200
+            })
+            if lookup_cache is not None:
+                lookup_cache.apply(response, version, canonical, True)
+            return response, 200
         else:
             logger.info("Email not found in blacklist", 
                        email=email, 
                        is_blacklisted=False,
                        db_time_ms=elapsed_time)
             # Record not found metric
-            newrelic.agent.record_custom_metric('Custom/Blacklist/QueryNotFound', 1)
-            newrelic.agent.add_custom_attribute('email', email.lower())
-            newrelic.agent.add_custom_attribute('is_blacklisted', False)
-            return jsonify({
+            telemetry.incr('Custom/Blacklist/QueryNotFound')
+            telemetry.add_attribute('email', email.lower())
+            telemetry.add_attribute('is_blacklisted', False)
+            response = jsonify({
                 'email': email.lower(),
                 'is_blacklisted': False,
                 'blocked_reason': None
-            }), 200
+            })
+            if lookup_cache is not None:
+                lookup_cache.apply(response, version, canonical, False)
+            return response, 200
             
     except Exception as e:
-        # Record database error metric if it's a DB error
-        if 'database' in str(e).lower() or 'sql' in str(e).lower():
-            record_db_metric("query", 0, success=False)
-        
         logger.error("Error checking blacklist", 
                     email=email, 
                     error=str(e), 
                     error_type=type(e).__name__)
         # Record error metric
-        newrelic.agent.record_custom_metric('Custom/Blacklist/QueryError', 1)
-        newrelic.agent.record_exception()
+        telemetry.incr('Custom/Blacklist/QueryError')
+        telemetry.record_exception()
+        return jsonify({
+            'error': 'Internal Server Error',
+            'message': 'An unexpected error occurred'
+        }), 500
+
+
+def lookup_emails(emails):
+    """
+    Resolve many emails with one IN query per chunk on email_digest
+
+    Args:
+        emails: Lowercased, deduplicated email addresses
+
+    Returns:
+        dict mapping each blacklisted email to its blocked_reason
+    """
+    canonical_by_email = {email: canonicalize_email(email) for email in emails}
+    canonicals = list(dict.fromkeys(canonical_by_email.values()))
+
+    lookup_filter = get_lookup_filter()
+    if lookup_filter is not None:
+        candidates = [canonical for canonical in canonicals if lookup_filter.might_contain(canonical)]
+    else:
+        candidates = canonicals
+
+    reasons = {}
+    chunk_size = current_app.config['BATCH_CHECK_CHUNK_SIZE']
+    for i in range(0, len(candidates), chunk_size):
+        chunk = candidates[i:i + chunk_size]
+        rows = db.session.query(Blacklist.email_canonical, Blacklist.blocked_reason) \
+            .filter(Blacklist.email_digest.in_([email_digest(canonical) for canonical in chunk])).all()
+        # Drop digest collisions
+        wanted = set(chunk)
+        reasons.update((canonical, reason) for canonical, reason in rows if canonical in wanted)
+
+    if lookup_filter is not None:
+        lookup_filter.record_hit(len(reasons))
+        lookup_filter.record_false_positive(len(candidates) - len(reasons))
+
+    return {email: reasons[canonical] for email, canonical in canonical_by_email.items() if canonical in reasons}
+
+
+@blacklists_get_bp.route('/check', methods=['POST'])
+@require_bearer_token
+@function_trace()
+def check_blacklist_batch():
+    """
+    Check many emails against the global blacklist in one request
+
+    Request Body:
+        {
+            "emails": ["user1@example.com", "User2@example.com"]
+        }
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: One result per distinct (lowercased) email, in input order
+        {
+            "results": [
+                {"email": "user1@example.com", "is_blacklisted": true, "blocked_reason": "Spam"},
+                {"email": "user2@example.com", "is_blacklisted": false, "blocked_reason": null}
+            ]
+        }
+        400: Validation error
+        401: Unauthorized
+        500: Server error
+    """
+    telemetry.incr('Custom/Blacklist/BatchQueryAttempt')
+
+    try:
+        with phase('parse'):
+            data = request.get_json(silent=True)
+        emails = data.get('emails') if isinstance(data, dict) else None
+        if not isinstance(emails, list) or not emails:
+            telemetry.incr('Custom/Blacklist/BatchQueryValidationError')
+            return jsonify({
+                'error': 'Bad Request',
+                'message': 'Request body must be JSON with a non-empty "emails" list'
+            }), 400
+
+        max_emails = current_app.config['BATCH_CHECK_MAX_EMAILS']
+        if len(emails) > max_emails:
+            telemetry.incr('Custom/Blacklist/BatchQueryValidationError')
+            return jsonify({
+                'error': 'Bad Request',
+                'message': f'At most {max_emails} emails can be checked per request'
+            }), 400
+
+        invalid = [email for email in emails if not isinstance(email, str) or '@' not in email]
+        if invalid:
+            telemetry.incr('Custom/Blacklist/BatchQueryValidationError')
+            return jsonify({
+                'error': 'Bad Request',
+                'message': 'Invalid email format',
+                'details': str(invalid[:10])
+            }), 400
+
+        # Lowercase and dedupe while keeping first-seen order
+        unique_emails = list(dict.fromkeys(email.lower() for email in emails))
+
+        # One latency metric per batch, not per email
+        with db_operation_timer("batch_query") as operation:
+            found = lookup_emails(unique_emails)
+        telemetry.timing('Custom/Blacklist/BatchQuerySize', len(unique_emails))
+        telemetry.incr('Custom/Blacklist/BatchQueryFound', len(found))
+
+        logger.info("Batch blacklist check",
+                   emails=len(unique_emails),
+                   found=len(found),
+                   db_time_ms=operation.elapsed_ms)
+
+        return jsonify({
+            'results': [
+                {
+                    'email': email,
+                    'is_blacklisted': email in found,
+                    'blocked_reason': found.get(email)
+                }
+                for email in unique_emails
+            ]
+        }), 200
+
+    except Exception as e:
+        logger.error("Error checking blacklist batch",
+                    error=str(e),
+                    error_type=type(e).__name__)
+        telemetry.incr('Custom/Blacklist/BatchQueryError')
+        telemetry.record_exception()
+        return jsonify({
+            'error': 'Internal Server Error',
+            'message': 'An unexpected error occurred'
+        }), 500
+
+
+@blacklists_get_bp.route('', methods=['GET'])
+@require_bearer_token
+@function_trace()
+def export_blacklist():
+    """
+    Stream one page of the blacklist as NDJSON or CSV ordered by id
+
+    Full dumps should use ``flask blacklist export``, which is not bound by
+    the worker timeout.
+
+    Query Parameters:
+        format: ndjson (default) or csv
+        after_id: Only return rows with a greater id (keyset cursor, default 0)
+        limit: Maximum number of rows (default and cap: EXPORT_MAX_ROWS)
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Streamed rows; the id of the last row is the next after_id.
+             While more rows follow, ``Link: <...>; rel="next"`` points to the next page
+        400: Invalid query parameters
+        401: Unauthorized
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'format must be one of: {", ".join(EXPORT_FORMATS)}'
+        }), 400
+
+    try:
+        after_id = int(request.args.get('after_id', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+        if after_id < 0 or (limit is not None and limit < 0):
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'after_id and limit must be non-negative integers'
+        }), 400
+
+    max_rows = current_app.config['EXPORT_MAX_ROWS']
+    limit = max_rows if limit is None else min(limit, max_rows)
+    telemetry.incr('Custom/Blacklist/Export')
+    logger.info("Blacklist export requested", format=fmt, after_id=after_id, limit=limit)
+
+    with db_operation_timer("export_cursor"):
+        next_after_id = next_page_after_id(after_id, limit)
+    chunks = export_rows(fmt, after_id=after_id, limit=limit,
+                         page_size=current_app.config['EXPORT_PAGE_SIZE'])
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    if next_after_id is not None:
+        next_url = url_for('.export_blacklist', format=fmt, after_id=next_after_id, limit=limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+@blacklists_get_bp.route('/changes', methods=['GET'])
+@require_bearer_token
+@function_trace()
+def blacklist_changes():
+    """
+    Page through blacklist changes after a cursor, optionally long-polling for new ones
+
+    Query Parameters:
+        since: Cursor returned by the previous page (default 0: from the start)
+        limit: Maximum number of changes (default and cap: CHANGES_PAGE_SIZE)
+        wait: Seconds to wait for changes when there are none yet (capped at CHANGES_MAX_WAIT)
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Changes in id order, the next cursor and whether more are pending
+        {
+            "changes": [
+                {"op": "insert", "id": 42, "email": "user@example.com",
+                 "email_canonical": "user@example.com", "blocked_reason": "Spam",
+                 "created_at": "2024-01-01T00:00:00Z"}
+            ],
+            "cursor": 42,
+            "has_more": false
+        }
+        400: Invalid query parameters
+        401: Unauthorized
+        500: Server error
+    """
+    page_size = current_app.config['CHANGES_PAGE_SIZE']
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', page_size))
+        wait = float(request.args.get('wait', 0))
+        if since < 0 or limit <= 0 or not 0 <= wait < float('inf'):
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'since must be a non-negative integer, limit a positive integer and wait a number of seconds'
+        }), 400
+
+    limit = min(limit, page_size)
+    wait = min(wait, current_app.config['CHANGES_MAX_WAIT'])
+    telemetry.incr('Custom/Blacklist/Changes')
+
+    try:
+        notifier = ChangeNotifier.get_state()
+        deadline = time.monotonic() + wait
+        while True:
+            tick = notifier.tick if notifier is not None else 0
+            # One extra row tells whether another page is pending
+            with db_operation_timer("changes"):
+                changes = fetch_changes(since, limit + 1)
+            remaining = deadline - time.monotonic()
+            if changes or notifier is None or remaining <= 0:
+                break
+            # Waiters hold no pooled connection and do not count towards load shedding
+            db.session.close()
+            release_in_flight()
+            if not notifier.wait(since, tick, remaining):
+                break
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        telemetry.timing('Custom/Blacklist/ChangesPageSize', len(changes))
+        return jsonify({
+            'changes': changes,
+            'cursor': changes[-1]['id'] if changes else since,
+            'has_more': has_more
+        }), 200
+
+    except Exception as e:
+        logger.error("Error reading blacklist changes",
+                    since=since,
+                    error=str(e),
+                    error_type=type(e).__name__)
+        telemetry.incr('Custom/Blacklist/ChangesError')
+        telemetry.record_exception()
         return jsonify({
             'error': 'Internal Server Error',
             'message': 'An unexpected error occurred'
-        }), 500
\ No newline at end of file
+        }), 500
@@ -0,0 +1,173 @@
+from flask import Blueprint, request
+from app.json_response import jsonify
+from app import db
+from app.auth import require_bearer_token
+from app.db_pool import get_pool_state
+from app.bloom import BlacklistBloomFilter
+from app.snapshot import BlacklistSnapshot
+from app.replicas import ReplicaRouter
+from app.lookup_cache import LookupCache
+from app.changes import ChangeNotifier
+from app.group_commit import GroupCommitter
+from app.query_profiler import QueryProfiler, SORT_KEYS
+
+debug_bp = Blueprint('debug', __name__)
+
+@debug_bp.route('/bloom', methods=['GET'])
+@require_bearer_token
+def bloom_stats():
+    """
+    Bloom filter counters for this worker, used to size the filter
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Filter size, element count and hit/miss/false-positive counters
+    """
+    state = BlacklistBloomFilter.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/snapshot', methods=['GET'])
+@require_bearer_token
+def snapshot_stats():
+    """
+    Hash snapshot metadata and counters for this worker
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Snapshot size, max id, delta size and hit/miss/false-positive counters
+    """
+    state = BlacklistSnapshot.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/pool', methods=['GET'])
+@require_bearer_token
+def pool_state():
+    """
+    Database connection pool state for the worker that serves the request
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Pool class, size, checked in/out, overflow and checkout wait stats
+    """
+    return jsonify(get_pool_state(db.engine)), 200
+
+
+@debug_bp.route('/replicas', methods=['GET'])
+@require_bearer_token
+def replica_stats():
+    """
+    Read replica health, lag and routing counters for this worker
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Per-replica health, lag and reads plus reads sent to the primary by reason
+    """
+    state = ReplicaRouter.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/lookup-cache', methods=['GET'])
+@require_bearer_token
+def lookup_cache_stats():
+    """
+    Dataset version and conditional request counters for this worker
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Last read and settled dataset version, settle time and 304 count
+    """
+    state = LookupCache.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/changes', methods=['GET'])
+@require_bearer_token
+def change_notifier_stats():
+    """
+    Change feed notifier state for this worker
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Latest id seen, current long-poll waiters, notifier polls and wakeups
+    """
+    state = ChangeNotifier.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/group-commit', methods=['GET'])
+@require_bearer_token
+def group_commit_stats():
+    """
+    Group commit queue and counters for this worker
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Mode, queued rows, groups committed, rows per group and failures
+    """
+    state = GroupCommitter.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(state.stats()), 200
+
+
+@debug_bp.route('/queries', methods=['GET'])
+@require_bearer_token
+def query_profiler_stats():
+    """
+    Most expensive SQL statement fingerprints in this worker
+
+    Query Parameters:
+        top: Fingerprints returned (default 20)
+        sort: total_ms (default), count, max_ms, avg_ms, rows or errors
+        reset: 1 to clear the table after reading it
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Count, total/avg/max time, rows and errors per fingerprint
+        400: Invalid top or sort
+    """
+    state = QueryProfiler.get_state()
+    if state is None:
+        return jsonify({'enabled': False}), 200
+    sort = request.args.get('sort', 'total_ms')
+    try:
+        top = int(request.args.get('top', 20))
+        if top <= 0 or sort not in SORT_KEYS:
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'top must be a positive integer and sort one of {", ".join(SORT_KEYS)}'
+        }), 400
+    stats = state.stats(top=top, sort=sort)
+    if request.args.get('reset') == '1':
+        state.reset()
+    return jsonify(stats), 200
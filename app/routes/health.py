@@ -1,5 +1,7 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
+from app.json_response import jsonify
 from app.utils import setup_logging
+from app.telemetry import telemetry
 
 health_bp = Blueprint('health', __name__)
 logger = setup_logging()
@@ -12,13 +14,7 @@ def health_check():
     Returns:
         JSON response with status 'ok'
     """
-    try:
-        # Try to record health check metric if New Relic is available
-        import newrelic.agent
-        newrelic.agent.record_custom_metric('Custom/Health/Check', 1)
-    except (ImportError, AttributeError):
-        # New Relic not available, continue without it
-        pass
+    telemetry.incr('Custom/Health/Check')
     
     logger.info("Health check requested", endpoint="/health")
     return jsonify({"status": "ok"}), 200
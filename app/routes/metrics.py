@@ -0,0 +1,29 @@
+from flask import Blueprint, current_app
+from app.json_response import jsonify
+from app.auth import require_bearer_token
+from app.prometheus import PrometheusMetrics, CONTENT_TYPE
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@require_bearer_token
+def metrics():
+    """
+    Prometheus metrics of every worker on this instance
+
+    Headers:
+        Authorization: Bearer <token>
+
+    Returns:
+        200: Text exposition format (request counts and latency per endpoint, DB timings, pool and cache stats)
+        404: METRICS_ENABLED is off
+    """
+    state = PrometheusMetrics.get_state()
+    if state is None:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'Metrics are disabled (METRICS_ENABLED=false)'
+        }), 404
+    # This worker's stats are read fresh; the others' are at most METRICS_WORKER_STATS_INTERVAL old
+    state.record_worker_stats()
+    return current_app.response_class(state.render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -1,13 +1,14 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
+from app.json_response import jsonify
 from app.utils import setup_logging
-import newrelic.agent
+from app.telemetry import telemetry, function_trace
 
 ping_bp = Blueprint('ping', __name__)
 logger = setup_logging()
 
 @ping_bp.route('/ping', methods=['GET'])
-@newrelic.agent.function_trace()
+@function_trace()
 def ping():
     # Record ping metric
-    newrelic.agent.record_custom_metric('Custom/Ping/Request', 1)
+    telemetry.incr('Custom/Ping/Request')
     return jsonify({"status": "ok v2"}), 200
\ No newline at end of file
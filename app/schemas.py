@@ -1,4 +1,6 @@
-from marshmallow import Schema, fields, validate, ValidationError
+from collections.abc import Mapping
+from flask import current_app, has_app_context
+from marshmallow import Schema, fields, validate, validates, ValidationError, missing
 import re
 import uuid
 
@@ -9,6 +11,7 @@ class BlacklistSchema(Schema):
     app_uuid = fields.Str(required=True, validate=validate.Length(equal=36))
     blocked_reason = fields.Str(required=False, validate=validate.Length(max=255))
 
+    @validates('app_uuid')
     def validate_app_uuid(self, value):
         """Validate UUID format"""
         try:
@@ -33,3 +36,102 @@ class ErrorSchema(Schema):
     error = fields.Str(required=True)
     details = fields.Str(required=False)
     message = fields.Str(required=False)
+
+
+class BlacklistValidator:
+    """
+    Precompiled ``BlacklistSchema.load`` for the request path
+
+    Applies the schema's own field validators and error messages, so results
+    and ``ValidationError.messages`` are the same, without marshmallow's
+    per-call schema machinery. Only string fields are supported.
+    """
+
+    _uuid_re = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+    def __init__(self, schema=None):
+        self.schema = schema or BlacklistSchema()
+        self.fields = tuple(
+            (name, field.required, field.error_messages, tuple(field.validators))
+            for name, field in self.schema.load_fields.items()
+        )
+        self.field_names = frozenset(name for name, *_ in self.fields)
+
+    def load(self, data):
+        if not isinstance(data, Mapping):
+            raise ValidationError({'_schema': [self.schema.error_messages['type']]})
+
+        result = {}
+        errors = {}
+        for name, required, messages, validators in self.fields:
+            value = data.get(name, missing)
+            if value is missing:
+                if required:
+                    errors[name] = [messages['required']]
+                continue
+            if value is None:
+                errors[name] = [messages['null']]
+                continue
+            if isinstance(value, bytes):
+                try:
+                    value = value.decode('utf-8')
+                except UnicodeDecodeError:
+                    errors[name] = [messages['invalid_utf8']]
+                    continue
+            elif not isinstance(value, str):
+                errors[name] = [messages['invalid']]
+                continue
+
+            field_errors = []
+            for validator in validators:
+                try:
+                    if validator(value) is False:
+                        field_errors.append(messages['validator_failed'])
+                except ValidationError as e:
+                    field_errors.extend(e.messages)
+            if field_errors:
+                errors[name] = field_errors
+            else:
+                result[name] = value
+
+        for key in data:
+            if key not in self.field_names:
+                errors[key] = [self.schema.error_messages['unknown']]
+
+        # Canonical UUIDs skip the uuid.UUID() parse; anything else gets the schema's check
+        app_uuid = result.get('app_uuid')
+        if app_uuid is not None and not self._uuid_re.fullmatch(app_uuid):
+            try:
+                self.schema.validate_app_uuid(app_uuid)
+            except ValidationError as e:
+                errors['app_uuid'] = e.messages
+
+        if errors:
+            raise ValidationError(errors, data=data, valid_data=result)
+        return result
+
+
+class BlacklistResponseSerializer:
+    """Precompiled ``BlacklistResponseSchema.dump`` for a Blacklist entry"""
+
+    def dump(self, entry):
+        created_at = entry.created_at
+        return {
+            'id': entry.id,
+            'email': entry.email,
+            'app_uuid': entry.app_uuid,
+            'blocked_reason': entry.blocked_reason,
+            'client_ip': entry.client_ip,
+            'created_at': created_at.isoformat() if created_at is not None else None,
+        }
+
+
+_fast_schemas = (BlacklistValidator(), BlacklistResponseSerializer())
+_marshmallow_schemas = (BlacklistSchema(), BlacklistResponseSchema())
+
+
+def get_blacklist_schemas():
+    """``(loader, dumper)`` for blacklist entries, the precompiled pair unless SCHEMA_FAST_PATH is off"""
+    if has_app_context() and not current_app.config.get('SCHEMA_FAST_PATH', True):
+        return _marshmallow_schemas
+    return _fast_schemas
@@ -0,0 +1,166 @@
+"""
+Per-request phase timer and the Server-Timing header
+The auth decorator, JSON parsing, schema validation, app.db_metrics and
+jsonify report into a timer started before each request (perf_counter_ns,
+monotonic). Responses carry the breakdown, e.g.
+
+    Server-Timing: auth;dur=0.021, parse;dur=0.008, validation;dur=0.034, db;dur=1.250, total;dur=1.402
+
+in milliseconds, and the phases feed per-endpoint histograms on /metrics.
+The header is only sent to requests whose X-Debug-Token matches
+SERVER_TIMING_TOKEN (never while it is unset), since the breakdown tells a
+filter miss from a database hit; the histograms are recorded either way.
+"""
+import hmac
+import time
+
+from flask import current_app, g, has_request_context, request
+
+from app.prometheus import PrometheusMetrics, request_endpoint
+
+DEBUG_TOKEN_HEADER = 'X-Debug-Token'
+PHASE_HISTOGRAM = 'blacklist_http_request_phase_duration_seconds'
+
+
+class ServerTiming:
+    """Flask extension timing request phases and emitting Server-Timing"""
+
+    extension_name = 'server_timing'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SERVER_TIMING_ENABLED', True)
+        app.config.setdefault('SERVER_TIMING_TOKEN', '')
+        app.extensions[self.extension_name] = self
+        app.before_request(_start_phase_timer)
+        app.after_request(_finish_phase_timer)
+
+
+class PhaseTimer:
+    """
+    Nanoseconds spent per phase in one request; repeated phases add up
+
+    Phases are exclusive: time in a nested phase (the rate limiter parsing the
+    body during "auth", a query during "validation") is taken out of the
+    enclosing one, so the phases never add up to more than the total.
+    """
+
+    __slots__ = ('started_ns', 'phases', 'active')
+
+    def __init__(self):
+        self.started_ns = time.perf_counter_ns()
+        self.phases = {}
+        self.active = None
+
+    def add(self, name, elapsed_ns):
+        self.phases[name] = self.phases.get(name, 0) + elapsed_ns
+        if self.active is not None:
+            self.active.nested_ns += elapsed_ns
+
+    def total_ns(self):
+        return time.perf_counter_ns() - self.started_ns
+
+    def header(self, total_ns):
+        items = [f'{name};dur={elapsed_ns / 1e6:.3f}' for name, elapsed_ns in self.phases.items()]
+        items.append(f'total;dur={total_ns / 1e6:.3f}')
+        return ', '.join(items)
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'started_ns', 'nested_ns', 'parent')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.nested_ns = 0
+
+    def __enter__(self):
+        self.parent = self.timer.active
+        self.timer.active = self
+        self.started_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_ns = time.perf_counter_ns() - self.started_ns
+        self.timer.active = self.parent
+        self.timer.add(self.name, elapsed_ns - self.nested_ns)
+        if self.parent is not None:
+            # add() credited only the exclusive part; the parent must skip all of it
+            self.parent.nested_ns += self.nested_ns
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def get_phase_timer():
+    """The current request's timer, or None (outside requests, e.g. the group commit thread, or disabled)"""
+    if not has_request_context():
+        return None
+    return g.get('phase_timer')
+
+
+def phase(name):
+    """
+    Context manager adding the time spent in its block to a phase
+
+    Usage:
+        with phase('validation'):
+            validated_data = schema.load(data)
+    """
+    timer = get_phase_timer()
+    return _NO_PHASE if timer is None else _Phase(timer, name)
+
+
+def record_phase(name, elapsed_ns):
+    """Add an already measured duration to a phase of the current request"""
+    timer = get_phase_timer()
+    if timer is not None:
+        timer.add(name, elapsed_ns)
+
+
+def _start_phase_timer():
+    """before_request hook"""
+    if current_app.config['SERVER_TIMING_ENABLED']:
+        g.phase_timer = PhaseTimer()
+
+
+def _header_allowed():
+    token = current_app.config['SERVER_TIMING_TOKEN']
+    if not token:
+        return False
+    sent = request.headers.get(DEBUG_TOKEN_HEADER, '')
+    return hmac.compare_digest(sent.encode('utf-8'), token.encode('utf-8'))
+
+
+def _finish_phase_timer(response):
+    """after_request hook: add the header and observe each phase"""
+    timer = g.pop('phase_timer', None)
+    if timer is None:
+        return response
+    total_ns = timer.total_ns()
+    if _header_allowed():
+        response.headers['Server-Timing'] = timer.header(total_ns)
+
+    metrics = PrometheusMetrics.get_state()
+    if metrics is not None:
+        endpoint = request_endpoint()
+        try:
+            for name, elapsed_ns in timer.phases.items():
+                metrics.observe(PHASE_HISTOGRAM, {'endpoint': endpoint, 'phase': name}, elapsed_ns / 1e9)
+        except (OSError, ValueError):
+            pass  # Metrics must never fail a request
+    return response
@@ -0,0 +1,431 @@
+"""
+Shared memory-mapped hash snapshot of the blacklist
+A builder writes a sorted array of 64-bit email hashes plus a bucket offsets
+table; every gunicorn worker mmaps the same file read-only and answers
+membership by binary search, so the page cache holds a single copy.
+
+File layout (little-endian):
+    header   magic(8s) bucket_bits(I) reserved(I) count(Q) max_id(Q)
+    offsets  (2**bucket_bits + 1) x uint64, index of the first hash per bucket
+    hashes   count x uint64, sorted
+
+Workers trigger a rebuild themselves once their delta grows past
+SNAPSHOT_REBUILD_DELTA_SIZE rows; a lock file next to the snapshot makes sure
+only one of them scans the table, and the rest pick up the renamed file.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app.canonical import canonicalize_email, email_digest
+
+SNAPSHOT_MAGIC = b'BLSNAP01'
+HEADER = struct.Struct('<8sIIQQ')
+DEFAULT_BUCKET_BITS = 16
+# Ids are allocated before commit, so re-read a window below the last seen id
+DELTA_ID_OVERLAP = 1000
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def email_hash(email):
+    """64-bit hash of an already canonical email (the unsigned ``email_digest``)"""
+    return email_digest(email) & UINT64_MASK
+
+
+def _row_hash(digest, canonical, email):
+    # Rows written before `flask blacklist migrate` have no digest yet
+    if digest is not None:
+        return digest & UINT64_MASK
+    return email_hash(canonical or canonicalize_email(email))
+
+
+def write_snapshot(path, hashes, max_id, bucket_bits=DEFAULT_BUCKET_BITS):
+    """
+    Sort ``hashes`` and atomically replace the snapshot at ``path``
+
+    Args:
+        path: Destination file; written to ``path.tmp`` and renamed
+        hashes: ``array('Q')`` of email hashes (consumed)
+        max_id: Highest Blacklist.id covered by the snapshot
+        bucket_bits: Number of leading hash bits used for the offsets table
+
+    Returns:
+        Number of distinct hashes written
+    """
+    shift = 64 - bucket_bits
+    num_buckets = 1 << bucket_bits
+
+    # Partition by the top byte first so sorting never needs one huge list
+    partitions = [array('Q') for _ in range(256)]
+    for value in hashes:
+        partitions[value >> 56].append(value)
+    del hashes[:]
+
+    offsets = array('Q', bytes(8 * (num_buckets + 1)))
+    tmp_path = f'{path}.tmp'
+    count = 0
+    previous = None
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, bucket_bits, 0, 0, max_id))
+        f.write(offsets.tobytes())  # Placeholder, rewritten below
+
+        bucket = 0
+        for partition in partitions:
+            ordered = array('Q', sorted(partition))
+            del partition[:]
+            out = array('Q')
+            for value in ordered:
+                if value == previous:
+                    continue
+                previous = value
+                value_bucket = value >> shift
+                while bucket <= value_bucket:
+                    offsets[bucket] = count
+                    bucket += 1
+                out.append(value)
+                count += 1
+            if sys.byteorder != 'little':
+                out.byteswap()
+            f.write(out.tobytes())
+        while bucket <= num_buckets:
+            offsets[bucket] = count
+            bucket += 1
+
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        f.seek(0)
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, bucket_bits, 0, count, max_id))
+        f.write(offsets.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return count
+
+
+def build_snapshot(path, bucket_bits=DEFAULT_BUCKET_BITS, batch_size=10000):
+    """Build a snapshot from the blacklists table (requires an app context)"""
+    from app import db
+    from app.models import Blacklist
+
+    max_id = db.session.query(db.func.max(Blacklist.id)).scalar() or 0
+    hashes = array('Q')
+    query = db.session.query(Blacklist.email_digest, Blacklist.email_canonical, Blacklist.email) \
+        .filter(Blacklist.id <= max_id).yield_per(batch_size)
+    for digest, canonical, email in query:
+        hashes.append(_row_hash(digest, canonical, email))
+    return write_snapshot(path, hashes, max_id, bucket_bits), max_id
+
+
+def rebuild_snapshot(path, bucket_bits=DEFAULT_BUCKET_BITS, replaces=None):
+    """
+    Build the snapshot under an exclusive lock on ``path.lock`` (requires an app context)
+
+    Args:
+        path: Snapshot file
+        bucket_bits: Number of leading hash bits used for the offsets table
+        replaces: Identity of the snapshot the caller wants replaced; if the
+            file on disk no longer matches, someone else already rebuilt it
+
+    Returns:
+        ``(count, max_id)``, or None if another process holds the lock or the
+        snapshot was already replaced
+    """
+    with open(f'{path}.lock', 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if replaces is not None:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if stat is None or replaces != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                return None
+        return build_snapshot(path, bucket_bits=bucket_bits)
+
+
+class HashSnapshot:
+    """Read-only view over one mmapped snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, bucket_bits, _, count, max_id = HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a blacklist snapshot')
+        self.count = count
+        self.max_id = max_id
+        self.bucket_bits = bucket_bits
+        self.shift = 64 - bucket_bits
+
+        view = memoryview(self._mmap)
+        offsets_start = HEADER.size
+        hashes_start = offsets_start + 8 * ((1 << bucket_bits) + 1)
+        self._offsets = view[offsets_start:hashes_start].cast('Q')
+        self._hashes = view[hashes_start:hashes_start + 8 * count].cast('Q')
+
+    def __contains__(self, value):
+        bucket = value >> self.shift
+        lo = self._offsets[bucket]
+        hi = self._offsets[bucket + 1]
+        i = bisect_left(self._hashes, value, lo, hi)
+        return i < hi and self._hashes[i] == value
+
+    def __len__(self):
+        return self.count
+
+
+class BlacklistSnapshot:
+    """
+    Flask extension that serves lookups from the shared snapshot
+
+    Rows newer than the snapshot are kept in a small per-worker delta set,
+    fed by local inserts and by polling ``id > max_id`` every
+    ``SNAPSHOT_DELTA_REFRESH_INTERVAL`` seconds. A new snapshot file is picked
+    up (and the delta reset) within ``SNAPSHOT_CHECK_INTERVAL`` seconds of
+    being renamed into place. Once the delta holds
+    ``SNAPSHOT_REBUILD_DELTA_SIZE`` rows the worker rebuilds the snapshot in a
+    background thread, at most once per ``SNAPSHOT_REBUILD_MIN_INTERVAL``
+    seconds.
+    """
+
+    extension_name = 'blacklist_snapshot'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SNAPSHOT_ENABLED', False)
+        app.config.setdefault('SNAPSHOT_PATH', 'blacklist.snapshot')
+        app.config.setdefault('SNAPSHOT_CHECK_INTERVAL', 10)
+        app.config.setdefault('SNAPSHOT_DELTA_REFRESH_INTERVAL', 5)
+        app.config.setdefault('SNAPSHOT_REBUILD_DELTA_SIZE', 10000)
+        app.config.setdefault('SNAPSHOT_REBUILD_MIN_INTERVAL', 60)
+        app.extensions[self.extension_name] = _SnapshotState(app)
+
+        from app.models import Blacklist
+        if not event.contains(Blacklist, 'after_insert', add_email_to_snapshot_delta):
+            event.listen(Blacklist, 'after_insert', add_email_to_snapshot_delta)
+
+    @staticmethod
+    def get_state(app=None):
+        """Return the snapshot state of the given (or current) app, or None if disabled"""
+        app = app or current_app
+        state = app.extensions.get(BlacklistSnapshot.extension_name)
+        if state is None or not app.config['SNAPSHOT_ENABLED']:
+            return None
+        return state
+
+
+class _SnapshotState:
+    """Per-worker mapping of the current snapshot plus the delta set"""
+
+    def __init__(self, app):
+        self.app = app
+        self.snapshot = None
+        self.delta = set()
+        self.delta_last_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+        self.loaded_at = None
+        self.rebuilds = 0
+        self._checked_at = 0.0
+        self._delta_refreshed_at = 0.0
+        self._rebuild_started_at = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.app.config['SNAPSHOT_CHECK_INTERVAL']:
+            return
+        self._checked_at = now
+
+        path = self.app.config['SNAPSHOT_PATH']
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        current = self.snapshot
+        if current is not None and current.identity == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return
+
+        snapshot = HashSnapshot(path)
+        with self._lock:
+            # Old mappings are released once in-flight lookups drop their reference
+            self.snapshot = snapshot
+            self.delta = set()
+            self.delta_last_id = snapshot.max_id
+            self.loaded_at = time.time()
+        self._delta_refreshed_at = 0.0
+
+    def _maybe_refresh_delta(self):
+        now = time.monotonic()
+        if now - self._delta_refreshed_at < self.app.config['SNAPSHOT_DELTA_REFRESH_INTERVAL']:
+            return
+        self._delta_refreshed_at = now
+
+        from app import db
+        from app.models import Blacklist
+
+        since = max(self.snapshot.max_id, self.delta_last_id - DELTA_ID_OVERLAP)
+        rows = db.session.query(Blacklist.id, Blacklist.email_digest, Blacklist.email_canonical, Blacklist.email) \
+            .filter(Blacklist.id > since).all()
+        with self._lock:
+            for row_id, digest, canonical, email in rows:
+                self.delta.add(_row_hash(digest, canonical, email))
+                self.delta_last_id = max(self.delta_last_id, row_id)
+
+    def _maybe_schedule_rebuild(self):
+        config = self.app.config
+        threshold = config['SNAPSHOT_REBUILD_DELTA_SIZE']
+        if not threshold or len(self.delta) < threshold:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._rebuilding:
+                return
+            if self._rebuild_started_at is not None and \
+                    now - self._rebuild_started_at < config['SNAPSHOT_REBUILD_MIN_INTERVAL']:
+                return
+            self._rebuilding = True
+            self._rebuild_started_at = now
+        thread = threading.Thread(target=self._rebuild_in_background, name='snapshot-rebuild', daemon=True)
+        thread.start()
+
+    def rebuild(self):
+        """Rebuild the snapshot file unless another worker is already doing it"""
+        from app import db
+
+        snapshot = self.snapshot
+        with self.app.app_context():
+            try:
+                result = rebuild_snapshot(
+                    self.app.config['SNAPSHOT_PATH'],
+                    bucket_bits=snapshot.bucket_bits if snapshot is not None else DEFAULT_BUCKET_BITS,
+                    replaces=snapshot.identity if snapshot is not None else None
+                )
+            finally:
+                db.session.remove()
+        if result is not None:
+            with self._lock:
+                self.rebuilds += 1
+        # Map the new file on the next lookup
+        self._checked_at = 0.0
+        return result
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            pass  # Keep serving snapshot + delta; retried after SNAPSHOT_REBUILD_MIN_INTERVAL
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def might_contain(self, email):
+        """
+        Return False only if the email is definitely not blacklisted
+
+        Without a snapshot file every email falls through to the database.
+        """
+        self._maybe_reload()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return True
+        self._maybe_refresh_delta()
+        self._maybe_schedule_rebuild()
+
+        value = email_hash(email)
+        if value in snapshot or value in self.delta:
+            return True
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def add(self, email):
+        """Record a local insert until the next snapshot swap"""
+        with self._lock:
+            self.delta.add(email_hash(email))
+
+    def record_hit(self, count=1):
+        with self._lock:
+            self.hits += count
+
+    def record_false_positive(self, count=1):
+        with self._lock:
+            self.false_positives += count
+
+    def stats(self):
+        """Snapshot metadata and lookup counters for this worker"""
+        snapshot = self.snapshot
+        return {
+            'enabled': True,
+            'ready': snapshot is not None,
+            'path': self.app.config['SNAPSHOT_PATH'],
+            'elements': len(snapshot) if snapshot is not None else 0,
+            'max_id': snapshot.max_id if snapshot is not None else None,
+            'loaded_at': self.loaded_at,
+            'delta_size': len(self.delta),
+            'delta_last_id': self.delta_last_id,
+            'rebuilding': self._rebuilding,
+            'rebuilds': self.rebuilds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'false_positives': self.false_positives,
+        }
+
+
+def add_email_to_snapshot_delta(mapper, connection, target):
+    """SQLAlchemy ``after_insert`` listener feeding the per-worker delta set"""
+    if not has_app_context():
+        return
+    state = BlacklistSnapshot.get_state()
+    if state is not None:
+        state.add(target.email_canonical or canonicalize_email(target.email))
+
+
+def get_lookup_filter():
+    """
+    Membership pre-check used by the lookup routes
+
+    Prefers the shared snapshot over the per-worker Bloom filter; returns None
+    when neither is enabled. Both expose ``might_contain``, ``add``,
+    ``record_hit`` and ``record_false_positive``.
+    """
+    from app.bloom import BlacklistBloomFilter
+
+    state = BlacklistSnapshot.get_state()
+    if state is not None:
+        return state
+    return BlacklistBloomFilter.get_state()
+
+
+def remember_inserted_emails(emails):
+    """Add emails inserted outside the ORM (bulk paths) to every enabled filter"""
+    from app.bloom import BlacklistBloomFilter
+
+    states = [state for state in (BlacklistSnapshot.get_state(), BlacklistBloomFilter.get_state())
+              if state is not None]
+    if not states:
+        return
+    canonical_emails = [canonicalize_email(email) for email in emails]
+    for state in states:
+        for canonical in canonical_emails:
+            state.add(canonical)
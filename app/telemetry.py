@@ -0,0 +1,313 @@
+"""
+Buffered telemetry aggregator
+Counters and timings are aggregated in per-thread buffers and flushed in bulk
+by a background thread, so the request path never talks to the metrics
+backend directly. Backends: New Relic, StatsD over UDP, in-memory, no-op.
+"""
+import os
+import socket
+import threading
+import time
+
+
+class MetricAggregate:
+    """count/total/min/max/sum_of_squares for one metric name"""
+
+    __slots__ = ('kind', 'count', 'total', 'min', 'max', 'sum_of_squares')
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.sum_of_squares = 0.0
+
+    def add(self, value, count=1):
+        self.count += count
+        self.total += value
+        self.sum_of_squares += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.sum_of_squares += other.sum_of_squares
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'sum_of_squares': self.sum_of_squares,
+        }
+
+
+class NullBackend:
+    """Discards everything"""
+
+    def flush(self, metrics):
+        pass
+
+    def add_attribute(self, name, value):
+        pass
+
+    def record_exception(self):
+        pass
+
+
+class MemoryBackend(NullBackend):
+    """Keeps flushed metrics in memory, for tests"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.attributes = {}
+        self.exceptions = 0
+        self.flushes = 0
+
+    def flush(self, metrics):
+        self.flushes += 1
+        for name, aggregate in metrics.items():
+            if name in self.metrics:
+                self.metrics[name].merge(aggregate)
+            else:
+                self.metrics[name] = aggregate
+
+    def add_attribute(self, name, value):
+        self.attributes[name] = value
+
+    def record_exception(self):
+        self.exceptions += 1
+
+
+class NewRelicBackend(NullBackend):
+    """Sends pre-aggregated metrics to the New Relic agent in one call per flush"""
+
+    def __init__(self):
+        import newrelic.agent
+        self.agent = newrelic.agent
+
+    def flush(self, metrics):
+        application = self.agent.application()
+        self.agent.record_custom_metrics(
+            ((name, aggregate.as_dict()) for name, aggregate in metrics.items()),
+            application=application
+        )
+
+    def add_attribute(self, name, value):
+        # Attributes belong to the current transaction, so they cannot be deferred
+        transaction = self.agent.current_transaction()
+        if transaction is not None:
+            transaction.add_custom_attribute(name, value)
+
+    def record_exception(self):
+        if self.agent.current_transaction() is not None:
+            self.agent.record_exception()
+
+
+class StatsdBackend(NullBackend):
+    """Writes StatsD lines over UDP, packed into as few datagrams as possible"""
+
+    max_packet_size = 1432
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix=''):
+        self.address = (host, int(port))
+        self.prefix = f'{prefix}.' if prefix else ''
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _lines(self, metrics):
+        for name, aggregate in metrics.items():
+            key = self.prefix + name.replace('/', '.')
+            if aggregate.kind == 'counter':
+                yield f'{key}:{aggregate.total:g}|c'
+            else:
+                # One line standing for `count` samples of the mean value
+                mean = aggregate.total / aggregate.count
+                yield f'{key}:{mean:.3f}|ms|@{1 / aggregate.count:.6f}'
+                yield f'{key}.max:{aggregate.max:.3f}|g'
+
+    def flush(self, metrics):
+        packet = ''
+        for line in self._lines(metrics):
+            if packet and len(packet) + len(line) + 1 > self.max_packet_size:
+                self._send(packet)
+                packet = ''
+            packet = f'{packet}\n{line}' if packet else line
+        if packet:
+            self._send(packet)
+
+    def _send(self, packet):
+        try:
+            self.socket.sendto(packet.encode('utf-8'), self.address)
+        except OSError:
+            pass  # Metrics are best effort
+
+
+class _ThreadBuffer:
+    """Metrics recorded by one thread since the last flush"""
+
+    __slots__ = ('lock', 'metrics')
+
+    def __init__(self):
+        # Only contended while the flusher swaps the dict out
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+
+class Telemetry:
+    """
+    Process-wide metrics aggregator
+
+    ``incr`` and ``timing`` only touch the calling thread's buffer; a daemon
+    thread merges all buffers and hands them to the backend every
+    ``flush_interval`` seconds. The thread is started lazily on first use in
+    each process, so gunicorn forking a preloaded app gets a flusher per worker.
+    """
+
+    def __init__(self, backend=None, flush_interval=10.0):
+        self.backend = backend or NullBackend()
+        self.flush_interval = flush_interval
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Start from empty buffers and no flusher (at creation and after fork)"""
+        self._local = threading.local()
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        """Configure the backend from the app config"""
+        self.configure(create_backend(app.config), app.config['TELEMETRY_FLUSH_INTERVAL'])
+
+    def configure(self, backend, flush_interval=None):
+        self.flush()
+        self.backend = backend
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = _ThreadBuffer()
+            self._local.buffer = buffer
+            with self._buffers_lock:
+                self._buffers.append(buffer)
+                if self._thread is None and self.flush_interval:
+                    self._thread = threading.Thread(target=self._run, name='telemetry-flush', daemon=True)
+                    self._thread.start()
+        return buffer
+
+    def _record(self, kind, name, value):
+        buffer = self._buffer()
+        with buffer.lock:
+            aggregate = buffer.metrics.get(name)
+            if aggregate is None:
+                aggregate = buffer.metrics[name] = MetricAggregate(kind)
+            aggregate.add(value)
+
+    def incr(self, name, value=1):
+        """Add ``value`` to a counter"""
+        self._record('counter', name, value)
+
+    def timing(self, name, value_ms):
+        """Record one duration (or other sampled value) in milliseconds"""
+        self._record('timing', name, value_ms)
+
+    def add_attribute(self, name, value):
+        """Attach an attribute to the current transaction, if the backend supports it"""
+        try:
+            self.backend.add_attribute(name, value)
+        except Exception:
+            pass
+
+    def record_exception(self):
+        """Report the exception being handled, if the backend supports it"""
+        try:
+            self.backend.record_exception()
+        except Exception:
+            pass
+
+    def collect(self):
+        """Swap out and merge every thread's buffer"""
+        merged = {}
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            with buffer.lock:
+                metrics, buffer.metrics = buffer.metrics, {}
+            for name, aggregate in metrics.items():
+                if name in merged:
+                    merged[name].merge(aggregate)
+                else:
+                    merged[name] = aggregate
+        return merged
+
+    def flush(self):
+        """Send everything recorded so far to the backend"""
+        with self._flush_lock:
+            metrics = self.collect()
+            if metrics:
+                try:
+                    self.backend.flush(metrics)
+                except Exception:
+                    pass  # Never let telemetry break the flusher
+
+    def _run(self):
+        while True:
+            if not self.flush_interval:
+                # Reconfigured for manual flushing only
+                time.sleep(1)
+                continue
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def function_trace():
+    """
+    ``newrelic.agent.function_trace()`` when the agent is in use, else a no-op
+
+    The agent takes ~200 ms to import, so it is only loaded when a license key
+    is configured; without one the view functions are left unwrapped.
+    """
+    def decorator(func):
+        if not os.environ.get('NEW_RELIC_LICENSE_KEY'):
+            return func
+        try:
+            import newrelic.agent
+        except ImportError:
+            return func
+        return newrelic.agent.function_trace()(func)
+    return decorator
+
+
+def create_backend(config):
+    """Build the backend named by ``TELEMETRY_BACKEND``"""
+    name = config['TELEMETRY_BACKEND']
+    if name == 'newrelic':
+        # Same rule create_app uses for the WSGI wrapper: no key, no transactions
+        if not os.environ.get('NEW_RELIC_LICENSE_KEY'):
+            return NullBackend()
+        try:
+            return NewRelicBackend()
+        except ImportError:
+            return NullBackend()
+    if name == 'statsd':
+        return StatsdBackend(config['STATSD_HOST'], config['STATSD_PORT'], config['STATSD_PREFIX'])
+    if name == 'memory':
+        return MemoryBackend()
+    return NullBackend()
+
+
+telemetry = Telemetry()
@@ -1,9 +1,25 @@
 from flask import request
 import logging
+import logging.handlers
+import atexit
 import json
+import queue
 import sys
 import os
+import random
+import threading
+import time
 from datetime import datetime
+from app.config import Config
+
+try:
+    import orjson
+
+    def _json_dumps(data):
+        return orjson.dumps(data, default=str).decode('utf-8')
+except ImportError:  # Fall back to the standard library encoder
+    def _json_dumps(data):
+        return json.dumps(data, default=str)
 
 def get_client_ip():
     """Get the real client IP address, considering X-Forwarded-For header"""
@@ -20,12 +36,67 @@ def get_client_ip():
     return request.remote_addr
 
 
+_environment_fields = None
+_environment_lock = threading.Lock()
+
+
+def get_environment_fields():
+    """
+    Environment and ECS task metadata added to every JSON log record
+
+    Resolved once per process; the ECS metadata endpoint is only called here,
+    never while formatting a record.
+    """
+    global _environment_fields
+    if _environment_fields is not None:
+        return _environment_fields
+
+    with _environment_lock:
+        if _environment_fields is not None:
+            return _environment_fields
+
+        fields = {}
+        if os.environ.get('DYNO'):
+            fields['dyno'] = os.environ.get('DYNO')
+            fields['source'] = 'heroku'
+        elif os.environ.get('ECS_CONTAINER_METADATA_URI'):
+            fields['source'] = 'aws-ecs'
+            # Try to get task ARN from metadata
+            try:
+                import requests
+                metadata_uri = os.environ.get('ECS_CONTAINER_METADATA_URI')
+                task_metadata = requests.get(f"{metadata_uri}/task", timeout=2).json()
+                fields['task_arn'] = task_metadata.get('TaskARN', 'unknown')
+            except Exception:
+                fields['task_arn'] = 'unknown'
+
+        _environment_fields = fields
+    return fields
+
+
 class JSONFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging compatible with New Relic"""
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.environment_fields = get_environment_fields()
+        self._app_name = None
+
+    def _get_app_name(self):
+        # The agent may be initialized after the formatter is created
+        if self._app_name is None:
+            # Only if something else loaded the agent; importing it here costs ~200 ms
+            agent = sys.modules.get('newrelic.agent')
+            try:
+                if agent is not None and agent._settings and agent._settings.app_name:
+                    self._app_name = agent._settings.app_name
+            except Exception:
+                pass
+        return self._app_name
+
     def format(self, record):
         log_data = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -34,96 +105,246 @@ class JSONFormatter(logging.Formatter):
             'line': record.lineno,
         }
         
-        # Add exception info if present
+        # Add exception info if present (already rendered when queued)
         if record.exc_info:
             log_data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_data['exception'] = record.exc_text
         
         # Add extra fields if present
         if hasattr(record, 'extra_fields'):
             log_data.update(record.extra_fields)
         
         # Add environment info
-        if os.environ.get('DYNO'):
-            log_data['dyno'] = os.environ.get('DYNO')
-            log_data['source'] = 'heroku'
-        elif os.environ.get('ECS_CONTAINER_METADATA_URI'):
-            log_data['source'] = 'aws-ecs'
-            # Try to get task ARN from metadata
-            try:
-                import requests
-                metadata_uri = os.environ.get('ECS_CONTAINER_METADATA_URI')
-                if metadata_uri:
-                    task_metadata = requests.get(f"{metadata_uri}/task", timeout=2).json()
-                    log_data['task_arn'] = task_metadata.get('TaskARN', 'unknown')
-            except:
-                pass
+        log_data.update(self.environment_fields)
         
         # Add New Relic context if available
-        try:
-            import newrelic.agent
-            if newrelic.agent._settings and newrelic.agent._settings.app_name:
-                log_data['app_name'] = newrelic.agent._settings.app_name
-        except:
-            pass
+        app_name = self._get_app_name()
+        if app_name:
+            log_data['app_name'] = app_name
         
-        return json.dumps(log_data)
+        return _json_dumps(log_data)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler over a bounded queue that drops records instead of blocking
+
+    Only the message is merged on the request thread; JSON encoding and the
+    stdout write happen on the listener thread.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            try:
+                from app.telemetry import telemetry
+                telemetry.incr('Custom/Logging/Dropped')
+            except Exception:
+                pass
+
+
+class AsyncLogPipeline:
+    """One bounded queue and background writer per process"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.output_handler = None
+        self.queue_handler = None
+        self.listener = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart)
+        atexit.register(self.stop)
+
+    def get_handler(self, handler_factory):
+        """Return the shared QueueHandler, starting the writer on first use"""
+        with self._lock:
+            if self.queue_handler is None:
+                self.output_handler = handler_factory()
+                self._start()
+        return self.queue_handler
+
+    def _start(self):
+        log_queue = queue.Queue(maxsize=self.maxsize)
+        self.queue_handler = DroppingQueueHandler(log_queue)
+        self.listener = logging.handlers.QueueListener(log_queue, self.output_handler)
+        self.listener.start()
+
+    def _restart(self):
+        # The writer thread does not survive fork; records queued before it are discarded
+        self._lock = threading.Lock()
+        if self.queue_handler is not None:
+            dropped = self.queue_handler.dropped
+            self.queue_handler.queue = queue.Queue(maxsize=self.maxsize)
+            self.queue_handler.dropped = dropped
+            self.listener = logging.handlers.QueueListener(self.queue_handler.queue, self.output_handler)
+            self.listener.start()
+
+    def stop(self):
+        """Drain the queue and stop the writer (called at exit)"""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    @property
+    def dropped(self):
+        return self.queue_handler.dropped if self.queue_handler else 0
+
+
+_log_pipeline = AsyncLogPipeline(Config.LOG_QUEUE_SIZE)
+
+
+def create_output_handler():
+    """Create the stdout handler with the formatter for the current environment"""
+    # Create stdout handler (Heroku captures stdout/stderr)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setLevel(logging.INFO)
+    
+    # Use JSON formatter for New Relic compatibility, or simple formatter for local dev
+    # Detect Heroku (DYNO) or AWS ECS (ECS_CONTAINER_METADATA_URI) or explicit flag
+    is_production = (
+        os.environ.get('HEROKU_APP_NAME') or 
+        os.environ.get('DYNO') or 
+        os.environ.get('ECS_CONTAINER_METADATA_URI') or  # AWS ECS
+        os.environ.get('AWS_ENVIRONMENT') or  # Explicit flag
+        os.environ.get('NEW_RELIC_LICENSE_KEY')  # If New Relic is configured, use JSON
+    )
+    
+    if is_production:
+        # Use JSON format for production environments (Heroku/AWS) and New Relic
+        handler.setFormatter(JSONFormatter())
+    else:
+        # Use simple format for local development
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        ))
+    return handler
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` events per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class LogSampler:
+    """
+    Per-message sampling and rate caps for hot-path logs
+
+    Messages without a rule are always logged. Suppressed records are counted
+    per message and reported every ``report_interval`` seconds.
+    """
+
+    def __init__(self, sample_rates=None, rate_limits=None, report_interval=60):
+        self.sample_rates = dict(sample_rates or {})
+        self.buckets = {message: TokenBucket(rate) for message, rate in (rate_limits or {}).items()}
+        self.report_interval = report_interval
+        self.suppressed = {}
+        self.reported_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self, message):
+        """Decide whether to emit a record for ``message``"""
+        rate = self.sample_rates.get(message)
+        if rate is not None and (rate <= 0 or random.random() >= rate):
+            self._suppress(message)
+            return False
+        bucket = self.buckets.get(message)
+        if bucket is not None and not bucket.consume():
+            self._suppress(message)
+            return False
+        return True
+
+    def _suppress(self, message):
+        with self._lock:
+            self.suppressed[message] = self.suppressed.get(message, 0) + 1
+
+    def pop_report(self):
+        """Return and reset the suppressed counts once the report interval has passed"""
+        if not self.suppressed or time.monotonic() - self.reported_at < self.report_interval:
+            return None
+        with self._lock:
+            report, self.suppressed = self.suppressed, {}
+            self.reported_at = time.monotonic()
+        return report
+
+
+_log_sampler = LogSampler(Config.LOG_SAMPLE_RATES, Config.LOG_RATE_LIMITS, Config.LOG_SUPPRESSED_REPORT_INTERVAL)
 
 
 class StructuredLogger:
     """Structured logger that outputs to stdout for Heroku"""
     
-    def __init__(self, name):
+    def __init__(self, name, sampler=None):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
+        self.sampler = sampler or _log_sampler
         
         # Remove existing handlers to avoid duplicates
         self.logger.handlers = []
         
-        # Create stdout handler (Heroku captures stdout/stderr)
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
-        
-        # Use JSON formatter for New Relic compatibility, or simple formatter for local dev
-        # Detect Heroku (DYNO) or AWS ECS (ECS_CONTAINER_METADATA_URI) or explicit flag
-        is_production = (
-            os.environ.get('HEROKU_APP_NAME') or 
-            os.environ.get('DYNO') or 
-            os.environ.get('ECS_CONTAINER_METADATA_URI') or  # AWS ECS
-            os.environ.get('AWS_ENVIRONMENT') or  # Explicit flag
-            os.environ.get('NEW_RELIC_LICENSE_KEY')  # If New Relic is configured, use JSON
-        )
-        
-        if is_production:
-            # Use JSON format for production environments (Heroku/AWS) and New Relic
-            handler.setFormatter(JSONFormatter())
+        if Config.LOG_ASYNC:
+            # Records are written to stdout by a background thread
+            self.logger.addHandler(_log_pipeline.get_handler(create_output_handler))
         else:
-            # Use simple format for local development
-            handler.setFormatter(logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-            ))
-        
-        self.logger.addHandler(handler)
+            self.logger.addHandler(create_output_handler())
         self.logger.propagate = False
     
+    def _log(self, level, message, kwargs):
+        # Decide before any record or extra dict is built
+        if not self.logger.isEnabledFor(level) or not self.sampler.allow(message):
+            return
+        extra = {'extra_fields': kwargs} if kwargs else {}
+        self.logger.log(level, message, extra=extra)
+
+        report = self.sampler.pop_report()
+        if report:
+            self.logger.info("Log records suppressed", extra={'extra_fields': {'suppressed': report}})
+    
     def info(self, message, **kwargs):
         """Log info message with optional extra fields"""
-        extra = {'extra_fields': kwargs} if kwargs else {}
-        self.logger.info(message, extra=extra)
+        self._log(logging.INFO, message, kwargs)
     
     def error(self, message, **kwargs):
         """Log error message with optional extra fields"""
-        extra = {'extra_fields': kwargs} if kwargs else {}
-        self.logger.error(message, extra=extra)
+        self._log(logging.ERROR, message, kwargs)
     
     def warning(self, message, **kwargs):
         """Log warning message with optional extra fields"""
-        extra = {'extra_fields': kwargs} if kwargs else {}
-        self.logger.warning(message, extra=extra)
+        self._log(logging.WARNING, message, kwargs)
     
     def debug(self, message, **kwargs):
         """Log debug message with optional extra fields"""
-        extra = {'extra_fields': kwargs} if kwargs else {}
-        self.logger.debug(message, extra=extra)
+        self._log(logging.DEBUG, message, kwargs)
 
 
 def setup_logging():
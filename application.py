@@ -6,7 +6,8 @@ import os
 
 # Initialize New Relic before importing the app
 # Only initialize if not already initialized (e.g., when using newrelic-admin run-program)
-if os.environ.get('NEW_RELIC_LICENSE_KEY', '022ab198ef6059b8346e0d3aa7e6e9a3FFFFNRAL'):
+# and only with a license key: without one the ~200 ms agent import is skipped entirely
+if os.environ.get('NEW_RELIC_LICENSE_KEY'):
     try:
         import newrelic.agent
         from newrelic.api.exceptions import ConfigurationError
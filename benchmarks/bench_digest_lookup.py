@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Index size and point-lookup latency: String(255) email index vs 8-byte digest index
+Ejecutar con: python benchmarks/bench_digest_lookup.py [--rows 10000000] [--lookups 100000]
+
+Generates a SQLite database with the blacklists layout (reused when it
+already has the requested number of rows), then reports the size of each
+index from the dbstat table and the mean lookup time of the old path
+(``WHERE email = ?``) and the new one (``WHERE email_digest = ? AND
+email_canonical = ?``) for hits and misses.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.canonical import EmailCanonicalizer, email_digest  # noqa: E402
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS blacklists ('
+    'id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL, email_canonical VARCHAR(255), '
+    'email_digest BIGINT, app_uuid VARCHAR(36) NOT NULL, blocked_reason VARCHAR(255), '
+    'client_ip VARCHAR(45) NOT NULL, created_at DATETIME NOT NULL)'
+)
+INDEXES = {
+    'ix_blacklists_email': 'CREATE UNIQUE INDEX IF NOT EXISTS ix_blacklists_email ON blacklists (email)',
+    'ix_blacklists_email_digest': 'CREATE INDEX IF NOT EXISTS ix_blacklists_email_digest ON blacklists (email_digest)',
+}
+DOMAINS = ('gmail.com', 'yahoo.com', 'hotmail.com', 'example.com', 'company-with-a-long-domain.example.org')
+
+
+def make_email(i):
+    # Realistic widths: name-like local parts of 15-30 characters
+    return f'customer.account.{i:09d}.{i % 97:02d}@{DOMAINS[i % len(DOMAINS)]}'
+
+
+def generate(connection, rows, batch_size=50000):
+    canonicalize = EmailCanonicalizer()
+    connection.execute(SCHEMA)
+    existing = connection.execute('SELECT count(*) FROM blacklists').fetchone()[0]
+    if existing == rows:
+        return False
+    connection.execute('DELETE FROM blacklists')
+    for name in INDEXES:
+        connection.execute(f'DROP INDEX IF EXISTS {name}')
+
+    start = time.monotonic()
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            email = make_email(i)
+            canonical = canonicalize(email)
+            batch.append((email, canonical, email_digest(canonical)))
+        connection.executemany(
+            'INSERT INTO blacklists (email, email_canonical, email_digest, app_uuid, client_ip, created_at) '
+            "VALUES (?, ?, ?, '123e4567-e89b-12d3-a456-426614174000', '127.0.0.1', CURRENT_TIMESTAMP)",
+            batch
+        )
+        connection.commit()
+        print(f'\rgenerated {min(rows, offset + batch_size)} rows', end='', file=sys.stderr)
+    for ddl in INDEXES.values():
+        connection.execute(ddl)
+    connection.commit()
+    print(f'\rgenerated {rows} rows in {time.monotonic() - start:.0f}s', file=sys.stderr)
+    return True
+
+
+def index_sizes(connection):
+    sizes = {}
+    for name in INDEXES:
+        pages, size = connection.execute(
+            'SELECT count(*), sum(pgsize) FROM dbstat WHERE name = ?', (name,)
+        ).fetchone()
+        sizes[name] = (pages, size or 0)
+    return sizes
+
+
+def measure(connection, sql, params_list):
+    cursor = connection.cursor()
+    start = time.perf_counter_ns()
+    for params in params_list:
+        cursor.execute(sql, params).fetchone()
+    return (time.perf_counter_ns() - start) / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--path', default='/tmp/bench_digest_lookup.db')
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=OFF')
+    generate(connection, args.rows)
+
+    print(f"{'Index':<30} {'pages':>10} {'MiB':>10}")
+    print('-' * 52)
+    for name, (pages, size) in index_sizes(connection).items():
+        print(f'{name:<30} {pages:>10} {size / 2 ** 20:>10.1f}')
+
+    rng = random.Random(42)
+    hits = [make_email(rng.randrange(args.rows)) for _ in range(args.lookups)]
+    # Misses sort right next to existing rows, so neither index gets a cache-friendly edge
+    misses = [make_email(rng.randrange(args.rows)).replace('@', '.x@') for _ in range(args.lookups)]
+    old_sql = 'SELECT blocked_reason FROM blacklists WHERE email = ?'
+    new_sql = 'SELECT blocked_reason FROM blacklists WHERE email_digest = ? AND email_canonical = ?'
+
+    print()
+    print(f"{'Lookup':<30} {'ns/lookup':>12}")
+    print('-' * 43)
+    for label, emails in (('hit', hits), ('miss', misses)):
+        # Both paths pay for canonicalization in the route; only the query is timed
+        canonical = [(email.lower(),) for email in emails]
+        digested = [(email_digest(email), email) for (email,) in canonical]
+        print(f"{'email index, ' + label:<30} {measure(connection, old_sql, canonical):>12.0f}")
+        print(f"{'digest index, ' + label:<30} {measure(connection, new_sql, digested):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
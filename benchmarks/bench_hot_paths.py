@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the request hot paths, with JSON results and baseline comparison
+Ejecutar con: python benchmarks/bench_hot_paths.py [--sizes 1000,10000,100000,1000000]
+              [--json results.json] [--compare benchmarks/baseline.json --threshold 10]
+              [--save-baseline benchmarks/baseline.json]
+
+Runs offline against throwaway SQLite files. Table-size dependent benchmarks
+(check_blacklist hit/miss, add_to_blacklist) run once per size through the
+Flask test client; the rest (require_bearer_token, BlacklistSchema.load,
+BlacklistValidator.load, JSONFormatter.format, record_db_metric) run once.
+Timing follows pytest-benchmark: calibrate the iterations per round to --min-time, run
+--rounds rounds and report min/max/mean/median/stddev per call. The JSON
+layout mirrors pytest-benchmark's ``--benchmark-json`` output.
+
+With --compare, every benchmark whose median is more than --threshold
+percent slower than the baseline is reported and the exit code is 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Dependency-free app configuration (read by app.config at import time)
+os.environ.setdefault('TELEMETRY_BACKEND', 'none')
+os.environ.setdefault('DB_CREATE_ALL_ON_STARTUP', 'false')
+os.environ.pop('NEW_RELIC_LICENSE_KEY', None)
+
+# App log handlers write to sys.stdout: they keep their formatting cost but
+# the output is discarded, and the report goes to the real stdout
+REPORT = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+
+from app import create_app, db  # noqa: E402
+from app.canonical import canonicalize_email, email_digest  # noqa: E402
+from app.models import Blacklist  # noqa: E402
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+AUTH_HEADERS = {'Authorization': 'Bearer dev-bearer-token'}
+
+
+def make_email(i):
+    return f'customer.account.{i:09d}@example.com'
+
+
+def populate(app, rows, batch_size=50000):
+    """Create the schema and insert ``rows`` generated entries"""
+    with app.app_context():
+        db.create_all()
+        table = Blacklist.__table__
+        created_at = datetime.utcnow()
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for i in range(offset, min(rows, offset + batch_size)):
+                email = make_email(i)
+                canonical = canonicalize_email(email)
+                batch.append({
+                    'email': email, 'email_canonical': canonical, 'email_digest': email_digest(canonical),
+                    'app_uuid': APP_UUID, 'blocked_reason': 'Benchmark', 'client_ip': '127.0.0.1',
+                    'created_at': created_at,
+                })
+            with db.engine.begin() as connection:
+                connection.execute(table.insert(), batch)
+        db.session.remove()
+
+
+def run_benchmark(func, rounds, min_time):
+    """Per-call timings in ns, calibrated like pytest-benchmark"""
+    func()  # Warm up caches, imports and connections
+    iterations = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9 or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter_ns() - start) / iterations)
+    return {
+        'min': min(samples),
+        'max': max(samples),
+        'mean': statistics.mean(samples),
+        'median': statistics.median(samples),
+        'stddev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'rounds': rounds,
+        'iterations': iterations,
+    }
+
+
+def table_benchmarks(app, rows):
+    """Benchmarks whose cost depends on the table size"""
+    client = app.test_client()
+    hit = make_email(rows // 2)
+    counter = iter(range(10 ** 9))
+
+    def check_hit():
+        response = client.get(f'/blacklists/{hit}', headers=AUTH_HEADERS)
+        assert response.status_code == 200
+
+    def check_miss():
+        response = client.get('/blacklists/nobody@example.com', headers=AUTH_HEADERS)
+        assert response.status_code == 200
+
+    def add():
+        response = client.post('/blacklists', headers=AUTH_HEADERS, json={
+            'email': f'new.{next(counter)}@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
+
+    return {
+        'check_blacklist_hit': check_hit,
+        'check_blacklist_miss': check_miss,
+        'add_to_blacklist': add,
+    }
+
+
+def unit_benchmarks(app):
+    """Benchmarks independent of the table size"""
+    from app.auth import require_bearer_token
+    from app.db_metrics import record_db_metric
+    from app.schemas import BlacklistSchema, BlacklistValidator
+    from app.utils import JSONFormatter
+
+    protected = require_bearer_token(lambda: 'ok')
+    request_context = app.test_request_context('/blacklists/x', headers=AUTH_HEADERS)
+    request_context.push()
+
+    schema = BlacklistSchema()
+    validator = BlacklistValidator()
+    payload = {'email': 'user@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam'}
+
+    formatter = JSONFormatter()
+    record = logging.LogRecord('app.utils', logging.INFO, __file__, 1, 'Email found in blacklist', None, None)
+    record.extra_fields = {'email': 'user@example.com', 'is_blacklisted': True, 'db_time_ms': 1.25}
+
+    return {
+        'require_bearer_token': protected,
+        'BlacklistSchema.load': lambda: schema.load(payload),
+        'BlacklistValidator.load': lambda: validator.load(payload),
+        'JSONFormatter.format': lambda: formatter.format(record),
+        'record_db_metric': lambda: record_db_metric('query', 1.25, success=True),
+    }, request_context
+
+
+def machine_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'machine_info': {
+            'python_version': platform.python_version(),
+            'python_implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'processor': platform.processor(),
+        },
+        'commit_info': {'id': commit},
+        'datetime': datetime.utcnow().isoformat() + 'Z',
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return ``(name, baseline_median, median, change_percent)`` for every regression"""
+    previous = {bench['fullname']: bench['stats']['median'] for bench in baseline['benchmarks']}
+    regressions = []
+    for bench in results['benchmarks']:
+        before = previous.get(bench['fullname'])
+        if not before:
+            continue
+        change = (bench['stats']['median'] - before) / before * 100
+        if change > threshold:
+            regressions.append((bench['fullname'], before, bench['stats']['median'], change))
+    return regressions, previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='Comma separated table sizes (rows).')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per calibrated round.')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this.')
+    parser.add_argument('--json', help='Write results to this file.')
+    parser.add_argument('--save-baseline', help='Write results to this file as the new baseline.')
+    parser.add_argument('--compare', help='Baseline JSON to compare against.')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Allowed median slowdown in percent before failing.')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = dict(machine_info(), benchmarks=[])
+
+    def record(name, group, func):
+        fullname = f'{name}[{group}]' if group else name
+        if args.filter not in fullname:
+            return
+        stats = run_benchmark(func, args.rounds, args.min_time)
+        results['benchmarks'].append({'name': name, 'group': group, 'fullname': fullname, 'stats': stats})
+        print(f"{fullname:<40} {stats['median']:>12.0f} ns  (±{stats['stddev']:.0f}, "
+              f"{stats['rounds']}x{stats['iterations']})", file=REPORT, flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'unit.db')}"
+        populate(app, 0)
+        benchmarks, request_context = unit_benchmarks(app)
+        try:
+            for name, func in benchmarks.items():
+                record(name, None, func)
+        finally:
+            request_context.pop()
+
+        for rows in sizes:
+            app = create_app()
+            app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, f'rows_{rows}.db')}"
+            populate(app, rows)
+            for name, func in table_benchmarks(app, rows).items():
+                record(name, f'{rows}_rows', func)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, previous = compare(results, baseline, args.threshold)
+        print(file=REPORT)
+        print(f"{'Benchmark':<40} {'baseline':>12} {'now':>12} {'change':>9}", file=REPORT)
+        print('-' * 76, file=REPORT)
+        for bench in results['benchmarks']:
+            before = previous.get(bench['fullname'])
+            if before:
+                now = bench['stats']['median']
+                print(f"{bench['fullname']:<40} {before:>12.0f} {now:>12.0f} {(now - before) / before * 100:>+8.1f}%",
+                      file=REPORT)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:g}%:", file=REPORT)
+            for name, before, now, change in regressions:
+                print(f'  {name}: {before:.0f} -> {now:.0f} ns ({change:+.1f}%)', file=REPORT)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
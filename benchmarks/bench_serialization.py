@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Per-request CPU of validation and JSON serialization: marshmallow + Flask jsonify vs the fast path
+Ejecutar con: python benchmarks/bench_serialization.py [--requests 2000] [--calls 20000]
+
+Components are timed in isolation (wall clock per call) and whole requests
+through the Flask test client against a throwaway SQLite file, reporting
+process CPU time per request for each configuration:
+    before   SCHEMA_FAST_PATH=false, JSON_RESPONSE_ENCODER=flask
+    stdlib   precompiled validator/serializer, prebuilt json.JSONEncoder
+    orjson   precompiled validator/serializer, orjson (when installed)
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('TELEMETRY_BACKEND', 'none')
+os.environ.setdefault('DB_CREATE_ALL_ON_STARTUP', 'false')
+os.environ.pop('NEW_RELIC_LICENSE_KEY', None)
+
+# App log handlers write to sys.stdout: keep their cost, discard the output
+REPORT = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+
+from app import create_app, db  # noqa: E402
+from app.json_response import jsonify, orjson  # noqa: E402
+from app.models import Blacklist  # noqa: E402
+from app.schemas import (BlacklistSchema, BlacklistResponseSchema, BlacklistValidator,  # noqa: E402
+                         BlacklistResponseSerializer)
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+AUTH_HEADERS = {'Authorization': 'Bearer dev-bearer-token'}
+CONFIGURATIONS = {
+    'before': {'SCHEMA_FAST_PATH': False, 'JSON_RESPONSE_ENCODER': 'flask'},
+    'stdlib': {'SCHEMA_FAST_PATH': True, 'JSON_RESPONSE_ENCODER': 'stdlib'},
+    'orjson': {'SCHEMA_FAST_PATH': True, 'JSON_RESPONSE_ENCODER': 'orjson'},
+}
+
+
+def per_call_us(func, calls):
+    func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def cpu_per_request_us(func, requests):
+    func(-1)
+    start = time.process_time()
+    for i in range(requests):
+        func(i)
+    return (time.process_time() - start) / requests * 1e6
+
+
+def report(title, rows):
+    print(f"{title:<28} " + ' '.join(f'{name:>10}' for name in CONFIGURATIONS), file=REPORT)
+    print('-' * (29 + 11 * len(CONFIGURATIONS)), file=REPORT)
+    for label, values in rows:
+        print(f'{label:<28} ' + ' '.join(f'{value:>10.1f}' if value is not None else f"{'-':>10}"
+                                         for value in values), file=REPORT)
+    print(file=REPORT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5, help='Interleaved request rounds; the best is reported.')
+    args = parser.parse_args()
+
+    configurations = {name: overrides for name, overrides in CONFIGURATIONS.items()
+                      if name != 'orjson' or orjson is not None}
+    payload = {'email': 'user@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam detected'}
+    entry = Blacklist(id=1, email='user@example.com', app_uuid=APP_UUID, blocked_reason='Spam detected',
+                      client_ip='127.0.0.1', created_at=datetime.utcnow())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'serialization.db')}"
+        with app.app_context():
+            db.create_all()
+
+        loaders = {'before': BlacklistSchema(), 'fast': BlacklistValidator()}
+        dumpers = {'before': BlacklistResponseSchema(), 'fast': BlacklistResponseSerializer()}
+        component_rows = [
+            ('load (us/call)', [per_call_us(lambda: loaders['before' if name == 'before' else 'fast'].load(payload),
+                                            args.calls) for name in CONFIGURATIONS]),
+            ('dump (us/call)', [per_call_us(lambda: dumpers['before' if name == 'before' else 'fast'].dump(entry),
+                                            args.calls) for name in CONFIGURATIONS]),
+        ]
+        jsonify_row = []
+        body = {'message': 'Email agregado exitosamente a la lista negra.', 'data': dumpers['fast'].dump(entry)}
+        with app.test_request_context():
+            for name in CONFIGURATIONS:
+                if name not in configurations:
+                    jsonify_row.append(None)
+                    continue
+                app.config.update(configurations[name])
+                jsonify_row.append(per_call_us(lambda: jsonify(body), args.calls))
+        component_rows.append(('jsonify (us/call)', jsonify_row))
+        report('Component', component_rows)
+
+        # Rounds alternate between configurations so drift (table growth, caches) hits all of them
+        client = app.test_client()
+        best = {'POST /blacklists': {}, 'GET /blacklists/<email>': {}}
+        for round_number in range(args.rounds):
+            for name, overrides in configurations.items():
+                app.config.update(overrides)
+                prefix = f'{name}.{round_number}'
+
+                def post(i):
+                    client.post('/blacklists', headers=AUTH_HEADERS,
+                                json=dict(payload, email=f'{prefix}.{i}@example.com'))
+
+                def get(i):
+                    client.get(f'/blacklists/{prefix}.{i}@example.com', headers=AUTH_HEADERS)
+
+                for label, func in (('POST /blacklists', post), ('GET /blacklists/<email>', get)):
+                    value = cpu_per_request_us(func, args.requests)
+                    best[label][name] = min(value, best[label].get(name, value))
+        report('Request (CPU us/request)',
+               [(label, [values.get(name) for name in CONFIGURATIONS]) for label, values in best.items()])
+
+
+if __name__ == '__main__':
+    main()
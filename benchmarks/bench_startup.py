@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Worker startup cost: import time, create_app() and first-request latency
+Ejecutar con: python benchmarks/bench_startup.py [--runs 5]
+
+Each configuration is measured in fresh interpreters (the interesting part
+is cold imports) against a throwaway SQLite file, and the median of
+``--runs`` is reported:
+    legacy   create_all per worker, setuptools distutils shim, agent imported
+    startup  schema created by `flask blacklist migrate`, stdlib distutils,
+             no license key (New Relic never imported)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import os
+if os.environ.get('BENCH_IMPORT_AGENT'):
+    import newrelic.agent  # What every route module used to do at import time
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/health')
+t3 = time.perf_counter()
+client.get('/blacklists/first@example.com', headers={'Authorization': 'Bearer dev-bearer-token'})
+t4 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_app_ms': (t2 - t1) * 1000,
+                  'first_health_ms': (t3 - t2) * 1000, 'first_lookup_ms': (t4 - t3) * 1000}))
+'''
+
+CONFIGURATIONS = {
+    'legacy': {'DB_CREATE_ALL_ON_STARTUP': 'true', 'BENCH_IMPORT_AGENT': '1'},
+    'startup': {'DB_CREATE_ALL_ON_STARTUP': 'false', 'SETUPTOOLS_USE_DISTUTILS': 'stdlib'},
+}
+
+
+def run_probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_env = {key: value for key, value in os.environ.items()
+                    if key not in ('NEW_RELIC_LICENSE_KEY', 'SETUPTOOLS_USE_DISTUTILS')}
+        base_env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        base_env['LOG_LEVEL'] = 'ERROR'
+        # The release step, run once
+        subprocess.run([sys.executable, '-m', 'flask', 'blacklist', 'migrate'], cwd=ROOT,
+                       env={**base_env, 'FLASK_APP': 'application:application'},
+                       capture_output=True, check=True)
+
+        print(f"{'Configuration':<14} {'import':>10} {'create_app':>12} {'1st /health':>12} {'1st lookup':>12}  (ms, median)")
+        print('-' * 78)
+        for name, overrides in CONFIGURATIONS.items():
+            runs = [run_probe({**base_env, **overrides}) for _ in range(args.runs)]
+            median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            print(f"{name:<14} {median['import_ms']:>10.1f} {median['create_app_ms']:>12.1f} "
+                  f"{median['first_health_ms']:>12.1f} {median['first_lookup_ms']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Per-request telemetry overhead: direct New Relic calls vs the buffered aggregator
+Ejecutar con: python benchmarks/bench_telemetry.py [--iterations 200000]
+
+Replays the metric calls made by one check_blacklist hit (QueryAttempt,
+record_db_metric, QueryFound and two attributes) both ways.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.telemetry import Telemetry, NewRelicBackend, NullBackend  # noqa: E402
+
+
+def legacy_request():
+    import newrelic.agent
+    newrelic.agent.record_custom_metric('Custom/Blacklist/QueryAttempt', 1)
+    # record_db_metric re-imported the agent on every call
+    import newrelic.agent
+    newrelic.agent.record_custom_metric('Custom/Database/QueryTime', 1.5)
+    newrelic.agent.record_custom_metric('Custom/Database/TotalQueries', 1)
+    newrelic.agent.add_custom_attribute('db_operation', 'query')
+    newrelic.agent.add_custom_attribute('db_response_time_ms', 1.5)
+    newrelic.agent.record_custom_metric('Custom/Blacklist/QueryFound', 1)
+    newrelic.agent.add_custom_attribute('email', 'user@example.com')
+    newrelic.agent.add_custom_attribute('is_blacklisted', True)
+
+
+def make_buffered_request(telemetry):
+    def buffered_request():
+        telemetry.incr('Custom/Blacklist/QueryAttempt')
+        telemetry.timing('Custom/Database/QueryTime', 1.5)
+        telemetry.incr('Custom/Database/TotalQueries')
+        telemetry.add_attribute('db_operation', 'query')
+        telemetry.add_attribute('db_response_time_ms', 1.5)
+        telemetry.incr('Custom/Blacklist/QueryFound')
+        telemetry.add_attribute('email', 'user@example.com')
+        telemetry.add_attribute('is_blacklisted', True)
+    return buffered_request
+
+
+def measure(func, iterations):
+    func()  # Warm up imports and buffers
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    results = [('legacy newrelic.agent calls', measure(legacy_request, args.iterations))]
+    for label, backend in (('telemetry (newrelic, agent idle)', NewRelicBackend()),
+                           ('telemetry (no-op backend)', NullBackend())):
+        telemetry = Telemetry(backend, flush_interval=1.0)
+        results.append((label, measure(make_buffered_request(telemetry), args.iterations)))
+        flush_start = time.perf_counter_ns()
+        telemetry.flush()
+        results.append((f'  flush ({label})', time.perf_counter_ns() - flush_start))
+
+    print(f"{'Path':<40} {'ns/request':>12}")
+    print('-' * 53)
+    for label, ns in results:
+        print(f'{label:<40} {ns:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+Client SDK for the blacklist microservice
+
+    from blacklist_client import BlacklistClient
+
+    with BlacklistClient('http://localhost:5000', token) as client:
+        client.check('user@example.com').is_blacklisted
+
+``AsyncBlacklistClient`` offers the same methods as coroutines.
+"""
+from blacklist_client.aio import AsyncBlacklistClient  # noqa: F401
+from blacklist_client.base import BlacklistClientError, LookupResult  # noqa: F401
+from blacklist_client.cache import ResultCache  # noqa: F401
+from blacklist_client.client import BlacklistClient  # noqa: F401
@@ -0,0 +1,231 @@
+"""
+asyncio client on a pool of keep-alive HTTP/1.1 connections (stdlib streams only)
+
+Lookups started in the same event loop iteration (e.g. by ``asyncio.gather``)
+go out as one POST /blacklists/check batch; concurrent lookups for the same
+email share one future.
+"""
+import asyncio
+import json
+import ssl
+
+from blacklist_client.base import (BaseClient, CHECK_PATH, add_payload, decode_json, lookup_path,
+                                   normalize_email, parse_batch, parse_lookup)
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection over asyncio streams"""
+
+    def __init__(self, host, port, ssl_context):
+        self.host = host
+        self.port = port
+        self.ssl = ssl_context
+        self.reader = self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body):
+        """
+        Send one request; a reused connection the server closed meanwhile is retried once
+
+        Returns:
+            ``(status, body, keep_alive)``
+        """
+        reused = self.writer is not None
+        try:
+            return await self._request(method, path, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        return await self._request(method, path, headers, body)
+
+    async def _request(self, method, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        lines.append(f'Content-Length: {len(body) if body else 0}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        if not status_line.strip():
+            raise asyncio.IncompleteReadError(status_line, None)
+        version, status = status_line.split(b' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            response_body = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            response_body = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            response_body = await self.reader.read()
+            response_headers['connection'] = 'close'
+
+        connection = response_headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == b'HTTP/1.0' else connection != 'close'
+        return int(status), response_body, keep_alive
+
+
+class _ConnectionPool:
+    """At most ``size`` connections; idle ones are reused most recently used first"""
+
+    def __init__(self, host, port, ssl_context, size, timeout):
+        self.host = host
+        self.port = port
+        self.ssl = ssl_context
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, headers, body=None):
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else _Connection(self.host, self.port, self.ssl)
+            try:
+                status, response_body, keep_alive = await asyncio.wait_for(
+                    connection.request(method, path, headers, body), self.timeout
+                )
+            except BaseException:
+                connection.close()
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                connection.close()
+            return status, response_body
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class AsyncBlacklistClient(BaseClient):
+    """asyncio client for the blacklist service (see BaseClient for the arguments)"""
+
+    def __init__(self, base_url, token, **options):
+        super().__init__(base_url, token, **options)
+        ssl_context = ssl.create_default_context() if self.scheme == 'https' else None
+        self._pool = _ConnectionPool(self.host, self.port, ssl_context, self.pool_size, self.timeout)
+        self._inflight = {}
+        self._pending = []
+        self._senders = 0
+        self._tasks = set()
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _request(self, method, path, payload=None):
+        self.requests += 1
+        headers = dict(self.headers)
+        body = None
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(payload).encode('utf-8')
+        return await self._pool.request(method, self.prefix + path, headers, body)
+
+    async def check(self, email):
+        """Whether ``email`` is blacklisted, as a LookupResult (see BlacklistClient.check)"""
+        key = normalize_email(email)
+        return (await self._resolve([key]))[key]
+
+    async def check_many(self, emails):
+        """dict mapping each lowercased email to its LookupResult"""
+        return await self._resolve(list(dict.fromkeys(normalize_email(email) for email in emails)))
+
+    async def add(self, email, app_uuid, blocked_reason=None):
+        """Add ``email`` to the blacklist and return the response body (see BlacklistClient.add)"""
+        key = normalize_email(email)
+        status, body = await self._request('POST', '/blacklists', add_payload(email, app_uuid, blocked_reason))
+        data = decode_json(status, body)
+        self._remember_added(key, blocked_reason)
+        return data
+
+    async def _resolve(self, keys):
+        loop = asyncio.get_running_loop()
+        results = {}
+        waiting = {}
+        for key in keys:
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = cached
+                continue
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = loop.create_future()
+                self._pending.append(key)
+            else:
+                self.coalesced += 1
+            waiting[key] = future
+
+        while self._pending and self._senders < self.max_in_flight:
+            self._senders += 1
+            task = loop.create_task(self._drain())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        for key, future in waiting.items():
+            # A cancelled caller must not cancel the lookup other callers share
+            results[key] = await asyncio.shield(future)
+        return results
+
+    async def _drain(self):
+        try:
+            # Let lookups started in this loop iteration join the first batch
+            await asyncio.sleep(0)
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+                await self._send(batch)
+        finally:
+            self._senders -= 1
+
+    async def _send(self, batch):
+        try:
+            found = await self._fetch(batch)
+        except asyncio.CancelledError:
+            for key in batch:
+                self._inflight.pop(key).cancel()
+            raise
+        except Exception as e:
+            for key in batch:
+                self._inflight.pop(key).set_exception(e)
+            return
+        for key in batch:
+            self.cache.put(key, found[key])
+            self._inflight.pop(key).set_result(found[key])
+
+    async def _fetch(self, keys):
+        if len(keys) > 1 and self.batch_supported:
+            status, body = await self._request('POST', CHECK_PATH, {'emails': keys})
+            if status in (404, 405):
+                self.batch_supported = False
+            else:
+                self.batches += 1
+                return parse_batch(decode_json(status, body))
+        responses = await asyncio.gather(*(self._request('GET', lookup_path(key)) for key in keys))
+        return {key: parse_lookup(key, decode_json(status, body)) for key, (status, body) in zip(keys, responses)}
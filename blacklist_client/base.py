@@ -0,0 +1,117 @@
+"""
+Pieces shared by the sync and asyncio clients: results, errors and response parsing
+"""
+import json
+from collections import namedtuple
+from urllib.parse import quote, urlsplit
+
+from blacklist_client.cache import ResultCache
+
+LookupResult = namedtuple('LookupResult', ['email', 'is_blacklisted', 'blocked_reason'])
+
+CHECK_PATH = '/blacklists/check'
+# The server rejects larger POST /blacklists/check bodies (BATCH_CHECK_MAX_EMAILS)
+MAX_BATCH_SIZE = 1000
+
+
+class BlacklistClientError(Exception):
+    """Non-success response from the blacklist service"""
+
+    def __init__(self, status, message, body=None):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.message = message
+        self.body = body
+
+
+def normalize_email(email):
+    """Cache and coalescing key of an email (the server lowercases it too)"""
+    if not isinstance(email, str) or '@' not in email:
+        raise ValueError(f'Invalid email format: {email!r}')
+    return email.lower()
+
+
+def lookup_path(key):
+    return f"/blacklists/{quote(key, safe='@+')}"
+
+
+def add_payload(email, app_uuid, blocked_reason):
+    payload = {'email': email, 'app_uuid': app_uuid}
+    if blocked_reason is not None:
+        payload['blocked_reason'] = blocked_reason
+    return payload
+
+
+def decode_json(status, body):
+    """Parse a JSON body, raising BlacklistClientError for non-2xx statuses"""
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    if not 200 <= status < 300:
+        message = data.get('message') if isinstance(data, dict) else None
+        raise BlacklistClientError(status, message or 'Unexpected response', data)
+    return data
+
+
+def parse_lookup(key, data):
+    return LookupResult(key, bool(data['is_blacklisted']), data.get('blocked_reason'))
+
+
+def parse_batch(data):
+    return {
+        item['email']: LookupResult(item['email'], bool(item['is_blacklisted']), item.get('blocked_reason'))
+        for item in data['results']
+    }
+
+
+class BaseClient:
+    """
+    Configuration, cache and counters common to both clients
+
+    Args:
+        base_url: Service URL, e.g. ``http://localhost:5000``
+        token: Bearer token (APP_ALLOWED_BEARER on the server)
+        pool_size: Persistent connections kept open at most
+        timeout: Seconds per HTTP request
+        cache_size: Results kept in the local LRU cache (0 disables it)
+        cache_ttl: Seconds a blacklisted result is served from the cache
+        negative_cache_ttl: Seconds a not-blacklisted result is served from the cache
+        max_batch: Lookups sent per POST /blacklists/check request
+        max_in_flight: Lookup requests in flight at once; later lookups queue up and go in one batch
+    """
+
+    def __init__(self, base_url, token, pool_size=10, timeout=5.0, cache_size=10000, cache_ttl=60.0,
+                 negative_cache_ttl=5.0, max_batch=500, max_in_flight=4):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Invalid base_url: {base_url!r}')
+        self.base_url = base_url.rstrip('/')
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = ResultCache(cache_size, cache_ttl, negative_cache_ttl)
+        self.max_batch = max(1, min(max_batch, MAX_BATCH_SIZE))
+        self.max_in_flight = max(1, max_in_flight)
+        # Cleared the first time the server answers POST /blacklists/check with 404/405
+        self.batch_supported = True
+        self.requests = 0
+        self.batches = 0
+        self.coalesced = 0
+
+    def _remember_added(self, key, blocked_reason):
+        self.cache.put(key, LookupResult(key, True, blocked_reason))
+
+    def stats(self):
+        """Cache, request, batch and coalescing counters"""
+        return {
+            'cache': self.cache.stats(),
+            'requests': self.requests,
+            'batches': self.batches,
+            'coalesced': self.coalesced,
+            'batch_supported': self.batch_supported,
+        }
@@ -0,0 +1,66 @@
+"""
+Bounded TTL/LRU cache of lookup results shared by the sync and asyncio clients
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    LRU of lookup results keyed by lowercased email, with separate TTLs for hits and misses
+
+    Args:
+        max_size: Entries kept at most; the least recently used go first (0 disables the cache)
+        ttl: Seconds a blacklisted result is served without asking the server
+        negative_ttl: Seconds a not-blacklisted result is served (new entries show up after this)
+        clock: Monotonic time source (tests)
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0, negative_ttl=5.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The cached result for ``key``, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() >= entry[1]:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        ttl = self.ttl if result.is_blacklisted else self.negative_ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (result, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
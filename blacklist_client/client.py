@@ -0,0 +1,153 @@
+"""
+Thread-safe synchronous client on a pooled ``requests.Session``
+
+Lookups for the same email from concurrent threads share one request, and
+lookups that arrive while ``max_in_flight`` requests are already running wait
+and leave together in the next POST /blacklists/check batch. A lone lookup is
+sent right away, so batching adds no latency when the client is idle.
+"""
+import threading
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from blacklist_client.base import (BaseClient, CHECK_PATH, add_payload, decode_json, lookup_path,
+                                   normalize_email, parse_batch, parse_lookup)
+
+
+class BlacklistClient(BaseClient):
+    """Synchronous client for the blacklist service (see BaseClient for the arguments)"""
+
+    def __init__(self, base_url, token, **options):
+        super().__init__(base_url, token, **options)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # pool_block: never open more than pool_size connections, wait for a free one instead
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._condition = threading.Condition()
+        self._inflight = {}
+        self._pending = []
+        self._senders = 0
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, method, path, json=None):
+        self.requests += 1
+        response = self.session.request(method, self.base_url + path, json=json, timeout=self.timeout)
+        return response.status_code, response.content
+
+    def check(self, email):
+        """
+        Whether ``email`` is blacklisted
+
+        Returns:
+            LookupResult(email, is_blacklisted, blocked_reason), email lowercased
+
+        Raises:
+            ValueError: The email has no '@'
+            BlacklistClientError: The service answered with an error status
+        """
+        key = normalize_email(email)
+        return self._resolve([key])[key]
+
+    def check_many(self, emails):
+        """
+        Look up many emails, in as few requests as the batch size allows
+
+        Returns:
+            dict mapping each lowercased email to its LookupResult
+        """
+        return self._resolve(list(dict.fromkeys(normalize_email(email) for email in emails)))
+
+    def add(self, email, app_uuid, blocked_reason=None):
+        """
+        Add ``email`` to the blacklist
+
+        Returns:
+            The service response body
+
+        Raises:
+            BlacklistClientError: E.g. 409 if the email is already blacklisted
+        """
+        key = normalize_email(email)
+        status, body = self._request('POST', '/blacklists', json=add_payload(email, app_uuid, blocked_reason))
+        data = decode_json(status, body)
+        self._remember_added(key, blocked_reason)
+        return data
+
+    def _resolve(self, keys):
+        results = {}
+        waiting = {}
+        with self._condition:
+            for key in keys:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[key] = cached
+                    continue
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = Future()
+                    self._pending.append(key)
+                else:
+                    self.coalesced += 1
+                waiting[key] = future
+        for key, future in waiting.items():
+            self._wait(future)
+            results[key] = future.result()
+        return results
+
+    def _wait(self, future):
+        # Waiting threads send queued lookups (their own or others') whenever a slot is free
+        while True:
+            with self._condition:
+                while not future.done() and (self._senders >= self.max_in_flight or not self._pending):
+                    self._condition.wait()
+                if future.done():
+                    return
+                self._senders += 1
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+            try:
+                self._send(batch)
+            finally:
+                with self._condition:
+                    self._senders -= 1
+                    self._condition.notify_all()
+
+    def _send(self, batch):
+        try:
+            found = self._fetch(batch)
+        except Exception as e:
+            with self._condition:
+                for key in batch:
+                    self._inflight.pop(key).set_exception(e)
+            return
+        with self._condition:
+            for key in batch:
+                self.cache.put(key, found[key])
+                self._inflight.pop(key).set_result(found[key])
+
+    def _fetch(self, keys):
+        if len(keys) > 1 and self.batch_supported:
+            status, body = self._request('POST', CHECK_PATH, json={'emails': keys})
+            if status in (404, 405):
+                # Server without the batch endpoint: one GET per email from now on
+                self.batch_supported = False
+            else:
+                self.batches += 1
+                return parse_batch(decode_json(status, body))
+        found = {}
+        for key in keys:
+            status, body = self._request('GET', lookup_path(key))
+            found[key] = parse_lookup(key, decode_json(status, body))
+        return found
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Generador de carga asíncrono para el microservicio de blacklist.
+Reproduce una mezcla ponderada de las peticiones de postman_collection.json
+(aciertos, fallos, inserciones y duplicados) y reporta throughput, tasa de
+errores y percentiles p50/p90/p99/p99.9 a partir de un histograma HDR.
+
+Ejecutar con:
+    gunicorn -w 4 -b 127.0.0.1:5001 application:application
+    python scripts/loadgen.py --rate 500 --duration 30             # lazo abierto (req/s)
+    python scripts/loadgen.py --concurrency 32 --duration 30       # lazo cerrado
+    python analyze_deployments.py loadgen_results.csv
+
+En lazo abierto cada petición se programa a intervalos fijos y su latencia
+se mide desde el instante programado, así que las esperas por conexiones
+ocupadas cuentan (sin coordinated omission). Solo usa la librería estándar.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import ssl
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit, quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Petición de la colección que reproduce cada tipo, y su status esperado
+KINDS = {
+    'health': ('1. Health Check', 200),
+    'insert': ('2. Add Email to Blacklist', 201),
+    'hit': ('3. Check Blacklisted Email', 200),
+    'miss': ('4. Check Non-Blacklisted Email', 200),
+    'duplicate': ('5. Duplicate Email (409 Conflict)', 409),
+}
+DEFAULT_MIX = 'hit=60,miss=25,insert=10,duplicate=5'
+CSV_FIELDS = [
+    'Strategy', 'Version', 'Duration (seconds)', 'Start Time', 'Mode', 'Requests', 'Errors',
+    'Throughput (req/s)', 'Error Rate (%)', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', 'p99.9 (ms)', 'Max (ms)',
+]
+
+
+class HdrHistogram:
+    """Histograma log-lineal de enteros con 3 cifras significativas (estilo HdrHistogram)"""
+
+    SUB_BUCKET_BITS = 11  # 2048 sub-buckets: error relativo < 1/1024
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        value = max(0, int(value))
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        key = (shift, value >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Mayor valor equivalente del bucket que contiene el percentil"""
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * percent / 100))
+        seen = 0
+        for shift, sub in sorted(self.counts):
+            seen += self.counts[(shift, sub)]
+            if seen >= rank:
+                return min(self.max, ((sub + 1) << shift) - 1)
+        return self.max
+
+
+class Stats:
+    """Resultados por tipo de petición"""
+
+    def __init__(self):
+        self.histogram = HdrHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+
+    def record(self, latency_us, status, expected):
+        self.requests += 1
+        self.histogram.record(latency_us)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status != expected:
+            self.errors += 1
+
+
+def load_templates(collection_path, base_url, token):
+    """Plantillas (método, ruta, headers, body) de la colección para cada tipo"""
+    with open(collection_path) as f:
+        collection = json.load(f)
+    variables = {var['key']: var['value'] for var in collection.get('variable', [])}
+    variables['base_url'] = base_url
+    variables['token'] = token
+
+    def substitute(value):
+        for key, replacement in variables.items():
+            if key != 'test_email':
+                value = value.replace('{{' + key + '}}', replacement)
+        return value
+
+    items = {}
+
+    def walk(entries):
+        for entry in entries:
+            if 'item' in entry:
+                walk(entry['item'])
+            else:
+                items[entry['name']] = entry['request']
+
+    walk(collection['item'])
+
+    templates = {}
+    for kind, (name, expected) in KINDS.items():
+        request = items.get(name)
+        if request is None:
+            continue
+        url = request['url'] if isinstance(request['url'], str) else request['url']['raw']
+        path = urlsplit(substitute(url)).path or '/'
+        headers = {header['key']: substitute(header['value']) for header in request.get('header', [])
+                   if not header.get('disabled')}
+        body = substitute(request.get('body', {}).get('raw', '')) or None
+        templates[kind] = {'method': request['method'], 'path': path, 'headers': headers,
+                           'body': body, 'expected': expected}
+    return templates
+
+
+def parse_mix(value, templates):
+    """``hit=60,miss=25`` -> ([tipos], [pesos])"""
+    kinds, weights = [], []
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in templates:
+            raise SystemExit(f'Tipo desconocido en --mix: {kind} (disponibles: {", ".join(templates)})')
+        kinds.append(kind)
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+
+class RequestFactory:
+    """Concreta las plantillas: emails únicos para inserciones y fallos, sembrados para aciertos"""
+
+    def __init__(self, templates, seeded, run_id, rng):
+        self.templates = templates
+        self.seeded = seeded
+        self.run_id = run_id
+        self.rng = rng
+        self.counter = 0
+
+    def _email(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{self.run_id}-{self.counter}@loadgen.example.com'
+
+    def build(self, kind):
+        template = self.templates[kind]
+        if kind == 'insert':
+            email = self._email('new')
+        elif kind == 'miss':
+            email = self._email('miss')
+        else:
+            email = self.rng.choice(self.seeded) if self.seeded else 'test@example.com'
+
+        path = template['path']
+        if kind in ('hit', 'miss'):
+            path = path.rsplit('/', 1)[0] + '/' + quote(email, safe='@')
+        body = template['body']
+        if body is not None:
+            body = body.replace('{{test_email}}', email).encode('utf-8')
+        return template['method'], path, template['headers'], body, template['expected']
+
+
+class HTTPConnection:
+    """Conexión HTTP/1.1 keep-alive mínima sobre asyncio streams"""
+
+    def __init__(self, host, port, use_ssl, timeout):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body):
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        except BaseException:
+            self.close()
+            raise
+        # El servidor cerró la conexión keep-alive entre peticiones: reintentar una vez
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _request(self, method, path, headers, body):
+        if self.writer is None:
+            await self._connect()
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        lines.append(f'Content-Length: {len(body) if body else 0}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        if not status_line.strip():
+            raise asyncio.IncompleteReadError(status_line, None)
+        version, status = status_line.split(b' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            await self.reader.read()
+            self.close()
+
+        if response_headers.get('connection', '').lower() == 'close' or version == b'HTTP/1.0':
+            self.close()
+        return int(status)
+
+
+class LoadGenerator:
+    def __init__(self, base_url, factory, kinds, weights, concurrency, timeout, rng):
+        parts = urlsplit(base_url)
+        use_ssl = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if use_ssl else 80)
+        self.factory = factory
+        self.kinds = kinds
+        self.weights = weights
+        self.rng = rng
+        self.pool = asyncio.Queue()
+        for _ in range(concurrency):
+            self.pool.put_nowait(HTTPConnection(self.host, self.port, use_ssl, timeout))
+        self.stats = {kind: Stats() for kind in kinds}
+        self.exceptions = {}
+        self.recording = False
+
+    async def send(self, kind, intended_start):
+        """Enviar una petición; la latencia cuenta desde ``intended_start``"""
+        method, path, headers, body, expected = self.factory.build(kind)
+        connection = await self.pool.get()
+        try:
+            status = await connection.request(method, path, headers, body)
+        except Exception as exc:
+            status = type(exc).__name__
+            self.exceptions[status] = self.exceptions.get(status, 0) + 1
+        finally:
+            self.pool.put_nowait(connection)
+        if self.recording:
+            latency_us = (time.perf_counter() - intended_start) * 1e6
+            self.stats[kind].record(latency_us, status, expected)
+        return status
+
+    def pick(self):
+        return self.rng.choices(self.kinds, self.weights)[0]
+
+    async def open_loop(self, rate, duration):
+        """Programar ``rate`` peticiones por segundo sin esperar a las respuestas"""
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        tasks = set()
+        sent = 0
+        while True:
+            intended = start + sent * interval
+            if intended - start >= duration:
+                break
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(self.send(self.pick(), intended))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def closed_loop(self, concurrency, duration):
+        """``concurrency`` clientes enviando peticiones una tras otra"""
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            while time.perf_counter() < deadline:
+                await self.send(self.pick(), time.perf_counter())
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+async def seed(generator, count):
+    """Insertar ``count`` emails para que las consultas de acierto y duplicado tengan datos"""
+    factory = generator.factory
+    emails = [factory._email('seed') for _ in range(count)]
+    template = factory.templates['insert']
+
+    async def insert(email):
+        connection = await generator.pool.get()
+        try:
+            body = template['body'].replace('{{test_email}}', email).encode('utf-8')
+            await connection.request(template['method'], template['path'], template['headers'], body)
+        finally:
+            generator.pool.put_nowait(connection)
+
+    await asyncio.gather(*(insert(email) for email in emails))
+    return emails
+
+
+async def run(args, templates, kinds, weights):
+    rng = random.Random(args.seed_random)
+    factory = RequestFactory(templates, [], args.run_id, rng)
+    generator = LoadGenerator(args.base_url, factory, kinds, weights,
+                              args.concurrency, args.timeout, rng)
+    try:
+        if args.seed and 'insert' in templates:
+            factory.seeded = await seed(generator, args.seed)
+        if args.warmup:
+            await run_phase(generator, args, args.warmup)
+        generator.recording = True
+        started = time.perf_counter()
+        await run_phase(generator, args, args.duration)
+        elapsed = time.perf_counter() - started
+    finally:
+        generator.close()
+    return generator, elapsed
+
+
+async def run_phase(generator, args, duration):
+    if args.rate:
+        await generator.open_loop(args.rate, duration)
+    else:
+        await generator.closed_loop(args.concurrency, duration)
+
+
+def summarize(stats):
+    total = Stats()
+    for kind_stats in stats.values():
+        total.histogram.merge(kind_stats.histogram)
+        total.requests += kind_stats.requests
+        total.errors += kind_stats.errors
+        for status, count in kind_stats.statuses.items():
+            total.statuses[status] = total.statuses.get(status, 0) + count
+    return total
+
+
+def print_report(generator, elapsed, mode):
+    print(f'Modo: {mode}, duración: {elapsed:.1f}s')
+    print()
+    print(f"{'Tipo':<12} {'Peticiones':>10} {'req/s':>9} {'Errores':>8} "
+          f"{'p50':>9} {'p90':>9} {'p99':>9} {'p99.9':>9} {'max':>9}  (ms)")
+    print('-' * 96)
+    rows = dict(generator.stats)
+    rows['total'] = summarize(generator.stats)
+    for kind, stats in rows.items():
+        if not stats.requests:
+            continue
+        h = stats.histogram
+        error_rate = stats.errors / stats.requests * 100
+        print(f'{kind:<12} {stats.requests:>10} {stats.requests / elapsed:>9.1f} {error_rate:>7.2f}% '
+              f'{h.percentile(50) / 1000:>9.2f} {h.percentile(90) / 1000:>9.2f} '
+              f'{h.percentile(99) / 1000:>9.2f} {h.percentile(99.9) / 1000:>9.2f} {h.max / 1000:>9.2f}')
+    print()
+    print('Status: ' + ', '.join(f'{status}={count}' for status, count in sorted(
+        rows['total'].statuses.items(), key=lambda item: str(item[0]))))
+    if generator.exceptions:
+        print('Excepciones: ' + ', '.join(f'{name}={count}' for name, count in generator.exceptions.items()))
+    return rows['total']
+
+
+def write_csv(path, args, total, elapsed, started_at, mode):
+    """Añadir una fila con el formato que lee analyze_deployments.py"""
+    h = total.histogram
+    row = {
+        'Strategy': args.strategy,
+        'Version': args.version,
+        'Duration (seconds)': int(round(elapsed)),
+        'Start Time': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'Mode': mode,
+        'Requests': total.requests,
+        'Errors': total.errors,
+        'Throughput (req/s)': f'{total.requests / elapsed:.1f}' if elapsed else '0',
+        'Error Rate (%)': f'{total.errors / total.requests * 100:.2f}' if total.requests else '0',
+        'p50 (ms)': f'{h.percentile(50) / 1000:.3f}',
+        'p90 (ms)': f'{h.percentile(90) / 1000:.3f}',
+        'p99 (ms)': f'{h.percentile(99) / 1000:.3f}',
+        'p99.9 (ms)': f'{h.percentile(99.9) / 1000:.3f}',
+        'Max (ms)': f'{h.max / 1000:.3f}',
+    }
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def default_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generador de carga para el microservicio de blacklist')
+    parser.add_argument('--base-url', default='http://localhost:5001')
+    parser.add_argument('--token', default=os.environ.get('BEARER_TOKEN', 'dev-bearer-token'))
+    parser.add_argument('--collection', default=os.path.join(ROOT, 'postman_collection.json'))
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Pesos por tipo (por defecto {DEFAULT_MIX}).')
+    parser.add_argument('--rate', type=float, help='Peticiones por segundo en lazo abierto.')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Conexiones (en lazo cerrado, clientes concurrentes).')
+    parser.add_argument('--duration', type=float, default=30.0, help='Segundos medidos.')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Segundos de calentamiento sin medir.')
+    parser.add_argument('--seed', type=int, default=1000, help='Emails insertados antes de medir.')
+    parser.add_argument('--seed-random', type=int, default=None, help='Semilla de la mezcla aleatoria.')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--output', default='loadgen_results.csv')
+    parser.add_argument('--strategy', default='loadgen', help='Columna Strategy del CSV.')
+    parser.add_argument('--version', default=None, help='Columna Version del CSV (por defecto el commit).')
+    args = parser.parse_args(argv)
+    args.base_url = args.base_url.rstrip('/')
+    args.version = args.version or default_version()
+    args.run_id = f'{int(time.time())}{os.getpid()}'
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    templates = load_templates(args.collection, args.base_url, args.token)
+    kinds, weights = parse_mix(args.mix, templates)
+    mode = f'rate={args.rate:g}/s' if args.rate else f'concurrency={args.concurrency}'
+
+    started_at = datetime.now()
+    generator, elapsed = asyncio.run(run(args, templates, kinds, weights))
+    total = print_report(generator, elapsed, mode)
+    if args.output:
+        write_csv(args.output, args, total, elapsed, started_at, mode)
+        print(f'Resultados añadidos a {args.output}')
+    return 1 if not total.requests else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,12 +4,35 @@ set -e
 # Configurar puerto
 PORT=${PORT:-5000}
 
+# Workers gthread: la app dimensiona el pool, las esperas del feed de cambios y el load shedding con estos valores
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-3}"
+export GUNICORN_THREADS="${GUNICORN_THREADS:-8}"
+
+# Usar distutils de la stdlib: evita importar setuptools/pkg_resources (~200 ms) al arrancar
+export SETUPTOOLS_USE_DISTUTILS=stdlib
+
+# Las migraciones corren como paso de release (Procfile) o tarea única, no en cada arranque:
+# varios contenedores a la vez repetirían los backfills y el DDL en paralelo
+if [ "$RUN_MIGRATIONS_ON_START" = "true" ]; then
+    FLASK_APP=application:application flask blacklist migrate
+    export DB_CREATE_ALL_ON_STARTUP=false
+fi
+
+# Construir el snapshot de hashes compartido por los workers (opcional)
+if [ "$SNAPSHOT_ENABLED" = "true" ]; then
+    FLASK_APP=application:application flask blacklist build-snapshot || \
+        echo "Warning: snapshot build failed, lookups will fall back to the database"
+fi
+
 # Verificar si New Relic está disponible y configurado
 if command -v newrelic-admin >/dev/null 2>&1 && [ -n "$NEW_RELIC_LICENSE_KEY" ]; then
     echo "Starting application with New Relic monitoring..."
     exec newrelic-admin run-program gunicorn \
+        --preload \
         --bind "0.0.0.0:${PORT}" \
-        --workers 3 \
+        --workers "${WEB_CONCURRENCY}" \
+        --worker-class gthread \
+        --threads "${GUNICORN_THREADS}" \
         --timeout 60 \
         --access-logfile - \
         --error-logfile - \
@@ -17,8 +40,11 @@ if command -v newrelic-admin >/dev/null 2>&1 && [ -n "$NEW_RELIC_LICENSE_KEY" ];
 else
     echo "Warning: New Relic not available, starting without monitoring..."
     exec gunicorn \
+        --preload \
         --bind "0.0.0.0:${PORT}" \
-        --workers 3 \
+        --workers "${WEB_CONCURRENCY}" \
+        --worker-class gthread \
+        --threads "${GUNICORN_THREADS}" \
         --timeout 60 \
         --access-logfile - \
         --error-logfile - \
@@ -0,0 +1,107 @@
+"""
+Tests unitarios para el endpoint POST /blacklists/bulk
+Ejecutar con: pytest test_blacklist_bulk.py -v
+"""
+
+import pytest
+import json
+from app import create_app, db
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['BULK_INSERT_MAX_ITEMS'] = 1000
+    app.config['BULK_INSERT_CHUNK_SIZE'] = 3
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Blacklist(
+            email='existing@example.com',
+            app_uuid=APP_UUID,
+            blocked_reason='Spam detected',
+            client_ip='127.0.0.1'
+        ))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestBulkAddEndpoint:
+    """Suite de tests para POST /blacklists/bulk"""
+
+    def test_per_item_status(self, client, auth_headers, app):
+        """
+        TEST 1: Verificar estado created/duplicate/invalid por elemento
+        """
+        items = [
+            {'email': 'new1@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam'},
+            {'email': 'existing@example.com', 'app_uuid': APP_UUID},
+            {'email': 'not-an-email', 'app_uuid': APP_UUID},
+            {'email': 'new1@example.com', 'app_uuid': APP_UUID},
+            {'email': 'new2@example.com', 'app_uuid': APP_UUID},
+        ]
+
+        response = client.post('/blacklists/bulk', data=json.dumps(items), headers=auth_headers)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [r['status'] for r in data['results']] == ['created', 'duplicate', 'invalid', 'duplicate', 'created']
+        assert data['summary'] == {'created': 2, 'duplicate': 2, 'invalid': 1}
+        assert 'email' in data['results'][2]['details']
+
+        with app.app_context():
+            assert Blacklist.query.count() == 3
+            entry = Blacklist.query.filter_by(email='new1@example.com').first()
+            assert entry.blocked_reason == 'Spam'
+            assert entry.client_ip is not None
+
+    def test_inserted_emails_are_visible_to_lookups(self, client, auth_headers):
+        """
+        TEST 2: Verificar que los emails insertados se consultan por GET
+        """
+        items = [{'email': f'bulk{i}@example.com', 'app_uuid': APP_UUID} for i in range(10)]
+
+        client.post('/blacklists/bulk', data=json.dumps(items), headers=auth_headers)
+        response = client.get('/blacklists/bulk7@example.com', headers=auth_headers)
+
+        assert json.loads(response.data)['is_blacklisted'] is True
+
+    def test_invalid_body_returns_400(self, client, auth_headers):
+        """
+        TEST 3: Verificar que el cuerpo debe ser un arreglo no vacío
+        """
+        for body in ({}, [], 'text'):
+            response = client.post('/blacklists/bulk', data=json.dumps(body), headers=auth_headers)
+            assert response.status_code == 400
+
+    def test_without_authorization_returns_401(self, client):
+        """
+        TEST 4: Verificar que sin token retorna 401
+        """
+        response = client.post('/blacklists/bulk', json=[{'email': 'a@example.com', 'app_uuid': APP_UUID}])
+
+        assert response.status_code == 401
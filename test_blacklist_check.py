@@ -0,0 +1,106 @@
+"""
+Tests unitarios para el endpoint POST /blacklists/check
+Ejecutar con: pytest test_blacklist_check.py -v
+"""
+
+import pytest
+import json
+from app import create_app, db
+from app.models import Blacklist
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['BATCH_CHECK_MAX_EMAILS'] = 10
+    app.config['BATCH_CHECK_CHUNK_SIZE'] = 2
+
+    with app.app_context():
+        db.create_all()
+        for i in range(3):
+            db.session.add(Blacklist(
+                email=f'user{i}@example.com',
+                app_uuid='123e4567-e89b-12d3-a456-426614174000',
+                blocked_reason=f'Reason {i}',
+                client_ip='127.0.0.1'
+            ))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestBatchCheckEndpoint:
+    """Suite de tests para POST /blacklists/check"""
+
+    def test_results_follow_input_order(self, client, auth_headers):
+        """
+        TEST 1: Verificar resultados por email en el orden de entrada
+        """
+        emails = ['nobody@example.com', 'user2@example.com', 'user0@example.com', 'user1@example.com']
+
+        response = client.post('/blacklists/check', data=json.dumps({'emails': emails}), headers=auth_headers)
+
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert [r['email'] for r in results] == emails
+        assert [r['is_blacklisted'] for r in results] == [False, True, True, True]
+        assert results[0]['blocked_reason'] is None
+        assert results[1]['blocked_reason'] == 'Reason 2'
+
+    def test_emails_are_lowercased_and_deduplicated(self, client, auth_headers):
+        """
+        TEST 2: Verificar que se normalizan mayúsculas y se eliminan duplicados
+        """
+        emails = ['USER0@example.com', 'user0@example.com', 'other@example.com']
+
+        response = client.post('/blacklists/check', data=json.dumps({'emails': emails}), headers=auth_headers)
+
+        results = json.loads(response.data)['results']
+        assert [r['email'] for r in results] == ['user0@example.com', 'other@example.com']
+        assert results[0]['is_blacklisted'] is True
+
+    def test_too_many_emails_returns_400(self, client, auth_headers):
+        """
+        TEST 3: Verificar el límite de emails por solicitud
+        """
+        emails = [f'user{i}@example.com' for i in range(11)]
+
+        response = client.post('/blacklists/check', data=json.dumps({'emails': emails}), headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_invalid_payload_returns_400(self, client, auth_headers):
+        """
+        TEST 4: Verificar validación del cuerpo y del formato de email
+        """
+        for body in ({}, {'emails': []}, {'emails': 'user@example.com'}, {'emails': ['not-an-email']}):
+            response = client.post('/blacklists/check', data=json.dumps(body), headers=auth_headers)
+            assert response.status_code == 400
+            assert json.loads(response.data)['error'] == 'Bad Request'
+
+    def test_without_authorization_returns_401(self, client):
+        """
+        TEST 5: Verificar que sin token retorna 401
+        """
+        response = client.post('/blacklists/check', json={'emails': ['user0@example.com']})
+
+        assert response.status_code == 401
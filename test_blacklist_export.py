@@ -0,0 +1,136 @@
+"""
+Tests unitarios para el endpoint GET /blacklists (exportación)
+Ejecutar con: pytest test_blacklist_export.py -v
+"""
+
+import pytest
+import csv
+import io
+import json
+from app import create_app, db
+from app.models import Blacklist
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba con 25 registros"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['EXPORT_PAGE_SIZE'] = 10
+
+    with app.app_context():
+        db.create_all()
+        for i in range(25):
+            db.session.add(Blacklist(
+                email=f'user{i}@example.com',
+                app_uuid='123e4567-e89b-12d3-a456-426614174000',
+                blocked_reason='Spam' if i % 2 else None,
+                client_ip='127.0.0.1'
+            ))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {'Authorization': 'Bearer dev-bearer-token'}
+
+
+class TestExportEndpoint:
+    """Suite de tests para GET /blacklists"""
+
+    def test_ndjson_export_streams_all_rows(self, client, auth_headers):
+        """
+        TEST 1: Verificar que NDJSON contiene todas las filas ordenadas por id
+        """
+        response = client.get('/blacklists', headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert len(rows) == 25
+        assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+        assert set(rows[0]) == {'id', 'email', 'app_uuid', 'blocked_reason', 'client_ip', 'created_at'}
+        assert rows[0]['created_at'].endswith('Z')
+
+    def test_keyset_pagination(self, client, auth_headers):
+        """
+        TEST 2: Verificar paginación con after_id y limit
+        """
+        first = client.get('/blacklists?limit=12', headers=auth_headers)
+        first_rows = [json.loads(line) for line in first.data.decode().splitlines()]
+        assert len(first_rows) == 12
+
+        after_id = first_rows[-1]['id']
+        second = client.get(f'/blacklists?after_id={after_id}&limit=100', headers=auth_headers)
+        second_rows = [json.loads(line) for line in second.data.decode().splitlines()]
+        assert len(second_rows) == 13
+        assert second_rows[0]['id'] > after_id
+
+    def test_csv_export(self, client, auth_headers):
+        """
+        TEST 3: Verificar exportación CSV con encabezado
+        """
+        response = client.get('/blacklists?format=csv', headers=auth_headers)
+
+        assert response.mimetype == 'text/csv'
+        rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+        assert len(rows) == 25
+        assert rows[1]['blocked_reason'] == 'Spam'
+
+    def test_invalid_parameters_return_400(self, client, auth_headers):
+        """
+        TEST 4: Verificar validación de parámetros
+        """
+        for query in ('format=xml', 'after_id=abc', 'limit=-1'):
+            response = client.get(f'/blacklists?{query}', headers=auth_headers)
+            assert response.status_code == 400
+
+    def test_export_cli(self, app, tmp_path):
+        """
+        TEST 5: Verificar el comando flask blacklist export
+        """
+        dest = tmp_path / 'export.ndjson'
+
+        result = app.test_cli_runner().invoke(args=['blacklist', 'export', str(dest), '--after-id', '20'])
+
+        assert result.exit_code == 0, result.output
+        assert len(dest.read_text().splitlines()) == 5
+
+    def test_default_row_limit_with_next_link(self, app, client, auth_headers):
+        """
+        TEST 6: Verificar que cada respuesta se limita a EXPORT_MAX_ROWS y que Link rel="next" recorre el resto
+        """
+        app.config['EXPORT_MAX_ROWS'] = 10
+        ids = []
+        url = '/blacklists'
+        pages = 0
+        while url:
+            response = client.get(url, headers=auth_headers)
+            rows = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert len(rows) <= 10
+            ids.extend(row['id'] for row in rows)
+            pages += 1
+            link = response.headers.get('Link')
+            url = link[link.index('<') + 1:link.index('>')] if link else None
+            if url:
+                assert link.endswith('rel="next"')
+                assert f'after_id={rows[-1]["id"]}' in url
+
+        assert pages == 3
+        assert len(ids) == 25
+        assert ids == sorted(ids)
+        # Exactly one page left: no next link
+        last_page = client.get(f'/blacklists?after_id={ids[14]}', headers=auth_headers)
+        assert len(last_page.data.decode().splitlines()) == 10
+        assert 'Link' not in last_page.headers
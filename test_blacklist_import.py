@@ -0,0 +1,96 @@
+"""
+Tests unitarios para el comando flask blacklist import
+Ejecutar con: pytest test_blacklist_import.py -v
+"""
+
+import pytest
+import json
+from app import create_app, db
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba con una base SQLite en archivo"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "import.db"}'
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Blacklist(
+            email='existing@example.com',
+            app_uuid=APP_UUID,
+            client_ip='127.0.0.1'
+        ))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def runner(app):
+    """Runner de comandos CLI"""
+    return app.test_cli_runner()
+
+
+class TestImportCommand:
+    """Suite de tests para flask blacklist import"""
+
+    def test_import_csv(self, runner, app, tmp_path):
+        """
+        TEST 1: Importar CSV con filas válidas, duplicadas e inválidas
+        """
+        source = tmp_path / 'seed.csv'
+        source.write_text(
+            'email,app_uuid,blocked_reason\n'
+            f'a@example.com,{APP_UUID},Spam\n'
+            f'existing@example.com,{APP_UUID},\n'
+            f'not-an-email,{APP_UUID},\n'
+            f'b@example.com,{APP_UUID},\n'
+        )
+
+        result = runner.invoke(args=['blacklist', 'import', str(source), '--batch-size', '2'])
+
+        assert result.exit_code == 0, result.output
+        assert 'Imported 2 of 4 rows (1 duplicate, 1 invalid)' in result.output
+        with app.app_context():
+            assert Blacklist.query.count() == 3
+            assert Blacklist.query.filter_by(email='a@example.com').first().blocked_reason == 'Spam'
+
+    def test_import_ndjson(self, runner, app, tmp_path):
+        """
+        TEST 2: Importar NDJSON con client_ip propio
+        """
+        source = tmp_path / 'seed.ndjson'
+        source.write_text('\n'.join(json.dumps({
+            'email': f'user{i}@example.com', 'app_uuid': APP_UUID, 'client_ip': '10.0.0.1'
+        }) for i in range(5)) + '\n{broken\n')
+
+        result = runner.invoke(args=['blacklist', 'import', str(source)])
+
+        assert result.exit_code == 0, result.output
+        assert 'Imported 5 of 6 rows' in result.output
+        with app.app_context():
+            assert Blacklist.query.filter_by(email='user3@example.com').first().client_ip == '10.0.0.1'
+
+    def test_resume_from_offset(self, runner, app, tmp_path):
+        """
+        TEST 3: Reanudar un CSV desde un offset en bytes conserva el encabezado
+        """
+        header = 'email,app_uuid\n'
+        first = f'first@example.com,{APP_UUID}\n'
+        source = tmp_path / 'seed.csv'
+        source.write_text(header + first + f'second@example.com,{APP_UUID}\n')
+
+        offset = len(header) + len(first)
+        result = runner.invoke(args=['blacklist', 'import', str(source), '--offset', str(offset)])
+
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            assert Blacklist.query.filter_by(email='first@example.com').first() is None
+            assert Blacklist.query.filter_by(email='second@example.com').first() is not None
@@ -0,0 +1,161 @@
+"""
+Tests unitarios para el filtro Bloom delante de GET /blacklists/<email>
+Ejecutar con: pytest test_bloom_filter.py -v
+"""
+
+import pytest
+import json
+from app import create_app, db
+from app.bloom import BloomFilter, BlacklistBloomFilter
+from app.canonical import email_digest
+from app.models import Blacklist
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba con el filtro Bloom habilitado"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['BLOOM_FILTER_ENABLED'] = True
+    app.config['BLOOM_FILTER_CAPACITY'] = 1000
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Blacklist(
+            email='blacklisted@example.com',
+            app_uuid='123e4567-e89b-12d3-a456-426614174000',
+            blocked_reason='Spam detected',
+            client_ip='127.0.0.1'
+        ))
+        db.session.commit()
+        BlacklistBloomFilter.get_state(app).rebuild()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestBloomFilter:
+    """Suite de tests para la estructura BloomFilter"""
+
+    def test_added_keys_are_always_found(self):
+        """
+        TEST 1: Verificar que no hay falsos negativos
+        """
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f'user{i}@example.com' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        assert all(key in bloom for key in keys)
+        assert len(bloom) == 1000
+
+    def test_false_positive_rate_is_close_to_target(self):
+        """
+        TEST 2: Verificar que la tasa de falsos positivos respeta el objetivo
+        """
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'user{i}@example.com')
+
+        false_positives = sum(f'other{i}@example.com' in bloom for i in range(10000))
+        assert false_positives / 10000 < 0.03
+
+    def test_invalid_parameters_raise(self):
+        """
+        TEST 3: Verificar validación de parámetros
+        """
+        with pytest.raises(ValueError):
+            BloomFilter(capacity=0, error_rate=0.01)
+        with pytest.raises(ValueError):
+            BloomFilter(capacity=10, error_rate=1.5)
+
+
+class TestBloomFilterLookups:
+    """Tests de integración del filtro con el endpoint de consulta"""
+
+    def test_blacklisted_email_is_found(self, client, auth_headers):
+        """
+        TEST 4: Un email existente pasa el filtro y se confirma en la base de datos
+        """
+        response = client.get('/blacklists/blacklisted@example.com', headers=auth_headers)
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['is_blacklisted'] is True
+
+        stats = json.loads(client.get('/debug/bloom', headers=auth_headers).data)
+        assert stats['hits'] == 1
+
+    def test_definite_miss_skips_database(self, client, auth_headers, app):
+        """
+        TEST 5: Un email ausente se responde sin consultar la base de datos
+        """
+        with app.app_context():
+            db.drop_all()  # Cualquier consulta fallaría
+
+        response = client.get('/blacklists/notfound@example.com', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['is_blacklisted'] is False
+        assert data['blocked_reason'] is None
+
+        with app.app_context():
+            db.create_all()
+
+    def test_post_updates_filter(self, client, auth_headers):
+        """
+        TEST 6: Un email agregado por POST es visible inmediatamente
+        """
+        post_data = {
+            'email': 'new@example.com',
+            'app_uuid': '123e4567-e89b-12d3-a456-426614174000',
+            'blocked_reason': 'Integration test'
+        }
+        post_response = client.post('/blacklists', data=json.dumps(post_data), headers=auth_headers)
+        assert post_response.status_code == 201
+
+        response = client.get('/blacklists/new@example.com', headers=auth_headers)
+        assert json.loads(response.data)['is_blacklisted'] is True
+
+    def test_stats_endpoint_requires_token(self, client):
+        """
+        TEST 7: El endpoint de estadísticas requiere autenticación
+        """
+        response = client.get('/debug/bloom')
+        assert response.status_code == 401
+
+    def test_other_workers_inserts_are_polled(self, client, auth_headers, app):
+        """
+        TEST 8: Filas insertadas por otro worker o por el import se agregan al filtro al refrescar
+        """
+        with app.app_context():
+            db.session.execute(Blacklist.__table__.insert().values(
+                email='elsewhere@example.com', email_canonical='elsewhere@example.com',
+                email_digest=email_digest('elsewhere@example.com'), app_uuid='123e4567-e89b-12d3-a456-426614174000',
+                client_ip='127.0.0.1', created_at=db.func.current_timestamp()
+            ))
+            db.session.commit()
+        app.config['BLOOM_FILTER_REFRESH_INTERVAL'] = 0
+
+        response = client.get('/blacklists/elsewhere@example.com', headers=auth_headers)
+
+        assert json.loads(response.data)['is_blacklisted'] is True
+        stats = json.loads(client.get('/debug/bloom', headers=auth_headers).data)
+        assert stats['last_id'] == 2
+        assert stats['elements'] == 2
@@ -0,0 +1,211 @@
+"""
+Tests unitarios para el feed de cambios GET /blacklists/changes
+Ejecutar con: pytest test_changes.py -v
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.changes import ChangeNotifier
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba (SQLite en archivo: el notificador usa su propia conexión)"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'changes.db'}"
+    app.config['CHANGES_MAX_WAIT'] = 30
+    app.config['CHANGES_MAX_WAITERS'] = 8
+    app.config['CHANGES_POLL_INTERVAL'] = 0.05
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+def add_email(client, auth_headers, email):
+    response = client.post('/blacklists', headers=auth_headers, json={
+        'email': email,
+        'app_uuid': APP_UUID
+    })
+    assert response.status_code == 201
+
+
+def insert_from_other_worker(app, email):
+    """Alta que no pasa por este worker (sin notificación local)"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(Blacklist.__table__.insert().values(
+                email=email, email_canonical=email, app_uuid=APP_UUID,
+                client_ip='127.0.0.1', created_at=datetime.utcnow()
+            ))
+
+
+def long_poll(app, auth_headers, since, wait, results):
+    start = time.monotonic()
+    response = app.test_client().get(f'/blacklists/changes?since={since}&wait={wait}', headers=auth_headers)
+    results.append((time.monotonic() - start, response))
+
+
+class TestChanges:
+    """Suite de tests para el feed de cambios con long polling"""
+
+    def test_pages_in_id_order(self, client, auth_headers):
+        """
+        TEST 1: Verificar páginas acotadas en orden de id con cursor y has_more
+        """
+        for email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            add_email(client, auth_headers, email)
+
+        first = client.get('/blacklists/changes?limit=2', headers=auth_headers).json
+        assert [change['email'] for change in first['changes']] == ['a@example.com', 'b@example.com']
+        assert first['changes'][0]['op'] == 'insert'
+        assert first['has_more'] is True
+        assert first['cursor'] == first['changes'][-1]['id']
+
+        second = client.get(f"/blacklists/changes?since={first['cursor']}&limit=2", headers=auth_headers).json
+        assert [change['email'] for change in second['changes']] == ['c@example.com']
+        assert second['has_more'] is False
+
+        empty = client.get(f"/blacklists/changes?since={second['cursor']}", headers=auth_headers).json
+        assert empty == {'changes': [], 'cursor': second['cursor'], 'has_more': False}
+
+    def test_invalid_parameters_and_auth(self, client, auth_headers):
+        """
+        TEST 2: Verificar 400 con parámetros inválidos y 401 sin token
+        """
+        for query in ('since=-1', 'since=abc', 'limit=0', 'wait=-5', 'wait=inf'):
+            response = client.get(f'/blacklists/changes?{query}', headers=auth_headers)
+            assert response.status_code == 400, query
+
+        assert client.get('/blacklists/changes').status_code == 401
+
+    def test_local_insert_wakes_waiter(self, app, client, auth_headers):
+        """
+        TEST 3: Verificar que un alta en el mismo worker despierta la espera sin esperar al sondeo
+        """
+        app.config['CHANGES_POLL_INTERVAL'] = 60
+        results = []
+        waiter = threading.Thread(target=long_poll, args=(app, auth_headers, 0, 10, results))
+        waiter.start()
+        time.sleep(0.2)
+
+        add_email(client, auth_headers, 'late@example.com')
+        waiter.join(timeout=10)
+
+        elapsed, response = results[0]
+        assert elapsed < 5
+        assert [change['email'] for change in response.json['changes']] == ['late@example.com']
+
+    def test_one_poll_for_all_waiters(self, app, auth_headers):
+        """
+        TEST 4: Verificar que un solo sondeo por worker despierta a todos los que esperan
+        """
+        results = []
+        waiters = [threading.Thread(target=long_poll, args=(app, auth_headers, 0, 10, results)) for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        time.sleep(0.5)
+
+        insert_from_other_worker(app, 'remote@example.com')
+        for waiter in waiters:
+            waiter.join(timeout=10)
+
+        assert len(results) == 4
+        for elapsed, response in results:
+            assert elapsed < 5
+            assert [change['email'] for change in response.json['changes']] == ['remote@example.com']
+        # ~0.5 s at 0.05 s per poll: far fewer than one poll per waiter per interval
+        state = ChangeNotifier.get_state(app)
+        assert state.polls < 4 * 0.5 / 0.05
+        assert state.waiters == 0
+
+    def test_timeout_and_waiter_cap(self, app, client, auth_headers):
+        """
+        TEST 5: Verificar que la espera termina vacía al vencer y que el límite de esperas responde al instante
+        """
+        start = time.monotonic()
+        response = client.get('/blacklists/changes?wait=0.3', headers=auth_headers)
+        assert time.monotonic() - start >= 0.3
+        assert response.json['changes'] == []
+
+        app.config['CHANGES_MAX_WAITERS'] = 0
+        start = time.monotonic()
+        response = client.get('/blacklists/changes?wait=5', headers=auth_headers)
+        assert time.monotonic() - start < 1
+        assert response.json['changes'] == []
+
+    def test_insert_locks_version_before_allocating_id(self, app, client, auth_headers):
+        """
+        TEST 6: Verificar que el alta bloquea la fila de versión antes de insertar (ids confirmados en orden)
+        """
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement.split()[0:3])
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            add_email(client, auth_headers, 'ordered@example.com')
+            client.post('/blacklists/bulk', headers=auth_headers, json=[
+                {'email': 'bulk@example.com', 'app_uuid': APP_UUID}
+            ])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        writes = [' '.join(words) for words in executed if words[0] in ('UPDATE', 'INSERT')]
+        assert writes[0].startswith('UPDATE dataset_versions')
+        assert writes[1].startswith('INSERT INTO blacklists')
+        bulk = writes[2:]
+        assert bulk[0].startswith('UPDATE dataset_versions')
+        assert any(write.startswith('INSERT') for write in bulk[1:])
+
+    def test_long_polling_sized_from_gunicorn_threads(self):
+        """
+        TEST 7: Verificar que sin hilos de gunicorn no hay long polling y que las esperas se limitan a la mitad de los hilos
+        """
+        for threads, max_wait, max_waiters in ((1, 0, 0), (8, 30, 4)):
+            app = create_app()
+            app.config.pop('CHANGES_MAX_WAIT')
+            app.config.pop('CHANGES_MAX_WAITERS')
+            app.config['GUNICORN_THREADS'] = threads
+            ChangeNotifier().init_app(app)
+            assert app.config['CHANGES_MAX_WAIT'] == max_wait
+            assert app.config['CHANGES_MAX_WAITERS'] == max_waiters
+            assert (ChangeNotifier.get_state(app) is None) == (threads == 1)
+
+    def test_changes_query_timed_as_db_operation(self, app, client, auth_headers):
+        """
+        TEST 8: Verificar que la consulta del feed se mide como operación de base de datos (fase db de Server-Timing)
+        """
+        app.config['SERVER_TIMING_TOKEN'] = 'debug-secret'
+        add_email(client, auth_headers, 'timed@example.com')
+        response = client.get('/blacklists/changes', headers=dict(auth_headers, **{'X-Debug-Token': 'debug-secret'}))
+        assert response.status_code == 200
+        assert 'db;dur=' in response.headers['Server-Timing']
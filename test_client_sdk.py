@@ -0,0 +1,178 @@
+"""
+Tests unitarios para el cliente Python (blacklist_client) contra la aplicación servida localmente
+Ejecutar con: pytest test_client_sdk.py -v
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+from app import create_app, db
+from blacklist_client import (AsyncBlacklistClient, BlacklistClient, BlacklistClientError, LookupResult,
+                              ResultCache)
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+TOKEN = 'dev-bearer-token'
+
+
+class RecordingMiddleware:
+    """Registra las peticiones recibidas y permite retrasarlas o simular un servidor sin /check"""
+
+    def __init__(self, app):
+        self.app = app
+        self.calls = []
+        self.delays = {}
+        self.without_batch = False
+
+    def __call__(self, environ, start_response):
+        path = environ['PATH_INFO']
+        self.calls.append((environ['REQUEST_METHOD'], path))
+        for fragment, seconds in self.delays.items():
+            if fragment in path:
+                time.sleep(seconds)
+        if self.without_batch and path == '/blacklists/check':
+            start_response('405 METHOD NOT ALLOWED', [('Content-Type', 'application/json'), ('Content-Length', '2')])
+            return [b'{}']
+        return self.app(environ, start_response)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Servidor HTTP real con la aplicación sobre un SQLite temporal"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'client.db'}"
+    with app.app_context():
+        db.create_all()
+
+    recorder = RecordingMiddleware(app)
+    httpd = make_server('127.0.0.1', 0, recorder, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    recorder.url = f'http://127.0.0.1:{httpd.server_port}'
+    yield recorder
+    httpd.shutdown()
+
+
+class TestBlacklistClient:
+    """Suite de tests para el cliente síncrono y asyncio"""
+
+    def test_result_cache_ttl_and_lru(self):
+        """
+        TEST 1: Verificar TTL distinto para aciertos y fallos y expulsión LRU
+        """
+        now = [0.0]
+        cache = ResultCache(max_size=2, ttl=60, negative_ttl=5, clock=lambda: now[0])
+        cache.put('hit@example.com', LookupResult('hit@example.com', True, 'Spam'))
+        cache.put('miss@example.com', LookupResult('miss@example.com', False, None))
+
+        now[0] = 10
+        assert cache.get('hit@example.com').is_blacklisted is True
+        assert cache.get('miss@example.com') is None
+
+        cache.put('a@example.com', LookupResult('a@example.com', False, None))
+        cache.get('hit@example.com')
+        cache.put('b@example.com', LookupResult('b@example.com', False, None))
+        assert cache.get('a@example.com') is None
+        assert cache.get('hit@example.com') is not None
+        assert len(cache) == 2
+
+    def test_sync_check_add_and_cache(self, server):
+        """
+        TEST 2: Verificar consultas, alta y que el alta queda en caché sin otra petición
+        """
+        with BlacklistClient(server.url, TOKEN) as client:
+            assert client.check('New@Example.com') == LookupResult('new@example.com', False, None)
+            client.add('new@example.com', APP_UUID, 'Spam')
+
+            calls = len(server.calls)
+            assert client.check('new@example.com') == LookupResult('new@example.com', True, 'Spam')
+            assert len(server.calls) == calls
+
+            with pytest.raises(BlacklistClientError) as error:
+                client.add('new@example.com', APP_UUID)
+            assert error.value.status == 409
+            with pytest.raises(ValueError):
+                client.check('not-an-email')
+
+        with BlacklistClient(server.url, 'wrong-token') as client:
+            with pytest.raises(BlacklistClientError) as error:
+                client.check('user@example.com')
+            assert error.value.status == 401
+
+    def test_sync_coalescing_and_batching(self, server):
+        """
+        TEST 3: Verificar que hilos concurrentes comparten la consulta del mismo email y que los que esperan van en un lote
+        """
+        server.delays['slow@'] = 0.3
+        client = BlacklistClient(server.url, TOKEN, max_in_flight=1)
+        results = {}
+
+        def check(email):
+            results[email] = client.check(email)
+
+        first = threading.Thread(target=check, args=('slow@example.com',))
+        first.start()
+        time.sleep(0.1)
+        threads = [threading.Thread(target=check, args=(email,))
+                   for email in ['slow@example.com'] * 3 + [f'user{i}@example.com' for i in range(10)]]
+        for thread in threads:
+            thread.start()
+        for thread in [first] + threads:
+            thread.join(timeout=10)
+
+        assert len(results) == 11
+        assert server.calls == [('GET', '/blacklists/slow@example.com'), ('POST', '/blacklists/check')]
+        assert client.stats()['coalesced'] == 3
+        assert client.stats()['batches'] == 1
+        client.close()
+
+    def test_async_gather_batches_and_coalesces(self, server):
+        """
+        TEST 4: Verificar que asyncio.gather sale en un solo lote y los duplicados se fusionan
+        """
+        async def scenario():
+            async with AsyncBlacklistClient(server.url, TOKEN) as client:
+                await client.add('async@example.com', APP_UUID, 'Fraude')
+                client.cache.clear()
+                emails = ['async@example.com', 'Async@Example.com'] + [f'user{i}@example.com' for i in range(20)]
+                results = await asyncio.gather(*(client.check(email) for email in emails))
+                cached = await client.check('user0@example.com')
+                return client.stats(), results, cached
+
+        stats, results, cached = asyncio.run(scenario())
+
+        assert results[0] == LookupResult('async@example.com', True, 'Fraude')
+        assert results[1] == results[0]
+        assert all(result.is_blacklisted is False for result in results[2:])
+        assert cached.is_blacklisted is False
+        assert server.calls == [('POST', '/blacklists'), ('POST', '/blacklists/check')]
+        assert stats['coalesced'] == 1
+        assert stats['cache']['hits'] == 1
+
+    def test_fallback_without_batch_endpoint(self, server):
+        """
+        TEST 5: Verificar que sin POST /blacklists/check se consulta email por email
+        """
+        server.without_batch = True
+        emails = ['a@example.com', 'b@example.com', 'c@example.com']
+
+        with BlacklistClient(server.url, TOKEN) as client:
+            results = client.check_many(emails)
+            assert not client.batch_supported
+        assert [result.email for result in results.values()] == emails
+
+        async def scenario():
+            async with AsyncBlacklistClient(server.url, TOKEN, cache_size=0) as client:
+                results = await client.check_many(emails)
+                return client.batch_supported, results
+
+        batch_supported, results = asyncio.run(scenario())
+        assert not batch_supported
+        assert sorted(results) == emails
+        assert server.calls.count(('POST', '/blacklists/check')) == 2
+        assert server.calls.count(('GET', '/blacklists/b@example.com')) == 2
@@ -0,0 +1,97 @@
+"""
+Tests unitarios para el pool de conexiones instrumentado
+Ejecutar con: pytest test_db_pool.py -v
+"""
+
+import pytest
+import json
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import create_app, db
+from app.db_pool import InstrumentedQueuePool, get_pool_state
+from app.telemetry import MemoryBackend, telemetry
+
+
+@pytest.fixture
+def memory_backend():
+    """Backend en memoria para el agregador global"""
+    backend = MemoryBackend()
+    telemetry.configure(backend, flush_interval=0)
+    yield backend
+    telemetry.configure(MemoryBackend(), flush_interval=0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine con un pool de una sola conexión"""
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "pool.db"}',
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    yield engine
+    engine.dispose()
+
+
+class TestInstrumentedPool:
+    """Suite de tests para InstrumentedQueuePool"""
+
+    def test_checkouts_are_recorded(self, engine, memory_backend):
+        """
+        TEST 1: Verificar métricas de espera y conexiones en uso
+        """
+        for _ in range(3):
+            with engine.connect():
+                pass
+        telemetry.flush()
+
+        state = get_pool_state(engine)
+        assert state['pool_class'] == 'InstrumentedQueuePool'
+        assert state['checkouts'] == 3
+        assert state['checked_out'] == 0
+        assert memory_backend.metrics['Custom/Database/Pool/CheckoutWaitTime'].count == 3
+        assert memory_backend.metrics['Custom/Database/Pool/InUse'].max == 1
+
+    def test_timeouts_are_recorded(self, engine, memory_backend):
+        """
+        TEST 2: Verificar que un pool agotado registra el timeout
+        """
+        held = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        held.close()
+        telemetry.flush()
+
+        assert get_pool_state(engine)['timeouts'] == 1
+        assert memory_backend.metrics['Custom/Database/Pool/Timeout'].total == 1
+
+
+class TestPoolEndpoint:
+    """Tests del endpoint de diagnóstico"""
+
+    def test_pool_endpoint(self):
+        """
+        TEST 3: Verificar GET /debug/pool
+        """
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        client = app.test_client()
+
+        response = client.get('/debug/pool', headers={'Authorization': 'Bearer dev-bearer-token'})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['pool_class'] == 'StaticPool'
+        assert 'pid' in data
+
+    def test_sqlite_driver_url_takes_no_pool_sizing(self):
+        """
+        TEST 4: Verificar que una URL sqlite+pysqlite no recibe las opciones de tamaño del pool
+        """
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite+pysqlite:///:memory:'
+        client = app.test_client()
+
+        response = client.get('/debug/pool', headers={'Authorization': 'Bearer dev-bearer-token'})
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['pool_class'] != 'InstrumentedQueuePool'
@@ -0,0 +1,278 @@
+"""
+Tests unitarios para la columna email_canonical
+Ejecutar con: pytest test_email_canonical.py -v
+"""
+
+import pytest
+import json
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.canonical import EmailCanonicalizer, parse_canonical_rules
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestCanonicalizer:
+    """Suite de tests para EmailCanonicalizer"""
+
+    def test_case_folding(self):
+        """
+        TEST 1: Verificar que mayúsculas y espacios no cambian la clave
+        """
+        canonicalize = EmailCanonicalizer()
+        assert canonicalize(' John.Doe@Example.COM ') == 'john.doe@example.com'
+        assert canonicalize('Straße@example.com') == canonicalize('STRASSE@example.com')
+
+    def test_idn_domain(self):
+        """
+        TEST 2: Verificar que los dominios IDN se guardan en punycode
+        """
+        canonicalize = EmailCanonicalizer()
+        assert canonicalize('user@Bücher.example') == 'user@xn--bcher-kva.example'
+        assert canonicalize('user@xn--bcher-kva.example') == 'user@xn--bcher-kva.example'
+
+    def test_gmail_rules(self):
+        """
+        TEST 3: Verificar puntos, +tag y alias googlemail.com de Gmail
+        """
+        canonicalize = EmailCanonicalizer()
+        assert canonicalize('John.Doe+newsletter@gmail.com') == 'johndoe@gmail.com'
+        assert canonicalize('j.o.h.n.doe@googlemail.com') == 'johndoe@gmail.com'
+        # Otros proveedores conservan puntos y etiquetas
+        assert canonicalize('john.doe+tag@example.com') == 'john.doe+tag@example.com'
+
+    def test_custom_rules(self):
+        """
+        TEST 4: Verificar reglas configurables por proveedor
+        """
+        rules = parse_canonical_rules('outlook.com=plus;hotmail.com=plus,alias:outlook.com;yahoo.com=tag:-')
+        canonicalize = EmailCanonicalizer(rules)
+        assert canonicalize('Ana.Lopez+x@hotmail.com') == 'ana.lopez@outlook.com'
+        assert canonicalize('ana-shopping@yahoo.com') == 'ana@yahoo.com'
+        assert canonicalize('john.doe+x@gmail.com') == 'john.doe+x@gmail.com'
+
+
+class TestCanonicalLookups:
+    """Tests de consultas a través de email_canonical"""
+
+    def test_mixed_case_insert_is_found(self, client, auth_headers):
+        """
+        TEST 5: Un email insertado con mayúsculas se encuentra en minúsculas
+        """
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'Mixed.Case@Example.com',
+            'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
+
+        response = client.get('/blacklists/mixed.case@example.com', headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['is_blacklisted'] is True
+        assert data['email'] == 'Mixed.Case@Example.com'
+
+    def test_gmail_alias_is_found(self, client, auth_headers):
+        """
+        TEST 6: Las variantes de una cuenta Gmail se encuentran por igual
+        """
+        client.post('/blacklists', headers=auth_headers, json={
+            'email': 'john.doe@gmail.com',
+            'app_uuid': APP_UUID,
+            'blocked_reason': 'Spam'
+        })
+
+        response = client.get('/blacklists/JohnDoe+promo@googlemail.com', headers=auth_headers)
+        assert json.loads(response.data)['is_blacklisted'] is True
+
+        response = client.post('/blacklists/check', headers=auth_headers, json={
+            'emails': ['J.O.H.N.D.O.E@gmail.com', 'other@gmail.com']
+        })
+        results = json.loads(response.data)['results']
+        assert results[0] == {'email': 'j.o.h.n.d.o.e@gmail.com', 'is_blacklisted': True, 'blocked_reason': 'Spam'}
+        assert results[1]['is_blacklisted'] is False
+
+    def test_other_spelling_is_a_duplicate(self, client, auth_headers):
+        """
+        TEST 7: Verificar que otra forma de escribir un email ya bloqueado es un duplicado (409 y bulk)
+        """
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'John.Doe@Gmail.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam'
+        })
+        assert response.status_code == 201
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'johndoe@gmail.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Otro'
+        })
+        assert response.status_code == 409
+
+        response = client.post('/blacklists/bulk', headers=auth_headers, json=[
+            {'email': 'a@x.com', 'app_uuid': APP_UUID},
+            {'email': 'A@x.com', 'app_uuid': APP_UUID},
+            {'email': 'j.ohndoe+x@gmail.com', 'app_uuid': APP_UUID},
+        ])
+        assert [item['status'] for item in json.loads(response.data)['results']] == \
+            ['created', 'duplicate', 'duplicate']
+        assert Blacklist.query.filter_by(email_canonical='johndoe@gmail.com').count() == 1
+
+    def test_canonical_is_stored_on_insert(self, app):
+        """
+        TEST 8: Verificar que el ORM rellena email_canonical al insertar
+        """
+        db.session.add(Blacklist(email='Someone+x@GMAIL.com', app_uuid=APP_UUID, client_ip='127.0.0.1'))
+        db.session.commit()
+
+        entry = Blacklist.query.filter_by(email='Someone+x@GMAIL.com').first()
+        assert entry.email_canonical == 'someone@gmail.com'
+
+
+class TestCanonicalMigration:
+    """Tests del comando flask blacklist migrate"""
+
+    def test_migrate_backfills_legacy_rows(self, tmp_path):
+        """
+        TEST 9: Verificar que migrate añade y rellena la columna por lotes
+        """
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "legacy.db"}'
+
+        with app.app_context():
+            # Esquema anterior, sin email_canonical
+            db.session.execute(text(
+                'CREATE TABLE blacklists (id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL UNIQUE, '
+                'app_uuid VARCHAR(36) NOT NULL, blocked_reason VARCHAR(255), '
+                'client_ip VARCHAR(45) NOT NULL, created_at DATETIME NOT NULL)'
+            ))
+            for email in ('Old.User@Example.com', 'a.b+c@gmail.com', 'x@Bücher.example'):
+                db.session.execute(text(
+                    "INSERT INTO blacklists (email, app_uuid, client_ip, created_at) "
+                    "VALUES (:email, :app_uuid, '127.0.0.1', CURRENT_TIMESTAMP)"
+                ), {'email': email, 'app_uuid': APP_UUID})
+            db.session.commit()
+
+            result = app.test_cli_runner().invoke(args=['blacklist', 'migrate', '--batch-size', '2'])
+            assert result.exit_code == 0, result.output
+            assert 'email_canonical: 3 rows' in result.output
+
+            rows = db.session.execute(text('SELECT email_canonical FROM blacklists ORDER BY id')).fetchall()
+            assert [row[0] for row in rows] == ['old.user@example.com', 'ab@gmail.com', 'x@xn--bcher-kva.example']
+            indexes = {index['name'] for index in inspect(db.engine).get_indexes('blacklists')}
+            assert 'ux_blacklists_email_digest_canonical' in indexes
+            assert 'ix_blacklists_email_digest' not in indexes
+
+            # Idempotente: una segunda ejecución no toca nada
+            result = app.test_cli_runner().invoke(args=['blacklist', 'migrate'])
+            assert 'email_canonical: 0 rows' in result.output
+            db.session.remove()
+
+    def test_migrate_dedupes_mailboxes_before_unique_index(self, tmp_path):
+        """
+        TEST 10: Verificar que migrate elimina duplicados por email canónico antes del índice único
+        """
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "dupes.db"}'
+
+        with app.app_context():
+            db.session.execute(text(
+                'CREATE TABLE blacklists (id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL UNIQUE, '
+                'app_uuid VARCHAR(36) NOT NULL, blocked_reason VARCHAR(255), '
+                'client_ip VARCHAR(45) NOT NULL, created_at DATETIME NOT NULL)'
+            ))
+            for email, reason in (('John.Doe@gmail.com', 'Primero'), ('other@example.com', None),
+                                  ('johndoe+x@gmail.com', 'Segundo'), ('OTHER@example.com', None)):
+                db.session.execute(text(
+                    "INSERT INTO blacklists (email, app_uuid, blocked_reason, client_ip, created_at) "
+                    "VALUES (:email, :app_uuid, :reason, '127.0.0.1', CURRENT_TIMESTAMP)"
+                ), {'email': email, 'app_uuid': APP_UUID, 'reason': reason})
+            db.session.commit()
+
+            result = app.test_cli_runner().invoke(args=['blacklist', 'migrate'])
+            assert result.exit_code == 0, result.output
+            assert 'duplicates_removed: 2 rows' in result.output
+
+            rows = db.session.execute(text('SELECT email, blocked_reason FROM blacklists ORDER BY id')).fetchall()
+            assert [tuple(row) for row in rows] == [('John.Doe@gmail.com', 'Primero'), ('other@example.com', None)]
+            db.session.remove()
+
+    def test_migrate_skips_dedupe_with_valid_unique_index(self, tmp_path, monkeypatch):
+        """
+        TEST 11: Verificar que con el índice único ya creado migrate no vuelve a recorrer la tabla buscando duplicados
+        """
+        import app.migrations as migrations
+
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "migrated.db"}'
+
+        with app.app_context():
+            assert app.test_cli_runner().invoke(args=['blacklist', 'migrate']).exit_code == 0
+            assert migrations.index_is_valid(migrations.UNIQUE_MAILBOX_INDEX)
+
+            def fail():
+                raise AssertionError('dedupe must not run')
+            monkeypatch.setattr(migrations, 'dedupe_email_canonical', fail)
+
+            result = app.test_cli_runner().invoke(args=['blacklist', 'migrate'])
+            assert result.exit_code == 0, result.output
+            assert 'duplicates_removed: 0 rows' in result.output
+            db.session.remove()
+
+    def test_recompute_keeps_unique_index_and_merges_mailboxes(self, tmp_path, monkeypatch):
+        """
+        TEST 12: Verificar que --recompute aplica reglas nuevas sin quitar el índice único y fusiona buzones
+        """
+        import app.migrations as migrations
+
+        app = create_app()
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "recompute.db"}'
+        app.config['EMAIL_CANONICAL_RULES'] = 'gmail.com=dots,plus'
+
+        with app.app_context():
+            assert app.test_cli_runner().invoke(args=['blacklist', 'migrate']).exit_code == 0
+            for email in ('jane+a@outlook.com', 'jane+b@outlook.com', 'jane@outlook.com', 'bob@outlook.com'):
+                db.session.add(Blacklist(email=email, app_uuid=APP_UUID, client_ip='127.0.0.1'))
+            db.session.commit()
+
+            dropped = []
+            monkeypatch.setattr(migrations, 'drop_index',
+                                lambda name: dropped.append(name) or False)
+            app.config['EMAIL_CANONICAL_RULES'] = 'gmail.com=dots,plus;outlook.com=plus'
+            result = app.test_cli_runner().invoke(args=['blacklist', 'migrate', '--recompute', '--batch-size', '2'])
+            assert result.exit_code == 0, result.output
+            assert 'duplicates_removed: 2 rows' in result.output
+            assert migrations.UNIQUE_MAILBOX_INDEX not in dropped
+
+            rows = db.session.execute(text('SELECT email, email_canonical FROM blacklists ORDER BY id')).fetchall()
+            assert [tuple(row) for row in rows] == [('jane+a@outlook.com', 'jane@outlook.com'),
+                                                     ('bob@outlook.com', 'bob@outlook.com')]
+            response = app.test_client().post('/blacklists', headers={'Authorization': 'Bearer dev-bearer-token'},
+                                              json={'email': 'jane+c@outlook.com', 'app_uuid': APP_UUID})
+            assert response.status_code == 409
+            db.session.remove()
@@ -0,0 +1,98 @@
+"""
+Tests unitarios para la columna email_digest y las consultas por hash
+Ejecutar con: pytest test_email_digest.py -v
+"""
+
+import pytest
+import json
+from sqlalchemy import text
+from app import create_app, db
+from app.canonical import email_digest
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestEmailDigest:
+    """Suite de tests para email_digest"""
+
+    def test_digest_fits_bigint(self):
+        """
+        TEST 1: Verificar que el digest es un entero con signo de 64 bits estable
+        """
+        digest = email_digest('user@example.com')
+        assert -2 ** 63 <= digest < 2 ** 63
+        assert digest == email_digest('user@example.com')
+        assert digest != email_digest('other@example.com')
+
+    def test_digest_is_stored_on_insert(self, client, auth_headers):
+        """
+        TEST 2: Verificar que POST /blacklists guarda el digest del email canónico
+        """
+        client.post('/blacklists', headers=auth_headers, json={
+            'email': 'Digest.User@Example.com',
+            'app_uuid': APP_UUID
+        })
+
+        entry = Blacklist.query.filter_by(email='Digest.User@Example.com').first()
+        assert entry.email_digest == email_digest('digest.user@example.com')
+
+    def test_digest_collision_is_confirmed(self, client, auth_headers):
+        """
+        TEST 3: Una fila con el mismo digest pero otro email no es un acierto
+        """
+        db.session.execute(Blacklist.__table__.insert().values(
+            email='collision@example.com', email_canonical='collision@example.com',
+            email_digest=email_digest('victim@example.com'), app_uuid=APP_UUID,
+            client_ip='127.0.0.1', created_at=db.func.current_timestamp()
+        ))
+        db.session.commit()
+
+        response = client.get('/blacklists/victim@example.com', headers=auth_headers)
+        assert json.loads(response.data)['is_blacklisted'] is False
+
+        response = client.post('/blacklists/check', headers=auth_headers, json={
+            'emails': ['victim@example.com']
+        })
+        assert json.loads(response.data)['results'][0]['is_blacklisted'] is False
+
+    def test_lookup_uses_digest_index(self, app):
+        """
+        TEST 4: Verificar que la consulta busca en el índice del digest
+        """
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT id FROM blacklists '
+            'WHERE email_digest = :digest AND email_canonical = :canonical'
+        ), {'digest': 1, 'canonical': 'a@example.com'}).fetchall()
+
+        assert 'ux_blacklists_email_digest_canonical' in ' '.join(str(row[-1]) for row in plan)
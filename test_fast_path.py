@@ -0,0 +1,147 @@
+"""
+Tests unitarios para el validador precompilado y el encoder JSON de respuestas
+Ejecutar con: pytest test_fast_path.py -v
+"""
+
+import pytest
+import json
+import uuid
+from datetime import datetime
+from marshmallow import ValidationError
+from app import create_app, db
+from app.json_response import jsonify
+from app.models import Blacklist
+from app.schemas import (BlacklistSchema, BlacklistResponseSchema, BlacklistValidator,
+                         BlacklistResponseSerializer)
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+PAYLOADS = [
+    {'email': 'user@example.com', 'app_uuid': APP_UUID},
+    {'email': 'user@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam'},
+    {'email': 'user@example.com', 'app_uuid': APP_UUID.upper(), 'blocked_reason': ''},
+    {'email': 'invalid-email', 'app_uuid': APP_UUID},
+    {'email': 'a' * 250 + '@example.com', 'app_uuid': APP_UUID},
+    {'email': 'x' * 300, 'app_uuid': APP_UUID},
+    {'email': 123, 'app_uuid': APP_UUID},
+    {'email': None, 'app_uuid': APP_UUID},
+    {'email': 'user@example.com', 'app_uuid': 'not-a-uuid'},
+    {'email': 'user@example.com', 'app_uuid': 'z' * 36},
+    {'email': 'user@example.com', 'app_uuid': '{' + uuid.uuid4().hex + '}-'},
+    {'email': 'user@example.com', 'app_uuid': ['list']},
+    {'email': 'user@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'r' * 256},
+    {'email': 'user@example.com', 'app_uuid': APP_UUID, 'blocked_reason': None},
+    {'email': 'user@example.com', 'app_uuid': APP_UUID, 'extra': 1, 'other': 2},
+    {'app_uuid': APP_UUID},
+    {},
+    [],
+    'string',
+    None,
+]
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+def load(schema, payload):
+    try:
+        return 'ok', schema.load(payload)
+    except ValidationError as e:
+        return 'error', e.messages
+
+
+class TestFastPath:
+    """Suite de tests para el camino rápido de validación y serialización"""
+
+    @pytest.mark.parametrize('payload', PAYLOADS)
+    def test_validator_matches_schema(self, payload):
+        """
+        TEST 1: Verificar que el validador da el mismo resultado y errores que BlacklistSchema
+        """
+        assert load(BlacklistValidator(), payload) == load(BlacklistSchema(), payload)
+
+    def test_uuid_check_is_registered(self, client, auth_headers):
+        """
+        TEST 2: Verificar que un app_uuid de 36 caracteres no válido devuelve 400
+        """
+        for fast_path in (True, False):
+            client.application.config['SCHEMA_FAST_PATH'] = fast_path
+            response = client.post('/blacklists', headers=auth_headers, json={
+                'email': 'uuid@example.com',
+                'app_uuid': 'z' * 36
+            })
+            assert response.status_code == 400
+            assert 'Invalid UUID format' in json.loads(response.data)['details']
+
+    def test_serializer_matches_schema(self):
+        """
+        TEST 3: Verificar que el serializador da la misma salida que BlacklistResponseSchema
+        """
+        entry = Blacklist(id=7, email='user@example.com', app_uuid=APP_UUID, blocked_reason=None,
+                          client_ip='127.0.0.1', created_at=datetime(2024, 1, 2, 3, 4, 5, 678))
+        assert BlacklistResponseSerializer().dump(entry) == BlacklistResponseSchema().dump(entry)
+
+    @pytest.mark.parametrize('encoder', ['flask', 'stdlib', 'orjson'])
+    def test_encoders_are_equivalent(self, app, encoder):
+        """
+        TEST 4: Verificar que todos los encoders producen el mismo JSON que Flask
+        """
+        data = {'b': 1, 'a': [None, True, 1.5], 'email': 'ñandú@example.com',
+                'created_at': datetime(2024, 1, 2, 3, 4, 5), 'id': uuid.UUID(APP_UUID)}
+        app.config['JSON_RESPONSE_ENCODER'] = 'flask'
+        with app.test_request_context():
+            expected = jsonify(data)
+            app.config['JSON_RESPONSE_ENCODER'] = encoder
+            response = jsonify(data)
+
+        assert response.mimetype == 'application/json'
+        assert response.get_data().endswith(b'\n')
+        assert json.loads(response.get_data()) == json.loads(expected.get_data())
+
+    def test_insert_response_is_unchanged(self, client, auth_headers):
+        """
+        TEST 5: Verificar que POST /blacklists responde igual con y sin camino rápido
+        """
+        bodies = []
+        for index, (fast_path, encoder) in enumerate(((False, 'flask'), (True, 'stdlib'))):
+            client.application.config['SCHEMA_FAST_PATH'] = fast_path
+            client.application.config['JSON_RESPONSE_ENCODER'] = encoder
+            response = client.post('/blacklists', headers=auth_headers, json={
+                'email': f'same{index}@example.com',
+                'app_uuid': APP_UUID,
+                'blocked_reason': 'Spam'
+            })
+            assert response.status_code == 201
+            body = json.loads(response.data)
+            for key in ('id', 'email', 'created_at'):
+                body['data'].pop(key)
+            bodies.append(body)
+
+        assert bodies[0] == bodies[1]
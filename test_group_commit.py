@@ -0,0 +1,157 @@
+"""
+Tests unitarios para el group commit y el modo 202 de POST /blacklists
+Ejecutar con: pytest test_group_commit.py -v
+"""
+
+import os
+import queue
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.group_commit import GroupCommitter
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba (SQLite en archivo: el hilo de commit usa su propia conexión)"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'group.db'}"
+    app.config['INSERT_GROUP_COMMIT_ENABLED'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+def post_email(app, auth_headers, email, statuses):
+    response = app.test_client().post('/blacklists', headers=auth_headers, json={
+        'email': email,
+        'app_uuid': APP_UUID
+    })
+    statuses.append((email, response.status_code, response.json))
+
+
+class TestGroupCommit:
+    """Suite de tests para el group commit de altas"""
+
+    def test_created_and_duplicate(self, client, auth_headers):
+        """
+        TEST 1: Verificar 201 con el id de la fila y 409 para un duplicado
+        """
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'group@example.com', 'app_uuid': APP_UUID, 'blocked_reason': 'Spam'
+        })
+        assert response.status_code == 201
+        entry = Blacklist.query.filter_by(email='group@example.com').one()
+        assert response.json['data']['id'] == entry.id
+        assert response.json['data']['blocked_reason'] == 'Spam'
+
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'group@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 409
+
+        lookup = client.get('/blacklists/group@example.com', headers=auth_headers)
+        assert lookup.json['is_blacklisted'] is True
+
+    def test_concurrent_inserts_share_one_commit(self, app, auth_headers):
+        """
+        TEST 2: Verificar que altas concurrentes se confirman en un solo commit y cada una recibe su resultado
+        """
+        app.config['INSERT_GROUP_COMMIT_WAIT_MS'] = 300
+        commits = []
+        event.listen(db.engine, 'commit', lambda connection: commits.append(True))
+
+        statuses = []
+        emails = [f'user{i}@example.com' for i in range(5)] + ['user0@example.com']
+        threads = [threading.Thread(target=post_email, args=(app, auth_headers, email, statuses)) for email in emails]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert sorted(status for _, status, _ in statuses) == [201] * 5 + [409]
+        assert len({body['data']['id'] for _, status, body in statuses if status == 201}) == 5
+        assert len(commits) == 1
+        stats = GroupCommitter.get_state(app).stats()
+        assert stats['groups'] == 1 and stats['rows'] == 6
+
+    def test_async_mode_returns_202(self, app, client, auth_headers):
+        """
+        TEST 3: Verificar 202 con Prefer: respond-async y que la fila se confirma después
+        """
+        app.config['INSERT_GROUP_COMMIT_ENABLED'] = False
+        app.config['INSERT_ASYNC_ENABLED'] = True
+
+        response = client.post('/blacklists', headers={**auth_headers, 'Prefer': 'respond-async'}, json={
+            'email': 'async@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 202
+        assert response.headers['Preference-Applied'] == 'respond-async'
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if client.get('/blacklists/async@example.com', headers=auth_headers).json['is_blacklisted']:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail('Accepted email was never committed')
+
+        # Without the header (and group commit off) the direct path answers
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'direct@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
+
+    def test_full_queue_returns_503(self, app, client, auth_headers):
+        """
+        TEST 4: Verificar 503 con Retry-After cuando la cola de altas está llena
+        """
+        state = GroupCommitter.get_state(app)
+        # A committer that never drains a one-slot queue
+        state._pid, state._thread = os.getpid(), object()
+        state._queue = queue.Queue(1)
+        state._queue.put(None)
+
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'full@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    def test_disabled_by_default(self, app, client, auth_headers):
+        """
+        TEST 5: Verificar que sin los modos activados se usa el alta directa y se ignora Prefer
+        """
+        app.config['INSERT_GROUP_COMMIT_ENABLED'] = False
+        assert GroupCommitter.get_state(app) is None
+
+        response = client.post('/blacklists', headers={**auth_headers, 'Prefer': 'respond-async'}, json={
+            'email': 'plain@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
@@ -0,0 +1,171 @@
+"""
+Tests unitarios para el snapshot de hashes compartido (mmap)
+Ejecutar con: pytest test_hash_snapshot.py -v
+"""
+
+import pytest
+import fcntl
+import json
+import time
+from array import array
+from app import create_app, db
+from app.models import Blacklist
+from app.canonical import email_digest
+from app.snapshot import BlacklistSnapshot, HashSnapshot, email_hash, rebuild_snapshot, write_snapshot
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba con el snapshot habilitado"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SNAPSHOT_ENABLED'] = True
+    app.config['SNAPSHOT_PATH'] = str(tmp_path / 'blacklist.snapshot')
+    app.config['SNAPSHOT_CHECK_INTERVAL'] = 0
+    app.config['SNAPSHOT_DELTA_REFRESH_INTERVAL'] = 3600
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Blacklist(
+            email='blacklisted@example.com',
+            app_uuid='123e4567-e89b-12d3-a456-426614174000',
+            blocked_reason='Spam detected',
+            client_ip='127.0.0.1'
+        ))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestSnapshotFormat:
+    """Suite de tests para el formato del archivo"""
+
+    def test_round_trip(self, tmp_path):
+        """
+        TEST 1: Todos los hashes escritos se encuentran y los ausentes no
+        """
+        path = str(tmp_path / 'test.snapshot')
+        members = [email_hash(f'user{i}@example.com') for i in range(5000)]
+
+        count = write_snapshot(path, array('Q', members + members[:10]), max_id=5000, bucket_bits=8)
+        snapshot = HashSnapshot(path)
+
+        assert count == 5000
+        assert len(snapshot) == 5000
+        assert snapshot.max_id == 5000
+        assert all(value in snapshot for value in members)
+        assert not any(email_hash(f'other{i}@example.com') in snapshot for i in range(5000))
+
+    def test_empty_snapshot(self, tmp_path):
+        """
+        TEST 2: Un snapshot vacío no contiene nada
+        """
+        path = str(tmp_path / 'empty.snapshot')
+        write_snapshot(path, array('Q'), max_id=0)
+
+        assert email_hash('a@example.com') not in HashSnapshot(path)
+
+
+class TestSnapshotLookups:
+    """Tests de integración del snapshot con el endpoint de consulta"""
+
+    def test_lookups_use_snapshot(self, client, auth_headers, app):
+        """
+        TEST 3: Construir el snapshot por CLI y responder consultas con él
+        """
+        result = app.test_cli_runner().invoke(args=['blacklist', 'build-snapshot'])
+        assert result.exit_code == 0, result.output
+
+        hit = client.get('/blacklists/blacklisted@example.com', headers=auth_headers)
+        miss = client.get('/blacklists/notfound@example.com', headers=auth_headers)
+
+        assert json.loads(hit.data)['is_blacklisted'] is True
+        assert json.loads(miss.data)['is_blacklisted'] is False
+        stats = json.loads(client.get('/debug/snapshot', headers=auth_headers).data)
+        assert stats['elements'] == 1
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_inserts_after_snapshot_go_to_delta(self, client, auth_headers, app):
+        """
+        TEST 4: Un email insertado después del snapshot se encuentra vía delta
+        """
+        app.test_cli_runner().invoke(args=['blacklist', 'build-snapshot'])
+        client.get('/blacklists/blacklisted@example.com', headers=auth_headers)
+
+        post_data = {'email': 'new@example.com', 'app_uuid': '123e4567-e89b-12d3-a456-426614174000'}
+        assert client.post('/blacklists', data=json.dumps(post_data), headers=auth_headers).status_code == 201
+
+        response = client.get('/blacklists/new@example.com', headers=auth_headers)
+        assert json.loads(response.data)['is_blacklisted'] is True
+        stats = json.loads(client.get('/debug/snapshot', headers=auth_headers).data)
+        assert stats['delta_size'] == 1
+
+    def test_other_workers_inserts_are_polled(self, client, auth_headers, app):
+        """
+        TEST 5: Filas insertadas fuera de este worker se cargan al refrescar el delta
+        """
+        app.test_cli_runner().invoke(args=['blacklist', 'build-snapshot'])
+        with app.app_context():
+            db.session.execute(Blacklist.__table__.insert().values(
+                email='elsewhere@example.com', email_canonical='elsewhere@example.com',
+                email_digest=email_digest('elsewhere@example.com'), app_uuid='123e4567-e89b-12d3-a456-426614174000',
+                client_ip='127.0.0.1', created_at=db.func.current_timestamp()
+            ))
+            db.session.commit()
+        app.config['SNAPSHOT_DELTA_REFRESH_INTERVAL'] = 0
+
+        response = client.get('/blacklists/elsewhere@example.com', headers=auth_headers)
+
+        assert json.loads(response.data)['is_blacklisted'] is True
+
+    def test_large_delta_triggers_rebuild(self, client, auth_headers, app):
+        """
+        TEST 6: Un delta que supera SNAPSHOT_REBUILD_DELTA_SIZE reconstruye el snapshot y vacía el delta
+        """
+        app.test_cli_runner().invoke(args=['blacklist', 'build-snapshot'])
+        app.config['SNAPSHOT_REBUILD_DELTA_SIZE'] = 1
+        client.get('/blacklists/blacklisted@example.com', headers=auth_headers)
+
+        post_data = {'email': 'new@example.com', 'app_uuid': '123e4567-e89b-12d3-a456-426614174000'}
+        assert client.post('/blacklists', data=json.dumps(post_data), headers=auth_headers).status_code == 201
+        client.get('/blacklists/new@example.com', headers=auth_headers)
+
+        state = BlacklistSnapshot.get_state(app)
+        deadline = time.monotonic() + 5
+        while (state.rebuilds == 0 or state._rebuilding) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert state.rebuilds == 1
+
+        response = client.get('/blacklists/new@example.com', headers=auth_headers)
+        assert json.loads(response.data)['is_blacklisted'] is True
+        stats = json.loads(client.get('/debug/snapshot', headers=auth_headers).data)
+        assert stats['elements'] == 2
+        assert stats['delta_size'] == 0
+
+    def test_rebuild_skipped_while_locked(self, app):
+        """
+        TEST 7: Si otro proceso tiene el lock del snapshot la reconstrucción se omite
+        """
+        path = app.config['SNAPSHOT_PATH']
+        with open(f'{path}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            assert rebuild_snapshot(path) is None
+        assert rebuild_snapshot(path) == (1, 1)
@@ -0,0 +1,85 @@
+"""
+Tests unitarios para el generador de carga (scripts/loadgen.py)
+Ejecutar con: pytest test_loadgen.py -v
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from app import create_app, db
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+import loadgen  # noqa: E402
+from analyze_deployments import load_results  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Servidor HTTP real con la aplicación sobre un SQLite temporal"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'loadgen.db'}"
+    with app.app_context():
+        db.create_all()
+
+    httpd = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+class TestLoadGenerator:
+    """Suite de tests para loadgen"""
+
+    def test_histogram_percentiles(self):
+        """
+        TEST 1: Verificar que los percentiles tienen 3 cifras significativas
+        """
+        histogram = loadgen.HdrHistogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+
+        assert histogram.total == 100000
+        for percent, expected in ((50, 50000), (90, 90000), (99, 99000), (99.9, 99900)):
+            assert abs(histogram.percentile(percent) - expected) <= expected / 1000
+        assert histogram.percentile(100) == 100000
+
+    def test_templates_from_collection(self):
+        """
+        TEST 2: Verificar que las plantillas salen de postman_collection.json
+        """
+        templates = loadgen.load_templates('postman_collection.json', 'http://localhost:5001', 'secret')
+
+        assert templates['insert']['method'] == 'POST'
+        assert templates['insert']['path'] == '/blacklists'
+        assert templates['hit']['headers']['Authorization'] == 'Bearer secret'
+        assert templates['duplicate']['expected'] == 409
+
+        kinds, weights = loadgen.parse_mix(loadgen.DEFAULT_MIX, templates)
+        assert kinds == ['hit', 'miss', 'insert', 'duplicate']
+        assert weights == [60, 25, 10, 5]
+
+    def test_run_writes_analyzable_csv(self, server, tmp_path):
+        """
+        TEST 3: Verificar una ejecución real y que analyze_deployments.py lee el CSV
+        """
+        output = tmp_path / 'results.csv'
+        exit_code = loadgen.main([
+            '--base-url', server, '--concurrency', '2', '--duration', '0.5', '--warmup', '0',
+            '--seed', '5', '--output', str(output), '--strategy', 'test', '--version', '1.0'
+        ])
+        assert exit_code == 0
+
+        rows = load_results(str(output))
+        assert len(rows) == 1
+        assert rows[0]['Strategy'] == 'test'
+        assert rows[0]['Version'] == '1.0'
+        assert int(rows[0]['Duration (seconds)']) >= 0
+        assert int(rows[0]['Requests']) > 0
+        assert rows[0]['Errors'] == '0'
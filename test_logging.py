@@ -0,0 +1,136 @@
+"""
+Tests unitarios para el pipeline de logging estructurado
+Ejecutar con: pytest test_logging.py -v
+"""
+
+import json
+import logging
+import queue
+import app.utils as utils
+from app.utils import JSONFormatter, DroppingQueueHandler, LogSampler, StructuredLogger
+
+
+def make_record(message='Email found in blacklist', **extra_fields):
+    """Crear un registro de log con campos extra"""
+    record = logging.LogRecord('app.utils', logging.INFO, __file__, 10, message, None, None)
+    record.extra_fields = extra_fields
+    return record
+
+
+class TestJSONFormatter:
+    """Suite de tests para JSONFormatter"""
+
+    def test_format_includes_extra_fields(self):
+        """
+        TEST 1: Verificar que el JSON incluye mensaje y campos extra
+        """
+        data = json.loads(JSONFormatter().format(make_record(email='user@example.com', db_time_ms=1.5)))
+
+        assert data['message'] == 'Email found in blacklist'
+        assert data['level'] == 'INFO'
+        assert data['email'] == 'user@example.com'
+        assert data['db_time_ms'] == 1.5
+        assert data['timestamp'].endswith('Z')
+
+    def test_ecs_metadata_is_fetched_once(self, monkeypatch):
+        """
+        TEST 2: Verificar que los metadatos de ECS se consultan una sola vez
+        """
+        calls = []
+
+        class FakeResponse:
+            def json(self):
+                return {'TaskARN': 'arn:aws:ecs:task/123'}
+
+        def fake_get(url, timeout):
+            calls.append(url)
+            return FakeResponse()
+
+        import requests
+        monkeypatch.setattr(requests, 'get', fake_get)
+        monkeypatch.setenv('ECS_CONTAINER_METADATA_URI', 'http://169.254.170.2/v3')
+        monkeypatch.delenv('DYNO', raising=False)
+        monkeypatch.setattr(utils, '_environment_fields', None)
+
+        formatter = JSONFormatter()
+        outputs = [json.loads(formatter.format(make_record())) for _ in range(5)]
+
+        assert len(calls) == 1
+        assert all(output['task_arn'] == 'arn:aws:ecs:task/123' for output in outputs)
+        assert outputs[0]['source'] == 'aws-ecs'
+
+
+class TestDroppingQueueHandler:
+    """Suite de tests para la cola acotada"""
+
+    def test_full_queue_drops_records(self):
+        """
+        TEST 3: Verificar que con la cola llena se descartan registros sin bloquear
+        """
+        handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+
+        for i in range(5):
+            handler.handle(make_record(f'message {i}'))
+
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+    def test_exception_is_rendered_before_queueing(self):
+        """
+        TEST 4: Verificar que la excepción se serializa antes de encolar
+        """
+        handler = DroppingQueueHandler(queue.Queue())
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            import sys
+            record = logging.LogRecord('app.utils', logging.ERROR, __file__, 10, 'failed', None, sys.exc_info())
+        handler.handle(record)
+
+        queued = handler.queue.get_nowait()
+        assert queued.exc_info is None
+        assert 'ValueError: boom' in json.loads(JSONFormatter().format(queued))['exception']
+
+
+class TestLogSampler:
+    """Suite de tests para el muestreo de logs"""
+
+    def test_sampling_rates_per_message(self):
+        """
+        TEST 5: Verificar tasas de muestreo por mensaje
+        """
+        sampler = LogSampler(sample_rates={'Email found in blacklist': 0.0, 'Noisy': 0.5})
+
+        assert not any(sampler.allow('Email found in blacklist') for _ in range(100))
+        assert all(sampler.allow('Error checking blacklist') for _ in range(100))
+        kept = sum(sampler.allow('Noisy') for _ in range(2000))
+        assert 800 < kept < 1200
+        assert sampler.suppressed['Email found in blacklist'] == 100
+
+    def test_rate_limit_caps_bursts(self):
+        """
+        TEST 6: Verificar el límite con token bucket
+        """
+        sampler = LogSampler(rate_limits={'Health check requested': 5})
+
+        allowed = sum(sampler.allow('Health check requested') for _ in range(50))
+
+        assert allowed == 5
+        assert sampler.suppressed['Health check requested'] == 45
+
+    def test_suppressed_counts_are_reported(self):
+        """
+        TEST 7: Verificar que se emite el conteo de registros suprimidos
+        """
+        sampler = LogSampler(sample_rates={'Email not found in blacklist': 0.0}, report_interval=0)
+        handler = DroppingQueueHandler(queue.Queue())
+        logger = StructuredLogger('test.sampling', sampler=sampler)
+        logger.logger.handlers = [handler]
+
+        for _ in range(3):
+            logger.info('Email not found in blacklist', email='user@example.com')
+        logger.error('Error checking blacklist', error='boom')
+
+        records = [handler.queue.get_nowait() for _ in range(handler.queue.qsize())]
+        assert [record.getMessage() for record in records] == ['Error checking blacklist', 'Log records suppressed']
+        assert records[1].extra_fields['suppressed'] == {'Email not found in blacklist': 3}
@@ -0,0 +1,165 @@
+"""
+Tests unitarios para la caché HTTP condicional de GET /blacklists/<email>
+Ejecutar con: pytest test_lookup_cache.py -v
+"""
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import DatasetVersion
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['DATASET_VERSION_CHECK_INTERVAL'] = 0
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+@pytest.fixture
+def statements(app):
+    """Sentencias SQL ejecutadas durante el test"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def add_email(client, auth_headers, email):
+    response = client.post('/blacklists', headers=auth_headers, json={
+        'email': email,
+        'app_uuid': APP_UUID
+    })
+    assert response.status_code == 201
+
+
+def dataset_version():
+    return db.session.query(DatasetVersion.version).filter_by(id=1).scalar()
+
+
+class TestLookupCache:
+    """Suite de tests para ETag y Cache-Control en consultas"""
+
+    def test_headers_on_lookup(self, client, auth_headers):
+        """
+        TEST 1: Verificar ETag, Cache-Control y Vary con max-age distinto para aciertos y fallos
+        """
+        add_email(client, auth_headers, 'cached@example.com')
+
+        hit = client.get('/blacklists/cached@example.com', headers=auth_headers)
+        miss = client.get('/blacklists/unknown@example.com', headers=auth_headers)
+
+        assert hit.headers['ETag'].startswith('W/"')
+        assert hit.cache_control.max_age == 300
+        assert miss.cache_control.max_age == 0
+        assert hit.cache_control.private and miss.cache_control.private
+        assert 'Authorization' in hit.headers['Vary']
+        assert hit.headers['ETag'] != miss.headers['ETag']
+
+    def test_not_modified_skips_the_query(self, app, client, auth_headers, statements):
+        """
+        TEST 2: Verificar que If-None-Match con el ETag actual devuelve 304 sin consultar la tabla
+        """
+        add_email(client, auth_headers, 'cached@example.com')
+        etag = client.get('/blacklists/cached@example.com', headers=auth_headers).headers['ETag']
+        app.config['DATASET_VERSION_CHECK_INTERVAL'] = 60
+        del statements[:]
+
+        response = client.get('/blacklists/Cached@Example.com', headers={**auth_headers, 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.cache_control.max_age == 300
+        assert not [sql for sql in statements if 'blacklists' in sql]
+
+    def test_insert_bumps_version(self, client, auth_headers):
+        """
+        TEST 3: Verificar que un insert cambia la versión y el ETag anterior ya no vale
+        """
+        before = dataset_version()
+        miss = client.get('/blacklists/later@example.com', headers=auth_headers)
+        add_email(client, auth_headers, 'later@example.com')
+        assert dataset_version() == before + 1
+
+        response = client.get('/blacklists/later@example.com',
+                              headers={**auth_headers, 'If-None-Match': miss.headers['ETag']})
+        assert response.status_code == 200
+        assert response.json['is_blacklisted'] is True
+        assert response.headers['ETag'] != miss.headers['ETag']
+
+    def test_duplicate_and_bulk_versions(self, client, auth_headers):
+        """
+        TEST 4: Verificar que un duplicado no cambia la versión y un bulk con altas sí
+        """
+        add_email(client, auth_headers, 'dup@example.com')
+        version = dataset_version()
+
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'dup@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 409
+        assert dataset_version() == version
+
+        client.post('/blacklists/bulk', headers=auth_headers, json=[
+            {'email': 'bulk1@example.com', 'app_uuid': APP_UUID},
+            {'email': 'bulk2@example.com', 'app_uuid': APP_UUID},
+        ])
+        assert dataset_version() == version + 1
+
+    def test_no_etag_while_settling(self, app, client, auth_headers):
+        """
+        TEST 5: Verificar que no hay ETag mientras la nueva versión puede no haber llegado a réplicas/filtros
+        """
+        app.config['DATASET_VERSION_SETTLE_SECONDS'] = 60
+
+        response = client.get('/blacklists/settling@example.com', headers=auth_headers)
+
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+        assert response.cache_control.max_age == 0
+
+    def test_public_and_disabled(self, app, client, auth_headers):
+        """
+        TEST 6: Verificar LOOKUP_CACHE_PUBLIC y que la caché se puede desactivar
+        """
+        app.config['LOOKUP_CACHE_PUBLIC'] = True
+        app.config['LOOKUP_CACHE_MAX_AGE_NEGATIVE'] = 30
+        response = client.get('/blacklists/public@example.com', headers=auth_headers)
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 30
+
+        app.config['LOOKUP_CACHE_ENABLED'] = False
+        response = client.get('/blacklists/public@example.com',
+                              headers={**auth_headers, 'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
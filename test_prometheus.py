@@ -0,0 +1,161 @@
+"""
+Tests unitarios para el endpoint /metrics de Prometheus agregado entre workers
+Ejecutar con: pytest test_prometheus.py -v
+"""
+
+import multiprocessing
+import os
+
+import pytest
+from app import create_app, db
+from app.prometheus import MmapedValues, PrometheusMetrics
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba con métricas en un directorio temporal"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['METRICS_ENABLED'] = True
+    app.config['METRICS_DIR'] = str(tmp_path / 'metrics')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+def parse_samples(text):
+    """Muestras del formato de texto: {'nombre{etiquetas}': valor}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            samples[name] = float(value)
+    return samples
+
+
+def record_in_worker(app, ready, done):
+    """Worker simulado: escribe su propio archivo y espera (o termina)"""
+    state = PrometheusMetrics.get_state(app)
+    state.inc('blacklist_http_requests_total', {'endpoint': 'ping', 'method': 'GET', 'status': '200'}, 2)
+    state.set('blacklist_changes_waiters', {}, 3)
+    ready.set()
+    if done is not None:
+        done.wait(10)
+
+
+class TestPrometheusMetrics:
+    """Suite de tests para /metrics"""
+
+    def test_mmaped_values_roundtrip(self, tmp_path):
+        """
+        TEST 1: Verificar que el archivo mapeado conserva claves y valores y crece cuando se llena
+        """
+        path = str(tmp_path / 'metrics-1.bin')
+        values = MmapedValues(path)
+        for i in range(5000):
+            values.add(f'key-{i}', i)
+        values.add('key-1', 0.5)
+        values.set('gauge', 7)
+        values.close()
+
+        read = MmapedValues.read_all(path)
+        assert len(read) == 5001
+        assert read['key-1'] == 1.5
+        assert read['key-4999'] == 4999
+        assert MmapedValues(path)._offsets.keys() == read.keys()
+
+    def test_requests_and_db_timings(self, client, auth_headers):
+        """
+        TEST 2: Verificar contadores e histogramas por endpoint y tiempos de base de datos
+        """
+        client.post('/blacklists', headers=auth_headers, json={'email': 'prom@example.com', 'app_uuid': APP_UUID})
+        client.get('/blacklists/prom@example.com', headers=auth_headers)
+        client.get('/blacklists/other@example.com', headers=auth_headers)
+        client.get('/ping')
+
+        response = client.get('/metrics', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.get_data(as_text=True)
+        samples = parse_samples(text)
+
+        assert '# TYPE blacklist_http_request_duration_seconds histogram' in text
+        assert samples['blacklist_http_requests_total{endpoint="check_blacklist",method="GET",status="200"}'] == 2
+        assert samples['blacklist_http_requests_total{endpoint="add_to_blacklist",method="POST",status="201"}'] == 1
+        assert samples['blacklist_http_requests_total{endpoint="ping",method="GET",status="200"}'] == 1
+        assert samples['blacklist_http_request_duration_seconds_count{endpoint="check_blacklist"}'] == 2
+        assert samples['blacklist_http_request_duration_seconds_bucket{endpoint="check_blacklist",le="+Inf"}'] == 2
+        assert samples['blacklist_db_operations_total{operation="insert",outcome="success"}'] == 1
+        assert samples['blacklist_db_operation_duration_seconds_count{operation="query"}'] == 2
+
+    def test_histogram_buckets_are_cumulative(self, app):
+        """
+        TEST 3: Verificar que los buckets son acumulativos y cuadran con _count y _sum
+        """
+        state = PrometheusMetrics.get_state(app)
+        for seconds in (0.0002, 0.003, 0.003, 20.0):
+            state.observe('blacklist_db_operation_duration_seconds', {'operation': 'query'}, seconds)
+
+        samples = parse_samples(state.render())
+        bucket = 'blacklist_db_operation_duration_seconds_bucket{operation="query",le="%s"}'
+        assert samples[bucket % '0.0005'] == 1
+        assert samples[bucket % '0.005'] == 3
+        assert samples[bucket % '10.0'] == 3
+        assert samples[bucket % '+Inf'] == 4
+        assert samples['blacklist_db_operation_duration_seconds_count{operation="query"}'] == 4
+        assert samples['blacklist_db_operation_duration_seconds_sum{operation="query"}'] == pytest.approx(20.0062)
+
+    def test_aggregates_across_processes(self, app):
+        """
+        TEST 4: Verificar que un scrape suma los archivos de todos los procesos y descarta gauges de procesos muertos
+        """
+        context = multiprocessing.get_context('fork')
+        live_ready, exited_ready, done = context.Event(), context.Event(), context.Event()
+        live = context.Process(target=record_in_worker, args=(app, live_ready, done))
+        exited = context.Process(target=record_in_worker, args=(app, exited_ready, None))
+        live.start()
+        exited.start()
+        try:
+            assert live_ready.wait(10) and exited_ready.wait(10)
+            exited.join(10)
+
+            state = PrometheusMetrics.get_state(app)
+            state.inc('blacklist_http_requests_total', {'endpoint': 'ping', 'method': 'GET', 'status': '200'})
+            samples = parse_samples(state.render())
+        finally:
+            done.set()
+            live.join(10)
+
+        assert len(os.listdir(app.config['METRICS_DIR'])) == 3
+        assert samples['blacklist_http_requests_total{endpoint="ping",method="GET",status="200"}'] == 5
+        assert samples['blacklist_changes_waiters'] == 3
+
+    def test_disabled_and_auth(self, app, client, auth_headers):
+        """
+        TEST 5: Verificar 401 sin token y 404 con METRICS_ENABLED=false
+        """
+        assert client.get('/metrics').status_code == 401
+        app.config['METRICS_ENABLED'] = False
+        assert client.get('/metrics', headers=auth_headers).status_code == 404
@@ -0,0 +1,152 @@
+"""
+Tests unitarios para el perfilador de sentencias SQL y GET /debug/queries
+Ejecutar con: pytest test_query_profiler.py -v
+"""
+
+import pytest
+from app import create_app, db
+from app.db_metrics import db_operation_timer
+from app.models import Blacklist
+from app.query_profiler import OTHER_FINGERPRINT, QueryProfiler, fingerprint, logger, redact_parameters
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app():
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        QueryProfiler.get_state(app).reset()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+def find_query(stats, fragment):
+    """Entrada de /debug/queries cuya huella contiene fragment"""
+    matches = [query for query in stats['queries'] if fragment in query['fingerprint']]
+    assert len(matches) == 1, stats['queries']
+    return matches[0]
+
+
+class TestQueryProfiler:
+    """Suite de tests para el perfilador SQL"""
+
+    def test_fingerprint_normalization(self):
+        """
+        TEST 1: Verificar que literales, parámetros y listas se normalizan a una sola huella
+        """
+        assert fingerprint("SELECT * FROM t1 WHERE email = 'a@b.com' AND id > 42") == \
+            fingerprint("SELECT *  FROM t1\n WHERE email = 'x''y' AND id > 7")
+        assert fingerprint("SELECT * FROM t1 WHERE email = 'a@b.com' AND id > 42") == \
+            'SELECT * FROM t1 WHERE email = ? AND id > ?'
+        assert fingerprint('SELECT id FROM blacklists WHERE email IN (?, ?, ?)') == \
+            fingerprint('SELECT id FROM blacklists WHERE email IN (%(email_1)s)') == \
+            'SELECT id FROM blacklists WHERE email IN (...)'
+        assert fingerprint('INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)  -- bulk\n') == \
+            'INSERT INTO t (a, b) VALUES (...)'
+        assert fingerprint('SELECT x::text FROM t /* hint */ WHERE y = :y') == 'SELECT x::text FROM t WHERE y = ?'
+
+    def test_debug_queries_counts_lookups(self, client, auth_headers):
+        """
+        TEST 2: Verificar conteo, filas y orden de /debug/queries tras varias consultas
+        """
+        client.post('/blacklists', headers=auth_headers, json={'email': 'found@example.com', 'app_uuid': APP_UUID})
+        for _ in range(3):
+            client.get('/blacklists/found@example.com', headers=auth_headers)
+        client.post('/blacklists/check', headers=auth_headers,
+                    json={'emails': ['found@example.com', 'a@example.com', 'b@example.com']})
+
+        stats = client.get('/debug/queries?top=50&sort=count', headers=auth_headers).json
+        lookup = find_query(stats, 'WHERE blacklists.email_digest = ? AND blacklists.email_canonical = ?')
+        assert lookup['count'] == 3
+        assert lookup['max_ms'] >= lookup['avg_ms'] > 0
+        insert = find_query(stats, 'INSERT INTO blacklists')
+        assert insert['count'] == 1 and insert['rows'] == 1
+        counts = [query['count'] for query in stats['queries']]
+        assert counts == sorted(counts, reverse=True)
+        assert stats['statements'] >= 5
+
+        assert len(client.get('/debug/queries?top=1', headers=auth_headers).json['queries']) == 1
+        assert client.get('/debug/queries?sort=bogus', headers=auth_headers).status_code == 400
+
+        client.get('/debug/queries?reset=1', headers=auth_headers)
+        assert client.get('/debug/queries', headers=auth_headers).json['statements'] == 0
+
+    def test_errors_and_operation_timer(self, app, client, auth_headers):
+        """
+        TEST 3: Verificar que un alta duplicada cuenta como error y que db_operation_timer cuenta sus sentencias
+        """
+        body = {'email': 'dup@example.com', 'app_uuid': APP_UUID}
+        client.post('/blacklists', headers=auth_headers, json=body)
+        assert client.post('/blacklists', headers=auth_headers, json=body).status_code == 409
+
+        stats = QueryProfiler.get_state(app).stats(top=50, sort='errors')
+        assert stats['queries'][0]['fingerprint'].startswith('INSERT INTO blacklists')
+        assert stats['queries'][0]['errors'] == 1
+
+        with db_operation_timer('query') as operation:
+            Blacklist.query.filter_by(email='dup@example.com').first()
+            Blacklist.query.count()
+        assert operation.statements == 2
+        assert operation.elapsed_ms > 0
+
+    def test_slow_statement_log_redacts_parameters(self, app, client, auth_headers, monkeypatch):
+        """
+        TEST 4: Verificar que el log de sentencias lentas no incluye los valores de los parámetros
+        """
+        logged = []
+        monkeypatch.setattr(logger, 'warning',
+                            lambda message, **fields: logged.append((message, fields)))
+        client.get('/blacklists/secret@example.com', headers=auth_headers)
+        assert logged == []
+
+        app.config['SLOW_QUERY_LOG_ENABLED'] = True
+        app.config['SLOW_QUERY_LOG_THRESHOLD_MS'] = 0
+        client.get('/blacklists/secret@example.com', headers=auth_headers)
+
+        message, fields = logged[-1]
+        assert message == 'Slow SQL statement'
+        assert fields['fingerprint'].startswith('SELECT blacklists.id')
+        assert 'secret@example.com' not in repr(fields)
+        assert fields['parameters'] == ['<int>', '<str>', '<int>', '<int>']
+        assert redact_parameters([{'email': 'a@b.com'}] * 5, executemany=True) == \
+            [{'email': '<str>'}] * 3 + ['... 2 more']
+
+    def test_table_is_bounded(self, app):
+        """
+        TEST 5: Verificar que por encima de QUERY_PROFILER_MAX_FINGERPRINTS las huellas nuevas se agrupan
+        """
+        app.config['QUERY_PROFILER_MAX_FINGERPRINTS'] = 2
+        state = QueryProfiler.get_state(app)
+        for table in ('a', 'b', 'c', 'd'):
+            state.record(f'SELECT * FROM {table}', 1000, 1)
+
+        stats = state.stats()
+        assert stats['fingerprints'] == 3
+        other = find_query(stats, OTHER_FINGERPRINT)
+        assert other['count'] == 2 and other['rows'] == 2
+
+        app.config['QUERY_PROFILER_ENABLED'] = False
+        assert QueryProfiler.get_state(app) is None
@@ -0,0 +1,198 @@
+"""
+Tests unitarios para el rate limiting y el load shedding
+Ejecutar con: pytest test_rate_limit.py -v
+"""
+
+import pytest
+import json
+import time
+from app import create_app, db
+from app.ratelimit import RateLimiter, SQLiteTokenBucketStore, SharedInFlightCounter
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba con límites bajos"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['RATE_LIMIT_ENABLED'] = True
+    app.config['RATE_LIMIT_PATH'] = str(tmp_path / 'ratelimit.db')
+    app.config['RATE_LIMIT_TOKEN_RATE'] = 1
+    app.config['RATE_LIMIT_TOKEN_BURST'] = 3
+    app.config['RATE_LIMIT_APP_RATE'] = 1
+    app.config['RATE_LIMIT_APP_BURST'] = 2
+    app.config['LOAD_SHED_PATH'] = str(tmp_path / 'inflight.bin')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers con autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json'
+    }
+
+
+class TestTokenBuckets:
+    """Suite de tests para los token buckets compartidos"""
+
+    def test_bucket_refills_over_time(self, tmp_path):
+        """
+        TEST 1: Verificar consumo, rechazo y recarga del bucket
+        """
+        store = SQLiteTokenBucketStore(str(tmp_path / 'buckets.db'))
+
+        assert [store.consume('token:a', 20, 2)[0] for _ in range(3)] == [True, True, False]
+        allowed, retry_after = store.consume('token:a', 20, 2)
+        assert not allowed and 0 < retry_after <= 0.05
+        time.sleep(0.1)
+        assert store.consume('token:a', 20, 2)[0] is True
+
+    def test_buckets_are_shared_between_stores(self, tmp_path):
+        """
+        TEST 2: Dos instancias sobre el mismo archivo comparten el estado
+        """
+        path = str(tmp_path / 'buckets.db')
+        first, second = SQLiteTokenBucketStore(path), SQLiteTokenBucketStore(path)
+
+        assert first.consume('token:a', 0.1, 1)[0] is True
+        assert second.consume('token:a', 0.1, 1)[0] is False
+
+
+class TestRateLimitedEndpoints:
+    """Tests de integración del rate limiting con los endpoints"""
+
+    def test_token_limit_returns_429_with_retry_after(self, client, auth_headers):
+        """
+        TEST 3: Exceder el burst del token retorna 429 con Retry-After
+        """
+        statuses = [client.get('/blacklists/a@example.com', headers=auth_headers).status_code for _ in range(4)]
+
+        assert statuses == [200, 200, 200, 429]
+        response = client.get('/blacklists/a@example.com', headers=auth_headers)
+        assert response.headers['Retry-After'] == '1'
+        assert json.loads(response.data)['error'] == 'Too Many Requests'
+
+    def test_app_uuid_limit(self, client, auth_headers):
+        """
+        TEST 4: El app_uuid del cuerpo tiene su propio límite
+        """
+        statuses = [
+            client.post('/blacklists', headers=auth_headers, data=json.dumps({
+                'email': f'user{i}@example.com', 'app_uuid': APP_UUID
+            })).status_code
+            for i in range(3)
+        ]
+
+        assert statuses == [201, 201, 429]
+
+
+class TestLoadShedding:
+    """Tests del limitador de solicitudes en curso"""
+
+    def test_in_flight_counter_sums_slots(self, tmp_path):
+        """
+        TEST 5: Verificar el contador compartido de solicitudes en curso
+        """
+        counter = SharedInFlightCounter(str(tmp_path / 'inflight.bin'))
+
+        counter.increment()
+        counter.increment()
+        counter.decrement()
+
+        assert counter.total() == 1
+        assert SharedInFlightCounter(str(tmp_path / 'inflight.bin')).total() == 1
+
+    def test_saturated_instance_returns_503(self, client, auth_headers, app):
+        """
+        TEST 6: Con el límite superado se responde 503, excepto en /health
+        """
+        app.config['LOAD_SHED_ENABLED'] = True
+        app.config['LOAD_SHED_MAX_IN_FLIGHT'] = 1
+        with app.app_context():
+            from app.ratelimit import _get_store
+            _get_store('in_flight').increment()  # Otra solicitud en curso
+
+        response = client.get('/blacklists/a@example.com', headers=auth_headers)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert client.get('/health').status_code == 200
+
+    def test_queue_time_returns_503(self, client, auth_headers, app):
+        """
+        TEST 7: Una solicitud que esperó demasiado en cola se rechaza
+        """
+        app.config['LOAD_SHED_ENABLED'] = True
+        app.config['LOAD_SHED_MAX_QUEUE_MS'] = 500
+        headers = dict(auth_headers, **{'X-Request-Start': str(int(time.time() * 1000) - 2000)})
+
+        response = client.get('/blacklists/a@example.com', headers=headers)
+
+        assert response.status_code == 503
+
+    def test_in_flight_limit_sized_from_gunicorn_threads(self, client, auth_headers, app):
+        """
+        TEST 8: Verificar que el límite en curso se deriva de workers x hilos y que con workers síncronos no se aplica
+        """
+        for threads, expected in ((8, 21), (1, 0)):
+            other = create_app()
+            other.config.pop('LOAD_SHED_MAX_IN_FLIGHT')
+            other.config['WEB_CONCURRENCY'] = 3
+            other.config['GUNICORN_THREADS'] = threads
+            RateLimiter().init_app(other)
+            assert other.config['LOAD_SHED_MAX_IN_FLIGHT'] == expected
+
+        app.config['LOAD_SHED_ENABLED'] = True
+        app.config['LOAD_SHED_MAX_IN_FLIGHT'] = 0
+        with app.app_context():
+            from app.ratelimit import _get_store
+            _get_store('in_flight').increment()
+
+        assert client.get('/blacklists/a@example.com', headers=auth_headers).status_code == 200
+
+
+class TestBucketKeys:
+    """Tests del crecimiento de la tabla de buckets"""
+
+    def test_idle_buckets_are_pruned(self, tmp_path):
+        """
+        TEST 9: Verificar que los buckets inactivos (ya recargados) se eliminan
+        """
+        store = SQLiteTokenBucketStore(str(tmp_path / 'buckets.db'))
+        store.consume('app:old', 1, 2)
+        time.sleep(0.05)
+        store.consume('app:new', 1, 2)
+
+        assert store.maybe_prune(0.02, interval=3600) == 0  # Aún no toca
+        assert store.prune(0.02) == 1
+        assert store._connection().execute('SELECT key FROM buckets').fetchall() == [('app:new',)]
+
+    def test_only_valid_app_uuids_get_buckets(self, client, auth_headers, app):
+        """
+        TEST 10: Verificar que X-App-UUID inválidos no crean buckets y que las grafías de un UUID comparten uno
+        """
+        client.get('/blacklists/a@example.com', headers=dict(auth_headers, **{'X-App-UUID': 'not-a-uuid'}))
+        client.get('/blacklists/a@example.com', headers=dict(auth_headers, **{'X-App-UUID': APP_UUID.upper()}))
+
+        with app.app_context():
+            from app.ratelimit import _get_store
+            keys = [row[0] for row in _get_store('buckets')._connection().execute('SELECT key FROM buckets')]
+        assert sorted(key.split(':')[0] for key in keys) == ['app', 'token']
+        assert f'app:{APP_UUID}' in keys
@@ -0,0 +1,163 @@
+"""
+Tests unitarios para el enrutamiento de lecturas a réplicas
+Usa dos archivos SQLite: la "replicación" es copiar el archivo primario
+Ejecutar con: pytest test_replicas.py -v
+"""
+
+import pytest
+import json
+import shutil
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Blacklist
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Rutas del primario y de dos réplicas"""
+    return {
+        'primary': tmp_path / 'primary.db',
+        'replicas': [tmp_path / 'replica1.db', tmp_path / 'replica2.db'],
+        'writes': tmp_path / 'writes.db',
+    }
+
+
+@pytest.fixture
+def app(paths):
+    """Crear aplicación de prueba con primario y una réplica en archivos SQLite"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{paths["primary"]}'
+    app.config['DATABASE_READ_URL'] = f'sqlite:///{paths["replicas"][0]}'
+    app.config['REPLICA_CHECK_INTERVAL'] = 0
+    app.config['REPLICA_WRITES_PATH'] = str(paths['writes'])
+
+    # Sin contexto de aplicación abierto: cada petición tiene su propio ``g``
+    with app.app_context():
+        db.create_all()
+    replicate(paths)
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+def replicate(paths):
+    """Poner las réplicas al día con el primario"""
+    for replica in paths['replicas']:
+        shutil.copy(paths['primary'], replica)
+
+
+def insert_on_primary(app, email, created_at=None):
+    """Insertar fuera de una petición (sin marca de escritura del cliente)"""
+    with app.app_context():
+        db.session.add(Blacklist(
+            email=email,
+            app_uuid=APP_UUID,
+            client_ip='127.0.0.1',
+            created_at=created_at or datetime.utcnow()
+        ))
+        db.session.commit()
+        db.session.remove()
+
+
+def auth_headers(ip='10.0.0.1'):
+    return {'Authorization': 'Bearer dev-bearer-token', 'X-Forwarded-For': ip}
+
+
+def is_blacklisted(client, email, ip='10.0.0.1'):
+    response = client.get(f'/blacklists/{email}', headers=auth_headers(ip))
+    assert response.status_code == 200
+    return json.loads(response.data)['is_blacklisted']
+
+
+def replica_stats(client):
+    return json.loads(client.get('/debug/replicas', headers=auth_headers()).data)
+
+
+class TestReplicaRouting:
+    """Suite de tests para el enrutamiento a réplicas"""
+
+    def test_reads_go_to_replica(self, app, client, paths):
+        """
+        TEST 1: Verificar que las consultas se leen de la réplica
+        """
+        insert_on_primary(app, 'fresh@example.com')
+
+        # La réplica todavía no tiene la fila y su retraso está por debajo del umbral
+        assert is_blacklisted(client, 'fresh@example.com') is False
+
+        replicate(paths)
+        assert is_blacklisted(client, 'fresh@example.com') is True
+
+        stats = replica_stats(client)
+        assert stats['replicas'][0]['healthy'] is True
+        assert stats['replicas'][0]['reads'] == 2
+
+    def test_lagging_replica_falls_back_to_primary(self, app, client):
+        """
+        TEST 2: Verificar que una réplica con demasiado retraso se evita
+        """
+        insert_on_primary(app, 'old@example.com', created_at=datetime.utcnow() - timedelta(hours=1))
+
+        assert is_blacklisted(client, 'old@example.com') is True
+
+        stats = replica_stats(client)
+        assert stats['replicas'][0]['lag_seconds'] > 3000
+        assert stats['primary_reads']['lag'] == 1
+
+    def test_unavailable_replica_falls_back_to_primary(self, app, client, tmp_path):
+        """
+        TEST 3: Verificar que una réplica caída se evita
+        """
+        app.config['DATABASE_READ_URL'] = f'sqlite:///{tmp_path / "missing" / "replica.db"}'
+        insert_on_primary(app, 'down@example.com')
+
+        assert is_blacklisted(client, 'down@example.com') is True
+
+        stats = replica_stats(client)
+        assert stats['replicas'][0]['healthy'] is False
+        assert stats['primary_reads']['unavailable'] == 1
+
+    def test_read_your_writes(self, client):
+        """
+        TEST 4: Verificar que el cliente que escribe lee su propia escritura
+        """
+        response = client.post('/blacklists', headers=auth_headers('10.0.0.1'), json={
+            'email': 'mine@example.com',
+            'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
+
+        # Mismo cliente: primario; otro cliente: réplica sin la fila
+        assert is_blacklisted(client, 'mine@example.com', ip='10.0.0.1') is True
+        assert is_blacklisted(client, 'mine@example.com', ip='10.0.0.2') is False
+        assert replica_stats(client)['primary_reads']['sticky'] >= 1
+
+    def test_round_robin(self, app, client, paths):
+        """
+        TEST 5: Verificar que las lecturas se reparten entre réplicas
+        """
+        app.config['DATABASE_READ_URL'] = ','.join(f'sqlite:///{path}' for path in paths['replicas'])
+
+        for _ in range(4):
+            assert is_blacklisted(client, 'nobody@example.com') is False
+
+        stats = replica_stats(client)
+        assert [replica['reads'] for replica in stats['replicas']] == [2, 2]
+
+    def test_disabled_without_read_url(self, app, client):
+        """
+        TEST 6: Verificar que sin DATABASE_READ_URL todo va al primario
+        """
+        app.config['DATABASE_READ_URL'] = ''
+        insert_on_primary(app, 'primary@example.com')
+
+        assert is_blacklisted(client, 'primary@example.com') is True
+        assert replica_stats(client) == {'enabled': False}
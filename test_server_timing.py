@@ -0,0 +1,132 @@
+"""
+Tests unitarios para el desglose por fases en la cabecera Server-Timing
+Ejecutar con: pytest test_server_timing.py -v
+"""
+
+import time
+
+import pytest
+from app import create_app, db
+from app.db_metrics import db_operation_timer
+from app.server_timing import PhaseTimer, phase, record_phase
+
+
+APP_UUID = '123e4567-e89b-12d3-a456-426614174000'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['METRICS_DIR'] = str(tmp_path / 'metrics')
+    app.config['SERVER_TIMING_TOKEN'] = 'debug-secret'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba"""
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """Headers de autenticación"""
+    return {
+        'Authorization': 'Bearer dev-bearer-token',
+        'Content-Type': 'application/json',
+        'X-Debug-Token': 'debug-secret'
+    }
+
+
+def parse_server_timing(header):
+    """{'fase': milisegundos} de una cabecera Server-Timing"""
+    phases = {}
+    for item in header.split(','):
+        name, _, duration = item.strip().partition(';dur=')
+        phases[name] = float(duration)
+    return phases
+
+
+class TestServerTiming:
+    """Suite de tests para Server-Timing"""
+
+    def test_add_reports_every_phase(self, client, auth_headers):
+        """
+        TEST 1: Verificar que un alta informa auth, parse, validation, db, render y total
+        """
+        response = client.post('/blacklists', headers=auth_headers, json={
+            'email': 'timing@example.com', 'app_uuid': APP_UUID
+        })
+        assert response.status_code == 201
+
+        phases = parse_server_timing(response.headers['Server-Timing'])
+        assert set(phases) == {'auth', 'parse', 'validation', 'db', 'render', 'total'}
+        assert all(duration >= 0 for duration in phases.values())
+        assert sum(duration for name, duration in phases.items() if name != 'total') <= phases['total']
+
+    def test_lookup_and_rejected_requests(self, client, auth_headers):
+        """
+        TEST 2: Verificar las fases de una consulta y de una petición rechazada por autenticación
+        """
+        response = client.get('/blacklists/nobody@example.com', headers=auth_headers)
+        assert set(parse_server_timing(response.headers['Server-Timing'])) == {'auth', 'db', 'render', 'total'}
+
+        response = client.get('/blacklists/nobody@example.com', headers={'X-Debug-Token': 'debug-secret'})
+        assert response.status_code == 401
+        assert set(parse_server_timing(response.headers['Server-Timing'])) == {'auth', 'render', 'total'}
+
+    def test_nested_phases_are_exclusive(self, app):
+        """
+        TEST 3: Verificar que el tiempo de una fase anidada no se cuenta también en la exterior
+        """
+        with app.test_request_context('/'):
+            from flask import g
+            g.phase_timer = timer = PhaseTimer()
+            with phase('auth'):
+                with phase('parse'):
+                    time.sleep(0.02)
+                with db_operation_timer('query'):
+                    time.sleep(0.02)
+            record_phase('db', 1000)
+
+        assert timer.phases['parse'] >= 20_000_000
+        assert timer.phases['db'] >= 20_001_000
+        assert timer.phases['auth'] < 10_000_000
+
+    def test_debug_token_and_disabled(self, app, client, auth_headers):
+        """
+        TEST 4: Verificar que solo se envía la cabecera a quien manda SERVER_TIMING_TOKEN en X-Debug-Token
+        """
+        assert 'Server-Timing' not in client.get('/ping').headers
+        assert 'Server-Timing' not in client.get('/ping', headers={'X-Debug-Token': 'wrong'}).headers
+        assert 'Server-Timing' in client.get('/ping', headers={'X-Debug-Token': 'debug-secret'}).headers
+
+        app.config['SERVER_TIMING_TOKEN'] = ''
+        assert 'Server-Timing' not in client.get('/ping').headers
+        assert 'Server-Timing' not in client.get('/ping', headers={'X-Debug-Token': ''}).headers
+
+        app.config['SERVER_TIMING_TOKEN'] = 'debug-secret'
+        app.config['SERVER_TIMING_ENABLED'] = False
+        assert 'Server-Timing' not in client.get('/ping', headers={'X-Debug-Token': 'debug-secret'}).headers
+
+    def test_phase_histograms(self, app, client, auth_headers):
+        """
+        TEST 5: Verificar los histogramas por fase en /metrics aunque la cabecera no se envíe
+        """
+        app.config['METRICS_ENABLED'] = True
+        app.config['SERVER_TIMING_TOKEN'] = 'debug-secret'
+        client.post('/blacklists', headers=auth_headers, json={'email': 'hist@example.com', 'app_uuid': APP_UUID})
+
+        text = client.get('/metrics', headers=auth_headers).get_data(as_text=True)
+        name = 'blacklist_http_request_phase_duration_seconds'
+        for phase_name in ('auth', 'parse', 'validation', 'db', 'render'):
+            assert f'{name}_count{{endpoint="add_to_blacklist",phase="{phase_name}"}} 1' in text
+        assert f'{name}_bucket{{endpoint="add_to_blacklist",phase="auth",le="1e-05"}}' in text
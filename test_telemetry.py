@@ -0,0 +1,123 @@
+"""
+Tests unitarios para el agregador de telemetría
+Ejecutar con: pytest test_telemetry.py -v
+"""
+
+import pytest
+import json
+import socket
+import threading
+from app import create_app, db
+from app.telemetry import Telemetry, MemoryBackend, StatsdBackend, function_trace, telemetry
+
+
+@pytest.fixture
+def memory_backend():
+    """Backend en memoria para el agregador global"""
+    backend = MemoryBackend()
+    telemetry.configure(backend, flush_interval=0)
+    yield backend
+    telemetry.configure(MemoryBackend(), flush_interval=0)
+
+
+@pytest.fixture
+def app(memory_backend):
+    """Crear aplicación de prueba"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    telemetry.configure(memory_backend, flush_interval=0)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+class TestTelemetryAggregator:
+    """Suite de tests para Telemetry"""
+
+    def test_counters_and_timings_are_aggregated(self):
+        """
+        TEST 1: Verificar agregación de contadores y tiempos en un solo flush
+        """
+        backend = MemoryBackend()
+        aggregator = Telemetry(backend, flush_interval=0)
+
+        for value in (1.0, 3.0, 2.0):
+            aggregator.timing('Custom/Database/QueryTime', value)
+        aggregator.incr('Custom/Blacklist/QueryAttempt')
+        aggregator.incr('Custom/Blacklist/QueryAttempt')
+        aggregator.flush()
+
+        timing = backend.metrics['Custom/Database/QueryTime'].as_dict()
+        assert timing == {'count': 3, 'total': 6.0, 'min': 1.0, 'max': 3.0, 'sum_of_squares': 14.0}
+        assert backend.metrics['Custom/Blacklist/QueryAttempt'].total == 2
+        assert backend.flushes == 1
+
+    def test_buffers_from_all_threads_are_flushed(self):
+        """
+        TEST 2: Verificar que se recogen los buffers de todos los hilos
+        """
+        backend = MemoryBackend()
+        aggregator = Telemetry(backend, flush_interval=0)
+
+        threads = [threading.Thread(target=lambda: [aggregator.incr('hits') for _ in range(100)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        aggregator.flush()
+
+        assert backend.metrics['hits'].total == 400
+
+    def test_statsd_backend_sends_udp(self):
+        """
+        TEST 3: Verificar el formato StatsD enviado por UDP
+        """
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(2)
+        aggregator = Telemetry(StatsdBackend('127.0.0.1', receiver.getsockname()[1], 'blacklist'), flush_interval=0)
+
+        aggregator.incr('Custom/Ping/Request', 3)
+        aggregator.timing('Custom/Database/QueryTime', 2.0)
+        aggregator.flush()
+
+        lines = receiver.recv(2048).decode().splitlines()
+        receiver.close()
+        assert 'blacklist.Custom.Ping.Request:3|c' in lines
+        assert 'blacklist.Custom.Database.QueryTime:2.000|ms|@1.000000' in lines
+
+
+class TestRouteTelemetry:
+    """Tests de integración de las rutas con el agregador"""
+
+    def test_lookup_records_metrics(self, app, memory_backend):
+        """
+        TEST 4: Una consulta registra intento, tiempo de base de datos y resultado
+        """
+        response = app.test_client().get(
+            '/blacklists/notfound@example.com',
+            headers={'Authorization': 'Bearer dev-bearer-token'}
+        )
+        telemetry.flush()
+
+        assert json.loads(response.data)['is_blacklisted'] is False
+        assert memory_backend.metrics['Custom/Blacklist/QueryAttempt'].count == 1
+        assert memory_backend.metrics['Custom/Blacklist/QueryNotFound'].count == 1
+        assert memory_backend.metrics['Custom/Database/QueryTime'].count == 1
+        assert memory_backend.attributes['is_blacklisted'] is False
+
+    def test_function_trace_without_license_key(self, monkeypatch):
+        """
+        TEST 5: Sin license key las vistas no se envuelven ni se importa el agente
+        """
+        monkeypatch.delenv('NEW_RELIC_LICENSE_KEY', raising=False)
+
+        def view():
+            return 'ok'
+
+        assert function_trace()(view) is view